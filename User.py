@@ -4,14 +4,82 @@ It can create and manage several users, and all functions always refer to the lo
 This code part contains functions to manage the user profile, to create and manage user specific habits and
 all functions around analysis.
 
-It imports the libraries' questionary, sqlite, datetime and hashlib.
-It further imports the habit.py document to be able to use the HabitClass.
+It imports the libraries' questionary, datetime and hashlib.
+questionary is only imported by the methods that show a prompt, so the class can be used as a library
+(e.g. by cli.py) without loading the prompt toolkit.
+It further imports the habit.py document to be able to use the HabitClass
+and database.py to get the shared database connection.
+The streaks are computed by streak_engine.py, the overviews read the materialized state in habit_stats.py.
+The results of compute_streak() and compute_longest_streak_habit() are cached by streak_cache.py, completions are
+reported to the schedulers of the streaks at risk (scheduler.py).
 """
-import questionary
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import groupby
 import hashlib
+import completion_calendar
 import habit
+import database
+import habit_stats
+import scheduler
+import streak_cache
+import streak_engine
+
+
+# PROGRESS STORAGE.
+# there is one row per habit and period, a repeated completion in the same period only increases its count and
+# keeps the first completion of the period
+UPSERT_COMPLETION = """INSERT INTO progress(habit_id, completed_at, period_key, count) VALUES(?, ?, ?, ?)
+                       ON CONFLICT(habit_id, period_key) DO UPDATE SET
+                           count = count + excluded.count,
+                           completed_at = MIN(completed_at, excluded.completed_at);"""
+
+
+def insert_completion(cur, habit_id, periodicity, completion):
+    """
+    Inserts one completion into the table progress (or counts it in the row of its period) and updates the streak
+    state (habit_stats) on the same cursor, so both are part of the same transaction. The caller commits.
+    Used by UserClass.complete_habit() and the write queue (write_queue.py).
+
+    Returns
+    -------
+    :return: tuple
+        the new streak state (current_streak, longest_streak, last_period_key), see habit_stats.py
+    """
+    completed_at, _ = streak_engine.encode_timestamp(completion)
+    cur.execute(UPSERT_COMPLETION, (habit_id, completed_at, streak_engine.period_key(completion, periodicity), 1))
+    return habit_stats.record_completion(cur, habit_id, periodicity, completion)
+
+
+def insert_completions(cur, habit_id, periodicity, completions):
+    """
+    Inserts a batch of completions of one habit with a single executemany() and updates the streak state and the
+    completion calendar once for the whole batch. The caller commits.
+    Used by UserClass.complete_habits().
+
+    Returns
+    -------
+    :return: tuple
+        the new streak state (current_streak, longest_streak, last_period_key), see habit_stats.py
+    """
+    rows = []
+    for completion in completions:
+        completed_at, _ = streak_engine.encode_timestamp(completion)
+        rows.append((habit_id, completed_at, streak_engine.period_key(completion, periodicity), 1))
+    cur.executemany(UPSERT_COMPLETION, rows)
+    return habit_stats.record_completions(cur, habit_id, periodicity, [row[2] for row in rows])
+
+
+def rekey_progress(cur, habit_id, periodicity):
+    """
+    Recomputes the period keys of a habit after its periodicity changed. Rows that fall into the same period of the
+    new periodicity are merged (their counts are added up), the caller commits.
+    """
+    new_key = streak_engine.period_key_sql(streak_engine.day_ordinal_sql(), "?")
+    cur.execute(f"SELECT habit_id, completed_at, {new_key}, count FROM progress WHERE habit_id = ?;",
+                (periodicity, habit_id))
+    rows = cur.fetchall()
+    cur.execute("DELETE FROM progress WHERE habit_id = ?;", (habit_id,))
+    cur.executemany(UPSERT_COMPLETION, rows)
 
 
 # THE USER CLASS.
@@ -54,10 +122,22 @@ class UserClass:
         shows all weekly habits of the user
     show_daily_habits()
         shows all daily habits of the user
+    get_habits(periodicity)
+        returns all habits of the user (optionally of one periodicity) without printing them
     is_completed()
         herewith the user can mark a habit as done
+    complete_habit(habit_name, completion, queue)
+        marks a habit as done without a prompt (directly or through a write queue)
+    complete_habits(completions)
+        marks many habits as done at once or backfills past completions, in one transaction
     get_habit_progress(habit_name, periodicity)
         retrieves the progress of a certain habit with a certain periodicity from the database
+    get_completion_days(habit_name, periodicity)
+        retrieves the days of all completions of a habit as integers
+    get_calendar(habit_name)
+        retrieves the completion calendar (bitset of the completed periods) of a habit
+    compute_all_streaks(materialized)
+        computes the current and longest streaks of all habits with a single query
     streak_overview()
         displays all current streaks of all habits of the user
     streak_habit()
@@ -74,7 +154,7 @@ class UserClass:
 
     # USER MANAGEMENT
     # INIT METHOD.
-    def __init__(self, username, password, firstname, lastname):
+    def __init__(self, username, password, firstname, lastname, user_id=None):
         """
         Parameters
         ----------
@@ -82,16 +162,17 @@ class UserClass:
         :param password: the password used by the user
         :param firstname: the firstname
         :param lastname: the lastname
+        :param user_id: the id of the user in the database, looked up by the username if not given
         """
         self.username = username
         self.password = password
         self.firstname = firstname
         self.lastname = lastname
+        self._user_id = user_id
 
-        from os.path import join, dirname, abspath
-        db_path = join(dirname(abspath(__file__)), 'healthup.db')
-
-        self.conn = sqlite3.connect(db_path)
+        # the connection is shared with all other objects of the same thread (see database.py),
+        # so a UserClass object must only be used by the thread that created it
+        self.conn = database.get_connection()
         self.cur = self.conn.cursor()
 
     # User Data Storage.
@@ -100,10 +181,22 @@ class UserClass:
         Stores the user data into the database.
         Function is used when first registering a user.
         """
-        self.cur.execute("INSERT INTO users VALUES(?, ?, ?, ?)",
+        self.cur.execute("INSERT INTO users(username, password, firstname, lastname) VALUES(?, ?, ?, ?)",
                          ( self.username, self.password, self.firstname, self.lastname))
+        self._user_id = self.cur.lastrowid
         self.conn.commit()
 
+    # the integer key of the user, all habits refer to it
+    @property
+    def user_id(self):
+        """
+        The user_id of the user in the table users (None as long as the user is not stored).
+        """
+        if self._user_id is None:
+            row = self.conn.execute("SELECT user_id FROM users WHERE username = ?", (self.username,)).fetchone()
+            self._user_id = row[0] if row else None
+        return self._user_id
+
     # registered User can update profile
     def update_profile(self):
         """
@@ -111,6 +204,8 @@ class UserClass:
         The user selects an element to update, provides the new value, and the update is saved in the database.
         Passwords must be at least 8 characters long and contain letters and numbers.
         """
+        import questionary
+
         choices = ["first name", "last name", "password"]
         element = questionary.select("What do you want to update? ", choices=choices).ask()
 
@@ -135,14 +230,22 @@ class UserClass:
     def store_habit_in_db(self, new_habit):
         """
         Stores habit data into the database, if it does not exist already.
+        The HabitClass itself has no database access, all habits are persisted through this method.
         """
+        # the owner of the habit is usually this user, otherwise its id is looked up
+        owner_id = self.user_id if new_habit.owner == self.username else \
+            UserClass(new_habit.owner, None, None, None).user_id
         # Check if habit already exists
-        self.cur.execute ("SELECT * FROM habits WHERE habit_name = ? AND owner = ?",
-                           (new_habit.habit_name, new_habit.owner))
+        self.cur.execute ("SELECT habit_id FROM habits WHERE owner_id = ? AND habit_name = ?",
+                           (owner_id, new_habit.habit_name))
         if self.cur.fetchone() is None:
-            self.cur.execute("INSERT INTO habits VALUES(?, ?, ?, ?)",
-                               (new_habit.habit_name, new_habit.owner,
-                                new_habit.periodicity, new_habit.datetime_creation))
+            datetime_creation = new_habit.datetime_creation
+            if isinstance(datetime_creation, datetime):
+                datetime_creation = datetime_creation.strftime('%Y-%m-%d %H:%M:%S')
+            self.cur.execute("INSERT INTO habits(owner_id, habit_name, periodicity, datetime_creation) "
+                             "VALUES(?, ?, ?, ?)",
+                               (owner_id, new_habit.habit_name,
+                                new_habit.periodicity, datetime_creation))
             self.conn.commit()
         else:
             print (f"The habit '{new_habit.habit_name}' already exists for user '{new_habit.owner}'.")
@@ -152,20 +255,35 @@ class UserClass:
         """
         Retrieves habit from db. If the habit_name exists for the given owner, it returns the habit. Otherwise, returns None.
         """
-        self.cur.execute("SELECT * FROM habits WHERE habit_name = ? AND owner = ?",(habit_name, self.username))
+        self.cur.execute("SELECT habit_name, periodicity, datetime_creation FROM habits "
+                         "WHERE owner_id = ? AND habit_name = ?", (self.user_id, habit_name))
         list_of_habits = self.cur.fetchall()
 
         if list_of_habits:
-            habit_name, owner, periodicity, datetime_creation = list_of_habits[0]
-            hab = habit.HabitClass(habit_name, owner, periodicity, datetime_creation)
+            habit_name, periodicity, datetime_creation = list_of_habits[0]
+            hab = habit.HabitClass(habit_name, self.username, periodicity, datetime_creation)
             return hab
 
+    # the key and periodicity of a habit (for the queries on progress)
+    def _find_habit(self, habit_name, periodicity=None):
+        """
+        Returns (habit_id, periodicity) of a habit of the user, None if it does not exist
+        (or has another periodicity than the given one).
+        """
+        row = self.conn.execute("SELECT habit_id, periodicity FROM habits WHERE owner_id = ? AND habit_name = ?",
+                                (self.user_id, habit_name)).fetchone()
+        if row is None or (periodicity is not None and row[1] != periodicity):
+            return None
+        return row
+
     # New User can choose from a set of predefined habits (directly after first login)
     def choose_predefined_habit(self):
         """
         Offers the user a choice to adopt habits from a predefined list. It checks each predefined habit and asks
         the user if they want to adopt it only if it's not already stored in the database.
         """
+        import questionary
+
         print("Let's choose your habits:")
         predefined_habits = [
             {"name": "Sleep", "periodicity": "daily"},
@@ -197,29 +315,35 @@ class UserClass:
         User is asked questions that allows him to create a new Habit. Following attributes are passed:
         habit name(only letters allowed), Periodicity (daily, weekly, monthly).
         The assignment to the user = owner and the datetime_creation are created automatically.
-        Subsequently, the get_habit(habit_name) method is used to check whether the habit already exists.
-        function returns a new habit that is saved in the db (by calling store_habit_in_db(new_habit)).
-        """
-        habit_name = questionary.text("Type in the name of the habit: ",
-                                            validate=lambda text: True if len (text) > 0 and text.isalpha()
-                                            else "Please enter a correct value. "
-                                                 "Your habit name should only contain letters.").ask()
-        owner = self.username
-        periodicity = questionary.select("choose the periodicity of the habit.",
-                                               choices=[
-                                                   "daily",
-                                                   "weekly",
-                                                   "monthly"]).ask()
-        datetime_creation = datetime.now()
-
-        new_habit = habit.HabitClass(habit_name, owner, periodicity, datetime_creation)
-        existing_habit = self.get_habit(habit_name)
-        if existing_habit:
+        Subsequently, the get_habit(habit_name) method is used to check whether the habit already exists,
+        if so the user is asked again.
+        function saves the new habit in the db (by calling store_habit_in_db(new_habit)) and returns it.
+        """
+        import questionary
+
+        # asked again until the name is not taken yet (a loop, so retries do not grow the call stack)
+        while True:
+            habit_name = questionary.text("Type in the name of the habit: ",
+                                                validate=lambda text: True if len (text) > 0 and text.isalpha()
+                                                else "Please enter a correct value. "
+                                                     "Your habit name should only contain letters.").ask()
+            owner = self.username
+            periodicity = questionary.select("choose the periodicity of the habit.",
+                                                   choices=[
+                                                       "daily",
+                                                       "weekly",
+                                                       "monthly"]).ask()
+            datetime_creation = datetime.now()
+
+            new_habit = habit.HabitClass(habit_name, owner, periodicity, datetime_creation)
+            existing_habit = self.get_habit(habit_name)
+            if not existing_habit:
+                break
             print("\nThis habit already exists. Try again!\n")
-            return self.create_habit()
-        else:
-            self.store_habit_in_db(new_habit)
-            print("\nWell done! You created a new habit. \n")
+
+        self.store_habit_in_db(new_habit)
+        print("\nWell done! You created a new habit. \n")
+        return new_habit
 
     # habit deletion
     def delete_habit(self):
@@ -228,15 +352,23 @@ class UserClass:
         by calling get_habit(habit_name) if the habit exists in the db. If it does not exist, it prints a statement.
         If it exists, it deletes the habit from the database and returns a success statement.
         """
+        import questionary
+
         habit_name = questionary.text("Which habit do you want to delete? ",
                                 validate=lambda text: True if len(text)>0 and text.isalpha()
                                 else "Please enter a correct value.").ask()
-        existing_habit =self.get_habit(habit_name)
+        existing_habit = self._find_habit(habit_name)
 
         if existing_habit:
-            self.cur.execute(f"DELETE FROM habits WHERE habit_name = '{habit_name}' AND owner = '{self.username}';")
-            self.cur.fetchall()
+            # the progress and the streaks of the habit are deleted with it
+            habit_id = existing_habit[0]
+            self.cur.execute("DELETE FROM progress WHERE habit_id = ?;", (habit_id,))
+            self.cur.execute("DELETE FROM habit_stats WHERE habit_id = ?;", (habit_id,))
+            self.cur.execute("DELETE FROM stale_habits WHERE habit_id = ?;", (habit_id,))
+            self.cur.execute("DELETE FROM habits WHERE habit_id = ?;", (habit_id,))
             self.conn.commit()
+            streak_cache.invalidate(self.username, habit_name)
+            scheduler.forget(self.username, habit_name)
             print(f"'{habit_name}' successfully deleted.")
         else:
             print("\nNo such habit in the database!\n")
@@ -251,17 +383,24 @@ class UserClass:
         ('task' or 'periodicity') they want to update. After selecting the attribute, the user is prompted to enter the
         new value for that attribute. The method updates the habit in the db with the new value.
         """
+        import questionary
+
         to_change = questionary.text("What habit do you want to change? ",
                                      validate=lambda text: True if len(text) > 0 and text.isalpha()
                                      else "Please enter a correct value.").ask()
-        existing_habit = self.get_habit(to_change)
+        existing_habit = self._find_habit(to_change)
         if existing_habit:
             element = questionary.select("do you want to change the periodicity? ",
                                            choices=["periodicity"]).ask()
             new_value = questionary.text(f"Enter new {element}: ").ask()
-            self.cur.execute(f"UPDATE habits SET {element} = ? WHERE habit_name = ? AND owner = ?",
-                               (new_value, to_change, self.username))
+            self.cur.execute(f"UPDATE habits SET {element} = ? WHERE habit_id = ?",
+                               (new_value, existing_habit[0]))
+            # the progress is counted in the new periods from now on
+            rekey_progress(self.cur, existing_habit[0], new_value)
+            habit_stats.rebuild_habit(self.cur, existing_habit[0], new_value)
             self.conn.commit()
+            streak_cache.invalidate(self.username, to_change)
+            scheduler.forget(self.username, to_change)
             print(f"\nYou successfully updated the {element} for your habit.\n")
         else:
             print("This habit is not in the database.")
@@ -276,7 +415,7 @@ class UserClass:
         Returns:
         list: A list of all habits.
         """
-        self.cur.execute("SELECT habit_name FROM habits WHERE owner = '{}';".format(self.username))
+        self.cur.execute("SELECT habit_name FROM habits WHERE owner_id = ? ORDER BY habit_id;", (self.user_id,))
 
         items = self.cur.fetchall()
         habits = [item[0] for item in items]
@@ -294,7 +433,8 @@ class UserClass:
         :return: list
             returns a list of monthly habits
         """
-        self.cur.execute(f"SELECT habit_name FROM habits WHERE periodicity = 'monthly' AND owner = '{self.username}';")
+        self.cur.execute("SELECT habit_name FROM habits WHERE owner_id = ? AND periodicity = 'monthly' "
+                         "ORDER BY habit_id;", (self.user_id,))
         items = self.cur.fetchall()
         habits = []
         for item in items:
@@ -307,7 +447,8 @@ class UserClass:
         """
         Queries the database and returns a list of the weekly habits of the currently logged-in user.
         """
-        self.cur.execute(f"SELECT habit_name FROM habits WHERE periodicity = 'weekly' AND owner = '{self.username}';")
+        self.cur.execute("SELECT habit_name FROM habits WHERE owner_id = ? AND periodicity = 'weekly' "
+                         "ORDER BY habit_id;", (self.user_id,))
         items = self.cur.fetchall()
         habits = []
         for item in items:
@@ -320,7 +461,8 @@ class UserClass:
         """
         Queries the database and returns a list of the daily habits of the currently logged-in user.
         """
-        self.cur.execute(f"SELECT habit_name FROM habits WHERE periodicity = 'daily' AND owner = '{self.username}';")
+        self.cur.execute("SELECT habit_name FROM habits WHERE owner_id = ? AND periodicity = 'daily' "
+                         "ORDER BY habit_id;", (self.user_id,))
         items = self.cur.fetchall()
         habits = []
         for item in items:
@@ -328,6 +470,30 @@ class UserClass:
         print(habits)
         return habits
 
+    # all habits as HabitClass objects (used by cli.py, nothing is printed)
+    def get_habits(self, periodicity=None):
+        """
+        Queries the database for the habits of the user in the order they were created.
+
+        Parameters
+        ----------
+        :param periodicity: str
+            'daily', 'weekly' or 'monthly' to get only the habits of this periodicity, None for all habits
+
+        Returns
+        -------
+        :return: list
+            a list of HabitClass objects
+        """
+        if periodicity is None:
+            self.cur.execute("SELECT habit_name, periodicity, datetime_creation FROM habits WHERE owner_id = ? "
+                             "ORDER BY habit_id;", (self.user_id,))
+        else:
+            self.cur.execute("SELECT habit_name, periodicity, datetime_creation FROM habits WHERE owner_id = ? "
+                             "AND periodicity = ? ORDER BY habit_id;", (self.user_id, periodicity))
+        return [habit.HabitClass(habit_name, self.username, periodicity, datetime_creation)
+                for habit_name, periodicity, datetime_creation in self.cur.fetchall()]
+
     # Habit completion
     def is_completed(self):
         """
@@ -335,22 +501,104 @@ class UserClass:
         the program sets the date and time of completion and saves the progress.
         The user is informed via print statement if they were successful with adding the progress.
         """
+        import questionary
+
         to_complete = questionary.text("What habit do you want to mark as completed? ",
                                        validate=lambda text: True if len(text)>0 and text.isalpha()
                                        else "Please enter a correct value.").ask()
-        existing_habit = self.get_habit(to_complete)
-
-        if existing_habit:
-            datetime_completion = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.cur.execute("INSERT INTO progress VALUES(?, ?, ?, ?)",
-                             (existing_habit.habit_name, existing_habit.periodicity, self.username,
-                              datetime_completion))
-            self.conn.commit()
+        if self.complete_habit(to_complete):
             print("Great! you made progress. Well done!")
 
         else:
             print("This habit does not exist.")
 
+    # Habit completion without prompt
+    def complete_habit(self, habit_name, completion=None, queue=None):
+        """
+        Marks a habit as completed without asking the user, the core of is_completed().
+
+        Parameters
+        ----------
+        :param habit_name: str
+            the name of the habit
+        :param completion: datetime
+            the date and time of completion, defaults to now
+        :param queue: write_queue.WriteQueue
+            if given, the progress is handed to the write queue and grouped with other completions into one
+            transaction. The returned future is done once the progress is committed.
+
+        Returns
+        -------
+        :return:
+            None if the habit does not exist, otherwise True (or the future of the queue)
+        """
+        existing_habit = self._find_habit(habit_name)
+        if not existing_habit:
+            return None
+
+        habit_id, periodicity = existing_habit
+        completion = completion or datetime.now()
+        if queue is not None:
+            # committed by the connection of the queue, the cache notices it through PRAGMA data_version
+            future = queue.submit(insert_completion, habit_id, periodicity, completion)
+            # the schedulers only get the state once it is committed
+            username = self.username
+
+            def committed(done):
+                if not done.cancelled() and done.exception() is None:
+                    scheduler.record_state(username, habit_name, periodicity, done.result())
+            future.add_done_callback(committed)
+            return future
+        try:
+            state = insert_completion(self.cur, habit_id, periodicity, completion)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        streak_cache.invalidate(self.username, habit_name)
+        scheduler.record_state(self.username, habit_name, periodicity, state)
+        return True
+
+    # bulk completion and backfill without prompt
+    def complete_habits(self, completions):
+        """
+        Marks many habits as completed at once, e.g. to backfill the history of a wearable. All completions are
+        written in one transaction, with one executemany() per habit, and the streak state, the cache and the
+        schedulers are updated once per habit and not once per completion.
+
+        Parameters
+        ----------
+        :param completions: iterable
+            (habit_name, completion) pairs, completion is a datetime (or a text '%Y-%m-%d %H:%M:%S') or None for now
+
+        Returns
+        -------
+        :return:
+            None if one of the habits does not exist (nothing is written), otherwise a dict
+            habit_name --> number of completions
+        """
+        self.cur.execute("SELECT habit_name, habit_id, periodicity FROM habits WHERE owner_id = ?;", (self.user_id,))
+        habits = {habit_name: (habit_id, periodicity) for habit_name, habit_id, periodicity in self.cur.fetchall()}
+        now = datetime.now()
+        batches = {}
+        for habit_name, completion in completions:
+            if habit_name not in habits:
+                return None
+            batches.setdefault(habit_name, []).append(completion or now)
+
+        states = {}
+        try:
+            for habit_name, batch in batches.items():
+                states[habit_name] = insert_completions(self.cur, *habits[habit_name], batch)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        for habit_name, state in states.items():
+            streak_cache.invalidate(self.username, habit_name)
+            scheduler.record_state(self.username, habit_name, habits[habit_name][1], state)
+        return {habit_name: len(batch) for habit_name, batch in batches.items()}
+
     # all saved progress for a certain habit
     def get_habit_progress(self, habit_name, periodicity):
         """
@@ -367,46 +615,123 @@ class UserClass:
         :return:
             user_progress --> if there is any saved progress in the database
         """
-        # Execute query
-        self.cur.execute (
-            "SELECT datetime_completion FROM progress WHERE owner = ? AND habit_name = ? AND periodicity = ?;",
-            (self.username, habit_name, periodicity))
-        user_progress = self.cur.fetchall ()
+        # Execute query (answered from the index idx_progress_habit, already in chronological order)
+        # the text is formatted from the integer timestamp
+        existing_habit = self._find_habit(habit_name, periodicity)
+        if existing_habit is None:
+            return []
+        user_progress = database.get_read_connection().execute(
+            "SELECT datetime(completed_at, 'unixepoch') FROM progress WHERE habit_id = ? ORDER BY completed_at;",
+            (existing_habit[0],)).fetchall()
         return user_progress
 
+    # the days of all completions of a habit (used for the streaks)
+    def get_completion_days(self, habit_name, periodicity):
+        """
+        Gets the day ordinals (date.toordinal()) of all completions of a habit.
+        They are stored as integers, so the streak computation does not have to parse any date text.
+
+        Returns
+        -------
+        :return: list
+            the day ordinals in chronological order
+        """
+        existing_habit = self._find_habit(habit_name, periodicity)
+        if existing_habit is None:
+            return []
+        rows = database.get_read_connection().execute(
+            f"SELECT {streak_engine.day_ordinal_sql()} FROM progress WHERE habit_id = ? ORDER BY completed_at;",
+            (existing_habit[0],))
+        return [row[0] for row in rows]
+
+    # the completed periods of a habit as a bitset
+    def get_calendar(self, habit_name):
+        """
+        Gets the completion calendar of a habit, which answers 'done this period?', the streaks and the number of
+        completed periods in a range without reading the progress (see completion_calendar.py).
+        It is updated with every completion (complete_habit() / is_completed()).
+
+        Returns
+        -------
+        :return: completion_calendar.CompletionCalendar
+            None if the habit does not exist
+        """
+        existing_habit = self._find_habit(habit_name)
+        if existing_habit is None:
+            return None
+        return completion_calendar.load(self.cur, *existing_habit)
+
     # STREAK ANALYSIS
 
+    # streaks of all habits at once
+    def compute_all_streaks(self, materialized=True):
+        """
+        Computes the current and longest streaks of all habits of the user with a single query.
+
+        Parameters
+        ----------
+        :param materialized: bool
+            True --> the streaks are read from the table habit_stats (one row per habit).
+            False --> all progress of the user is fetched in one ordered query and grouped by habit in a single
+            streaming pass through the streak engine (no query per habit).
+
+        Returns
+        -------
+        :return: dict
+            habit_name --> {"periodicity": str, "current": int, "longest": int, "unit": str},
+            in the order the habits were created. Habits without progress have streaks of 0.
+        """
+        # read on the read-only connection, a long scan does not hold up the completions (see database.py)
+        with database.read_snapshot() as conn:
+            return self._compute_all_streaks(conn.cursor(), materialized)
+
+    def _compute_all_streaks(self, cur, materialized):
+        """
+        compute_all_streaks() on the given cursor.
+        """
+        now = datetime.now()
+        all_streaks = {}
+        if materialized:
+            cur.execute("""SELECT h.habit_name, h.periodicity, h.habit_id, st.habit_id IS NOT NULL,
+                                  s.current_streak, s.longest_streak, s.last_period_key
+                           FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.habit_id
+                           LEFT JOIN stale_habits st ON st.habit_id = h.habit_id
+                           WHERE h.owner_id = ? ORDER BY h.habit_id;""", (self.user_id,))
+            for habit_name, periodicity, habit_id, stale, current, longest, last_key in cur.fetchall():
+                if stale:
+                    # changed through the view legacy_progress, see habit_stats.py
+                    current, longest, last_key = habit_stats.state_from_progress(cur, habit_id)
+                current = habit_stats.current_streak(current or 0, last_key, periodicity, now)
+                all_streaks[habit_name] = self._streak_result(periodicity, current, longest or 0)
+        else:
+            cur.execute(f"""SELECT h.habit_name, h.periodicity, {streak_engine.day_ordinal_sql('p.completed_at')}
+                           FROM habits h LEFT JOIN progress p ON p.habit_id = h.habit_id
+                           WHERE h.owner_id = ? ORDER BY h.habit_id, p.completed_at;""", (self.user_id,))
+            for (habit_name, periodicity), rows in groupby(cur, key=lambda row: row[:2]):
+                days = [row[2] for row in rows if row[2] is not None]
+                current, longest = streak_engine.compute_streaks_from_days(days, periodicity, now)
+                all_streaks[habit_name] = self._streak_result(periodicity, current, longest)
+        return all_streaks
+
+    @staticmethod
+    def _streak_result(periodicity, current, longest):
+        """
+        One entry of the result of compute_all_streaks().
+        """
+        unit = "day(s)" if periodicity == "daily" else "week(s)" if periodicity == "weekly" else "month(s)"
+        return {"periodicity": periodicity, "current": current, "longest": longest, "unit": unit}
+
     #for the user to see stats of all habits
     def streak_overview(self):
         """
         Shows the user a current streak overview of all their habits.
+        The overview is rendered from compute_all_streaks().
         """
-        # for daily habits
-        self.cur.execute(
-            f"SELECT habit_name, periodicity FROM habits WHERE owner = '{self.username}' AND periodicity = 'daily';")
-        daily_habits = self.cur.fetchall()
-        for habit_info in daily_habits:
-            habit_name = habit_info[0]
-            daily_streak = self.compute_streak(habit_name,periodicity= 'daily')
-            print(f"The current streak of {habit_name} is: ", daily_streak, " day(s)")
-
-        # weekly habits
-        self.cur.execute(
-            f"SELECT habit_name, periodicity FROM habits WHERE owner = '{self.username}' AND periodicity = 'weekly';")
-        weekly_habits = self.cur.fetchall()
-        for habit_info in weekly_habits:
-            habit_name = habit_info[0]
-            weekly_streak = self.compute_streak(habit_name, periodicity= 'weekly')
-            print(f"The current streak of {habit_name} is: ", weekly_streak, " week(s)")
-
-        # monthly habits
-        self.cur.execute(
-                f"SELECT habit_name, periodicity FROM habits WHERE owner = '{self.username}' AND periodicity = 'monthly';")
-        monthly_habits = self.cur.fetchall()
-        for habit_info in monthly_habits:
-            habit_name = habit_info[0]
-            monthly_streak = self.compute_streak(habit_name, periodicity= 'monthly')
-            print(f"The current streak of {habit_name} is: ", monthly_streak, " month(s)")
+        all_streaks = self.compute_all_streaks()
+        for periodicity in ("daily", "weekly", "monthly"):
+            for habit_name, streaks in all_streaks.items():
+                if streaks["periodicity"] == periodicity:
+                    print(f"The current streak of {habit_name} is: ", streaks["current"], f" {streaks['unit']}")
         return
 
     # function for user guidance to see stats of a chosen habit
@@ -417,6 +742,8 @@ class UserClass:
         enter a habit name, when it exists, the function calls the functions
         compute_streaks according the periodicity.
         """
+        import questionary
+
         selected_habit = questionary.select(
             "Choose a habit to see its streak:",
             choices=self.show_all()).ask()
@@ -454,13 +781,13 @@ class UserClass:
     def longest_streak_overview(self):
         """
         Shows the user their longest streak of all their habits sorted by periodicity.
+        The overview is rendered from compute_all_streaks().
         """
-        # for daily habits
-        self.cur.execute (
-            f"SELECT habit_name, periodicity FROM habits WHERE owner = '{self.username}' AND periodicity = 'daily';" )
-        daily_habits = self.cur.fetchall()
-        daily_streaks = [(hab[0], self.compute_longest_streak_habit(hab[0], 'daily')) for hab in daily_habits]
+        all_streaks = self.compute_all_streaks()
 
+        # for daily habits
+        daily_streaks = [(name, streaks["longest"]) for name, streaks in all_streaks.items()
+                         if streaks["periodicity"] == 'daily']
         if daily_streaks:
             max_daily_streak = max(daily_streaks, key=lambda e: e[1])
             print(f"Your longest streak is {max_daily_streak[1]} day(s) for habit '{max_daily_streak[0]}'.")
@@ -469,10 +796,8 @@ class UserClass:
             return
 
         # Weekly habits
-        self.cur.execute (
-            f"SELECT habit_name, periodicity FROM habits WHERE owner = '{self.username}' AND periodicity = 'weekly';" )
-        weekly_habits = self.cur.fetchall()
-        weekly_streaks = [(hab[0], self.compute_longest_streak_habit(hab[0], 'weekly')) for hab in weekly_habits]
+        weekly_streaks = [(name, streaks["longest"]) for name, streaks in all_streaks.items()
+                          if streaks["periodicity"] == 'weekly']
         if weekly_streaks:
             max_weekly_streak = max(weekly_streaks, key=lambda e: e[1])
             print (
@@ -482,10 +807,8 @@ class UserClass:
             return
 
         # Monthly habits
-        self.cur.execute (
-            f"SELECT habit_name, periodicity FROM habits WHERE owner = '{self.username}' AND periodicity = 'monthly';")
-        monthly_habits = self.cur.fetchall()
-        monthly_streaks = [(hab[0], self.compute_longest_streak_habit (hab[0], 'monthly')) for hab in monthly_habits]
+        monthly_streaks = [(name, streaks["longest"]) for name, streaks in all_streaks.items()
+                           if streaks["periodicity"] == 'monthly']
         if monthly_streaks:
             max_monthly_streak = max(monthly_streaks, key=lambda e:e[1])
             print (
@@ -504,6 +827,8 @@ class UserClass:
         Uses the functions get_habit(), compute_longest_daily_streak_habit(), compute_longest_weekly_streak_habit(),
         and compute_longest_monthly_streak_habit().
         """
+        import questionary
+
         habit_name = questionary.select("Choose a habit to see the longest streak:",choices = self.show_all()).ask()
         existing_habit = self.get_habit(habit_name)
 
@@ -546,53 +871,23 @@ class UserClass:
 
         Notes
         -----
-        - The function retrieves the habit's progress data and sorts it in reverse chronological order.
-        - For 'daily' periodicity, it counts the streak by checking each date against the preceding day.
-        - For 'weekly' periodicity, it compares the ISO week number and year of each date.
-        - For 'monthly' periodicity, it compares the month and year of each date.
-        - The streak is incremented for each consecutive period found and is broken when a period is missed.
-        - The function returns the count of the current consecutive streak leading up to today's date.
-        """
-        habit_progress_total = self.get_habit_progress(habit_name, periodicity=periodicity)
-        if not habit_progress_total:
-            return 0
-
-        habits = [datetime.strptime (hab[0], '%Y-%m-%d %H:%M:%S') for hab in reversed (habit_progress_total)
-                  if hab[0] is not None]
-
-        current_date = datetime.now()
-        streak = 0
-
-        if periodicity == 'daily':
-            for habit_date in habits:
-                # For daily streaks, compare days
-                if habit_date.date() == current_date.date():
-                    streak += 1
-                    current_date -= timedelta(days=1)
-                else:
-                    break
-
-        elif periodicity == 'weekly':
-            for habit_date in habits:
-                # For weekly streaks, compare calendar weeks and year
-                if habit_date.isocalendar()[1] == current_date.isocalendar()[
-                    1] and habit_date.year == current_date.year:
-                    streak += 1
-                    current_date -= timedelta(weeks=1)
-                else:
-                    break
-
-        elif periodicity == 'monthly':
-            for habit_date in habits:
-                if habit_date.month == current_date.month and habit_date.year == current_date.year:
-                    streak += 1
-                    # Adjust to the first day of the previous month
-                    first_day_of_month = current_date.replace(day=1)
-                    previous_month_last_day = first_day_of_month - timedelta ( days=1 )
-                    current_date = previous_month_last_day
-                else:
-                    break
-        return streak
+        - The function retrieves the days of the habit's completions (integers, no text is parsed) and hands them
+          to the streak engine (streak_engine.py).
+        - Each day is turned into an integer period key (day, ISO week or month), consecutive periods differ by 1,
+          also across the turn of the year.
+        - Several completions within the same period count once.
+        - The streak is the run of consecutive periods that ends in the current period, 0 if the current period
+          has not been completed yet.
+        - The result is cached per day until the habit changes (see streak_cache.py).
+        """
+        def compute():
+            completion_days = self.get_completion_days(habit_name, periodicity)
+            if not completion_days:
+                return 0
+            return streak_engine.compute_streaks_from_days(completion_days, periodicity)[0]
+
+        cache_key = streak_cache.key(self.username, habit_name, periodicity, "current")
+        return streak_cache.lookup(self.conn, cache_key, compute)
 
     # background function to define and calculate the longest streak
     def compute_longest_streak_habit(self, habit_name, periodicity):
@@ -613,54 +908,24 @@ class UserClass:
             -------
             int
                 The longest streak of consecutive periods for the given habit.
-                Returns 0 if no progress data is available or if the habit has never been maintained
-                consecutively for more than one period.
+                Returns 0 if no progress data is available.
 
             Notes
             -----
-            - The function retrieves the habit's progress data and analyzes each date in the data set.
-            - For 'daily' habits, it counts streaks by days, incrementing the streak when two consecutive days are found.
-            - For 'weekly' habits, it compares week numbers of the year, considering a streak continued if consecutive weeks are found.
-            - For 'monthly' habits, it calculates the difference in months between dates, with a one-month difference indicating a continuation of the streak.
-            - If a period is missed according to the habit's periodicity, the current streak ends, and a new count begins.
-            - The function then returns the maximum streak count found in the data set.
+            - The function retrieves the days of the habit's completions (integers, no text is parsed) and hands them
+              to the streak engine (streak_engine.py).
+            - Each day is turned into an integer period key (day, ISO week or month), consecutive periods differ by 1,
+              also across the turn of the year. Several completions within the same period count once.
+            - The longest run of consecutive keys is the longest streak.
+            - With NumPy installed the runs are found vectorized, otherwise in plain Python (same result).
+            - The result is cached per day until the habit changes (see streak_cache.py).
             """
-        habit_progress_total = self.get_habit_progress(habit_name, periodicity=periodicity)
-        if habit_progress_total is None:
-            return 0
-
-        habits = [datetime.strptime(hab[0], '%Y-%m-%d %H:%M:%S') for hab in reversed(habit_progress_total)
-                  if hab[0] is not None]
-
-        # Streak count logic
-        max_streak = 0
-        current_streak = 1
-
-        for i in range (len(habits) - 1):
-            if periodicity == 'daily' and (habits[i]-habits[i + 1]).days == 1:
-                current_streak += 1
-
-            elif periodicity == 'weekly':
-                week1, week2 = habits[i].isocalendar()[1], habits[i + 1].isocalendar()[1]
-                if week1-week2 == 1 or (week1 == 1 and week2>50):
-                    current_streak += 1
-                else:
-                    max_streak = max(max_streak, current_streak)
-                    current_streak = 1
-
-            elif periodicity == 'monthly':
-                month_diff =(habits[i].year-habits[i + 1].year)*12+habits[i].month-habits[i + 1].month
-                if month_diff == 1:
-                    current_streak += 1
-                else:
-                    max_streak = max(max_streak, current_streak)
-                    current_streak = 1
-            else:
-                max_streak = max(max_streak, current_streak)
-                current_streak = 1
+        def compute():
+            completion_days = self.get_completion_days(habit_name, periodicity)
+            return streak_engine.compute_streaks_from_days(completion_days, periodicity)[1]
 
-        max_streak = max(max_streak, current_streak)
-        return max_streak
+        cache_key = streak_cache.key(self.username, habit_name, periodicity, "longest")
+        return streak_cache.lookup(self.conn, cache_key, compute)
 
 
 
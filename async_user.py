@@ -0,0 +1,215 @@
+"""
+This document contains the asyncio interface of the UserClass, for services that run HealthUp inside an event loop.
+
+sqlite3 blocks, so every database call of an AsyncUserClass runs on a DatabaseExecutor: a thread pool whose workers
+each use their own connection (see database.get_connection()), so many coroutines can read at the same time without
+sharing a connection. The work itself is done by the methods of the UserClass, nothing is implemented twice:
+a worker creates a UserClass for the user (no query, the data is already known) and calls the same method the
+synchronous programme calls.
+Completions are not committed by the workers. They are handed to the write queue of the executor (write_queue.py),
+which writes the completions of all concurrent callers in a few transactions. The writers therefore do not wait for
+each other's locks and commits, and the waiting time of a caller stays bounded even under a high load.
+
+Example
+-------
+async with async_user.DatabaseExecutor() as executor:
+    user = await async_user.AsyncUserClass.load("Barbie", executor)
+    await user.complete_habit("Water")
+    streaks = await user.compute_all_streaks()
+
+The connections of the workers are closed when the executor shuts down.
+
+It imports the libraries asyncio, functools, threading and concurrent.futures.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import database
+import initial
+import User
+import write_queue
+
+WORKERS = 4     # threads (and connections) of a DatabaseExecutor
+
+
+# THE EXECUTOR.
+class DatabaseExecutor:
+    """
+    Attributes
+    ----------
+    workers: int
+        the number of worker threads, each with its own connection
+
+    Methods
+    -------
+    run(function, *args)
+        awaitable, calls function(*args) in a worker thread
+    write_queue()
+        the write queue for the completions (started on first use)
+    shutdown()
+        writes the remaining completions, stops the workers and closes their connections
+    """
+
+    def __init__(self, workers=WORKERS, max_latency=write_queue.MAX_LATENCY):
+        """
+        :param workers: int
+            the number of worker threads
+        :param max_latency: float
+            seconds a completion waits for others before its batch is written (see write_queue.WriteQueue)
+        """
+        self.workers = workers
+        self.max_latency = max_latency
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="healthup-db")
+        self._write_queue = None
+        self._lock = threading.Lock()
+        # the connections the workers opened (see database.get_connection()), closed by shutdown()
+        self._connections = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+
+    async def run(self, function, *args):
+        """
+        Calls function(*args) in one of the workers and returns its result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self._in_worker, function, *args))
+
+    def _in_worker(self, function, *args):
+        """
+        Runs in a worker: calls the function and remembers the connections of the worker.
+        """
+        try:
+            return function(*args)
+        finally:
+            connections = database.thread_connections()
+            with self._lock:
+                self._connections.update(connections)
+
+    def write_queue(self):
+        """
+        The write queue of the completions, started on first use. Starting it opens a connection, so it is called
+        in a worker and not in the event loop (see AsyncUserClass.complete_habit()).
+        """
+        with self._lock:
+            if self._write_queue is None:
+                self._write_queue = write_queue.WriteQueue(max_latency=self.max_latency)
+            return self._write_queue
+
+    def shutdown(self):
+        """
+        Writes the queued completions, stops the worker threads (blocks until both are done) and closes the
+        connections of the workers.
+        """
+        if self._write_queue is not None:
+            self._write_queue.shutdown()
+        self._executor.shutdown()
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        database.close_connections(connections)
+
+
+# THE ASYNC USER CLASS.
+class AsyncUserClass:
+    """
+    Attributes
+    ----------
+    username: str
+        the username
+    executor: DatabaseExecutor
+        the executor the database calls run on
+
+    Methods
+    -------
+    load(username, executor)
+        awaitable, the user with this username or None
+    authenticate(username, password, executor)
+        awaitable, the user if the password is correct, otherwise None
+    get_habit(habit_name)
+        awaitable, see UserClass.get_habit()
+    complete_habit(habit_name, completion)
+        awaitable, marks a habit as completed once the completion is committed
+    list_habits(periodicity)
+        awaitable, see UserClass.get_habits()
+    compute_streak(habit_name, periodicity)
+        awaitable, see UserClass.compute_streak()
+    compute_longest_streak_habit(habit_name, periodicity)
+        awaitable, see UserClass.compute_longest_streak_habit()
+    compute_all_streaks()
+        awaitable, see UserClass.compute_all_streaks()
+    """
+
+    def __init__(self, username, password, firstname, lastname, user_id, executor):
+        """
+        Use load() or authenticate() instead of creating the object directly.
+        """
+        self.username = username
+        self.executor = executor
+        self._data = (username, password, firstname, lastname, user_id)
+
+    @classmethod
+    def _from_user(cls, user, executor):
+        if user is None:
+            return None
+        return cls(user.username, user.password, user.firstname, user.lastname, user.user_id, executor)
+
+    @classmethod
+    async def load(cls, username, executor):
+        """
+        Returns the AsyncUserClass of a username, None if the user does not exist.
+        """
+        return cls._from_user(await executor.run(initial.get_user, username), executor)
+
+    @classmethod
+    async def authenticate(cls, username, password, executor):
+        """
+        Checks the username and the password (see initial.authenticate()), None if they are wrong.
+        """
+        return cls._from_user(await executor.run(initial.authenticate, username, password), executor)
+
+    def _call(self, method, *args):
+        """
+        Runs in a worker: the UserClass of this user, bound to the connection of the worker, calls the method.
+        """
+        return getattr(User.UserClass(*self._data), method)(*args)
+
+    async def _run(self, method, *args):
+        return await self.executor.run(self._call, method, *args)
+
+    # HABITS
+    async def get_habit(self, habit_name):
+        return await self._run("get_habit", habit_name)
+
+    async def list_habits(self, periodicity=None):
+        return await self._run("get_habits", periodicity)
+
+    async def complete_habit(self, habit_name, completion=None):
+        """
+        Marks a habit as completed (now or at 'completion') through the write queue of the executor.
+
+        Returns
+        -------
+        :return:
+            None if the habit does not exist, otherwise True once the completion is committed
+        """
+        queue = await self.executor.run(self.executor.write_queue)
+        result = await self._run("complete_habit", habit_name, completion, queue)
+        if isinstance(result, Future):
+            await asyncio.wrap_future(result)
+            return True
+        return result
+
+    # STREAKS
+    async def compute_streak(self, habit_name, periodicity):
+        return await self._run("compute_streak", habit_name, periodicity)
+
+    async def compute_longest_streak_habit(self, habit_name, periodicity):
+        return await self._run("compute_longest_streak_habit", habit_name, periodicity)
+
+    async def compute_all_streaks(self, materialized=True):
+        return await self._run("compute_all_streaks", materialized)
@@ -0,0 +1,174 @@
+"""
+This document contains the online backup of the database.
+
+The database file is copied with the online backup API of SQLite while the programme keeps running: pages_per_step
+pages are copied at a time, with a pause of 'pause' seconds after every step, so the copy never holds the disk for
+long. The source is read on a read-only connection inside one read transaction. In WAL mode (see
+initial.start_database()) the writers commit as usual in the meantime, and the backup is the consistent snapshot of
+the moment it started (without the read transaction every commit of another connection would restart the copy).
+The copy is written to a temporary name, switched to a single file without WAL, checked with
+PRAGMA integrity_check and only then renamed to healthup-YYYYmmdd-HHMMSS.db. Afterwards only the newest 'keep'
+backups of the folder are kept (rotation).
+
+Usage:
+    python backup.py --dir backups
+    python backup.py --dir /mnt/backups --keep 14 --pages 5000 --pause 0.01 --db production.db
+
+It imports the libraries argparse, glob, os, sqlite3, sys, time and datetime.
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import database
+
+PAGES_PER_STEP = 1000   # pages copied per step (4 MB with the default page size of 4 KiB)
+PAUSE = 0.01            # seconds between two steps
+KEEP = 7                # backups kept in the folder
+PREFIX = "healthup-"
+
+
+def backup_name(now=None):
+    """
+    The file name of a backup taken at 'now', e.g. healthup-20240327-213000.db.
+    """
+    return f"{PREFIX}{(now or datetime.now()):%Y%m%d-%H%M%S}.db"
+
+
+def backups(folder):
+    """
+    Returns the backup files of a folder, the oldest first (the names sort by time).
+    """
+    return sorted(glob.glob(os.path.join(glob.escape(folder), f"{PREFIX}[0-9]*-[0-9]*.db")))
+
+
+def rotate(folder, keep=KEEP):
+    """
+    Deletes all but the newest 'keep' backups of a folder.
+
+    Returns
+    -------
+    :return: list
+        the deleted files
+    """
+    files = backups(folder)
+    deleted = files[:max(len(files) - keep, 0)]
+    for path in deleted:
+        os.remove(path)
+    return deleted
+
+
+def verify(path):
+    """
+    Runs PRAGMA integrity_check on a database file.
+
+    Returns
+    -------
+    :return: list
+        the problems found, empty if the file is intact
+    """
+    conn = sqlite3.connect(path)
+    try:
+        result = [row[0] for row in conn.execute("PRAGMA integrity_check;")]
+    finally:
+        conn.close()
+    return [] if result == ["ok"] else result
+
+
+def create_backup(folder, pages_per_step=PAGES_PER_STEP, pause=PAUSE, keep=KEEP, now=None, log=sys.stderr):
+    """
+    Copies the configured database (see database.configure()) into a new backup file of the folder, verifies it and
+    rotates the backups of the folder.
+
+    Parameters
+    ----------
+    :param folder: str
+        the folder of the backups, created if it does not exist
+    :param pages_per_step: int
+        pages copied per step
+    :param pause: float
+        seconds between two steps
+    :param keep: int
+        backups kept in the folder, None keeps all
+
+    Returns
+    -------
+    :return: dict
+        {"path", "pages", "steps", "seconds", "deleted"}
+    """
+    start = time.perf_counter()
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, backup_name(now))
+    if os.path.exists(path):
+        raise FileExistsError(f"The backup '{path}' already exists.")
+    partial = path + ".part"
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining and pause:
+            time.sleep(pause)
+
+    # the read transaction keeps the snapshot of the start (and does not block the writers in WAL mode)
+    source = database.connect(read_only=True)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master;").fetchone()
+        source.backup(target, pages=pages_per_step, progress=progress)
+        source.commit()
+        # a single self-contained file, no -wal file next to it
+        target.execute("PRAGMA journal_mode = DELETE;")
+        pages = target.execute("PRAGMA page_count;").fetchone()[0]
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+
+    problems = verify(partial)
+    if problems:
+        os.remove(partial)
+        raise sqlite3.DatabaseError(f"The backup failed the integrity check: {'; '.join(problems[:5])}")
+    os.replace(partial, path)
+    deleted = rotate(folder, keep) if keep is not None else []
+
+    result = {"path": path, "pages": pages, "steps": steps, "seconds": time.perf_counter() - start,
+              "deleted": deleted}
+    print(f"Backup {path}: {pages} pages in {steps} steps, {result['seconds']:.2f}s, "
+          f"{len(deleted)} old backup(s) deleted.", file=log)
+    return result
+
+
+# command line entry point
+def main(argv=None):
+    """
+    Takes one backup, see the usage at the top of this document.
+    """
+    parser = argparse.ArgumentParser(description="Online backup of the HealthUp database.")
+    parser.add_argument("--dir", required=True, help="the folder of the backups")
+    parser.add_argument("--keep", type=int, default=KEEP, help="backups kept in the folder (default: %(default)s)")
+    parser.add_argument("--pages", type=int, default=PAGES_PER_STEP, help="pages copied per step")
+    parser.add_argument("--pause", type=float, default=PAUSE, help="seconds between two steps")
+    database.add_argument(parser)
+    args = parser.parse_args(argv)
+    if args.keep < 1 or args.pages < 1 or args.pause < 0:
+        parser.error("--keep and --pages must be at least 1, --pause must not be negative")
+    database.configure(args.db)
+    try:
+        create_backup(args.dir, args.pages, args.pause, args.keep)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"Backup failed: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
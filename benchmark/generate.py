@@ -0,0 +1,127 @@
+"""
+This document contains the generator of synthetic habit histories for the benchmarks.
+
+It creates N users with M habits each (periodicities cycle through daily, weekly and monthly) and K years of
+completions per habit. Every period is skipped with the probability gap_rate, so the histories contain streaks of
+different lengths. The same seed always produces the same data.
+
+Usage:
+    python -m benchmark.generate --users 100 --habits 10 --years 2 --gap-rate 0.1 --db bench.db
+
+It imports the libraries random, time, argparse and datetime.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import database
+import habit_stats
+import initial
+import streak_engine
+
+PERIODICITIES = ("daily", "weekly", "monthly")
+# the histories end on this day, so they do not depend on the day the benchmark runs
+END_DATE = datetime(2024, 12, 31)
+PASSWORD = "0" * 64     # the users are never logged in interactively
+
+
+def period_starts(periodicity, years):
+    """
+    Returns the first day of every period within 'years' years before END_DATE.
+    """
+    start = END_DATE - timedelta(days=365 * years)
+    if periodicity == "daily":
+        return [start + timedelta(days=day) for day in range((END_DATE - start).days + 1)]
+    elif periodicity == "weekly":
+        monday = start - timedelta(days=start.weekday())
+        return [monday + timedelta(weeks=week) for week in range((END_DATE - monday).days // 7 + 1)]
+    return [datetime(year, month, 1) for year in range(start.year, END_DATE.year + 1) for month in range(1, 13)
+            if start.replace(day=1) <= datetime(year, month, 1) <= END_DATE]
+
+
+def completions(rng, periodicity, years, gap_rate):
+    """
+    Yields the completions of one habit: one random point in time in every period that is not skipped.
+    """
+    period_length = {"daily": 1, "weekly": 7, "monthly": 28}[periodicity]
+    for start in period_starts(periodicity, years):
+        if rng.random() >= gap_rate:
+            yield start + timedelta(days=rng.randrange(period_length), seconds=rng.randrange(86400))
+
+
+def generate(users=10, habits=5, years=1, gap_rate=0.1, seed=42, chunk_size=10000):
+    """
+    Writes the synthetic data into the configured database (see database.configure()).
+
+    Returns
+    -------
+    :return: dict
+        the number of users, habits and progress rows and the seconds the bulk insert of the progress took
+    """
+    rng = random.Random(seed)
+    initial.start_database()
+    conn = database.get_connection()
+    created = END_DATE - timedelta(days=365 * years + 1)
+
+    # the ids are given explicitly (1, 2, ...) so the progress rows can refer to them without a lookup
+    user_rows = [(number + 1, f"user{number}", PASSWORD, "Bench", f"User{number}") for number in range(users)]
+    habit_rows = [(number * habits + index + 1, number + 1, f"user{number}habit{index}", PERIODICITIES[index % 3],
+                   created.strftime('%Y-%m-%d %H:%M:%S'))
+                  for number in range(users) for index in range(habits)]
+    conn.executemany("INSERT INTO users(user_id, username, password, firstname, lastname) VALUES(?, ?, ?, ?, ?)",
+                     user_rows)
+    conn.executemany("INSERT INTO habits(habit_id, owner_id, habit_name, periodicity, datetime_creation) "
+                     "VALUES(?, ?, ?, ?, ?)", habit_rows)
+    conn.commit()
+
+    progress_rows = 0
+    seconds = 0.0
+    chunk = []
+
+    def insert(rows):
+        start = time.perf_counter()
+        conn.executemany("INSERT INTO progress(habit_id, completed_at, period_key) VALUES(?, ?, ?)", rows)
+        conn.commit()
+        return time.perf_counter() - start
+
+    for habit_id, _, _, periodicity, _ in habit_rows:
+        for completion in completions(rng, periodicity, years, gap_rate):
+            # one completion per period, so no row conflicts with another
+            chunk.append((habit_id, streak_engine.encode_timestamp(completion)[0],
+                          streak_engine.period_key(completion, periodicity)))
+            if len(chunk) >= chunk_size:
+                seconds += insert(chunk)
+                progress_rows += len(chunk)
+                chunk = []
+    if chunk:
+        seconds += insert(chunk)
+        progress_rows += len(chunk)
+
+    habit_stats.rebuild(conn)
+    return {"users": users, "habits": len(habit_rows), "progress": progress_rows, "insert_seconds": seconds}
+
+
+# command line entry point
+def main(argv=None):
+    """
+    Generates a synthetic database, see the usage at the top of this document.
+    """
+    parser = argparse.ArgumentParser(description="Generates synthetic habit histories.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--habits", type=int, default=5, help="habits per user")
+    parser.add_argument("--years", type=int, default=1, help="years of history per habit")
+    parser.add_argument("--gap-rate", type=float, default=0.1, help="probability that a period is skipped")
+    parser.add_argument("--seed", type=int, default=42)
+    database.add_argument(parser)
+    args = parser.parse_args(argv)
+    database.configure(args.db)
+
+    result = generate(args.users, args.habits, args.years, args.gap_rate, args.seed)
+    print(f"Generated {result['users']} users, {result['habits']} habits and {result['progress']} completions "
+          f"in {database.DB_PATH}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+"""
+This document contains the benchmark suite of the hot paths.
+
+For every scale a temporary database is generated (see generate.py) and the following operations are timed on a
+fixed sample of users and habits:
+compute_streak, compute_longest_streak_habit (both with an empty streak cache, and compute_streak once more answered
+from the cache), compute_all_streaks, streak_overview, get_habit_progress, show_all, a scripted menu session
+(see main.menu()) and the bulk insert of the generated progress.
+The results are written to a JSON file. With --compare the run is compared with an earlier result file and every
+operation that got slower than the threshold is reported as a regression (exit code 1).
+
+Usage:
+    python -m benchmark.run --scales small medium --output results.json
+    python -m benchmark.run --scales small --compare results.json
+
+It imports the libraries json, time, statistics, platform, contextlib, io and argparse.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+
+import database
+import initial
+import main as session
+import streak_cache
+import streak_engine
+from benchmark import generate
+
+# users x habits per user x years of history
+SCALES = {
+    "small": {"users": 10, "habits": 5, "years": 1},
+    "medium": {"users": 100, "habits": 10, "years": 2},
+    "large": {"users": 1000, "habits": 10, "years": 3},
+}
+SAMPLE_USERS = 5        # users the operations are timed for
+REPEAT = 5              # repetitions per operation, the minimum and median are reported
+# menu answers of one round of the scripted session (3 actions without further prompts)
+SESSION_ROUND = ["Activity Overview", "all habits", "See Stats", "Show streak overview",
+                 "See Stats", "Show longest streak overview"]
+SESSION_ROUNDS = 100
+THRESHOLD = 1.2         # slower by this factor than the compared run --> regression
+
+
+def measure(function, repeat=REPEAT):
+    """
+    Calls function() 'repeat' times and returns the timings in seconds.
+    Output printed by the function (e.g. show_all()) is discarded.
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    return {"calls": repeat, "min": min(timings), "median": statistics.median(timings),
+            "mean": statistics.fmean(timings)}
+
+
+def run_scale(users, habits, years, gap_rate=0.1, seed=42, repeat=REPEAT):
+    """
+    Generates one scale in a temporary database and times all operations.
+
+    Returns
+    -------
+    :return: dict
+        the size of the data and for every operation its timings (per call over all sampled users/habits)
+    """
+    database.use_temporary_file()
+    try:
+        size = generate.generate(users, habits, years, gap_rate, seed)
+        sample = [initial.get_user(f"user{number}") for number in range(0, users, max(users // SAMPLE_USERS, 1))]
+        with contextlib.redirect_stdout(io.StringIO()):
+            habit_list = [(user, name, user.get_habit(name).periodicity) for user in sample
+                          for name in user.show_all()]
+
+        operations = {
+            "compute_streak": lambda: [streak_cache.clear()] + [user.compute_streak(name, periodicity)
+                                                                for user, name, periodicity in habit_list],
+            "compute_longest_streak_habit": lambda: [streak_cache.clear()] + [
+                user.compute_longest_streak_habit(name, periodicity) for user, name, periodicity in habit_list],
+            "compute_streak_cached": lambda: [user.compute_streak(name, periodicity)
+                                              for user, name, periodicity in habit_list],
+            "compute_all_streaks": lambda: [user.compute_all_streaks(materialized=False) for user in sample],
+            "streak_overview": lambda: [user.streak_overview() for user in sample],
+            "get_habit_progress": lambda: [user.get_habit_progress(name, periodicity)
+                                           for user, name, periodicity in habit_list],
+            "show_all": lambda: [user.show_all() for user in sample],
+            "menu_session": lambda: [session.menu(user, session.scripted(SESSION_ROUND * SESSION_ROUNDS + ["Logout"]))
+                                     for user in sample],
+        }
+        results = {name: measure(function, repeat) for name, function in operations.items()}
+        results["bulk_insert"] = {"calls": 1, "min": size["insert_seconds"], "median": size["insert_seconds"],
+                                  "mean": size["insert_seconds"],
+                                  "rows_per_second": size["progress"] / max(size["insert_seconds"], 1e-9)}
+        return {"users": size["users"], "habits": size["habits"], "progress": size["progress"],
+                "sampled_habits": len(habit_list), "operations": results}
+    finally:
+        database.configure()
+
+
+def compare(current, previous, threshold=THRESHOLD):
+    """
+    Compares the fastest timings of two result files (the minimum is the least noisy measure).
+
+    Returns
+    -------
+    :return: list
+        one tuple (scale, operation, previous minimum, current minimum, ratio) per operation that exists in both,
+        sorted by ratio (slowest change first)
+    """
+    rows = []
+    for scale, result in current["scales"].items():
+        old = previous.get("scales", {}).get(scale)
+        if old is None:
+            continue
+        for operation, timings in result["operations"].items():
+            if operation in old["operations"]:
+                before = old["operations"][operation]["min"]
+                rows.append((scale, operation, before, timings["min"], timings["min"] / max(before, 1e-9)))
+    return sorted(rows, key=lambda row: row[4], reverse=True)
+
+
+# command line entry point
+def main(argv=None):
+    """
+    Runs the benchmarks, see the usage at the top of this document.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of the HealthUp hot paths.")
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"], choices=sorted(SCALES))
+    parser.add_argument("--gap-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the results are written to")
+    parser.add_argument("--compare", help="earlier JSON result file to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="ratio of the fastest timings above which an operation counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {"created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "sqlite": sqlite3.sqlite_version, "numpy": streak_engine.HAS_NUMPY,
+                 "gap_rate": args.gap_rate, "seed": args.seed, "repeat": args.repeat},
+        "scales": {},
+    }
+    for scale in args.scales:
+        print(f"Running scale '{scale}' ({SCALES[scale]}) ...")
+        results["scales"][scale] = run_scale(gap_rate=args.gap_rate, seed=args.seed, repeat=args.repeat,
+                                             **SCALES[scale])
+        for operation, timings in results["scales"][scale]["operations"].items():
+            print(f"  {operation:<30} min {timings['min'] * 1000:10.2f} ms   median {timings['median'] * 1000:10.2f} ms")
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}.")
+
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+        regressions = 0
+        for scale, operation, before, after, ratio in compare(results, previous, args.threshold):
+            flag = "REGRESSION" if ratio > args.threshold else ""
+            regressions += bool(flag)
+            print(f"  {scale:<8} {operation:<30} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms "
+                  f"({ratio:5.2f}x) {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,272 @@
+"""
+This document contains the non-interactive command line interface for scripts and cron jobs.
+
+Every call is one command, no prompt is shown and questionary is never imported:
+    python cli.py complete --user Barbie --habit Sleep
+    python cli.py complete --user Barbie --habit Sleep --at "2024-03-01 07:30:00"
+    python cli.py stats --user Barbie --json
+    python cli.py list --user Barbie --periodicity daily
+    python cli.py leaderboard --user Barbie --habit Sleep --by current --limit 10 --page 2
+    python cli.py at-risk --user Barbie --within 12 --notify "notify-send HealthUp"
+    python cli.py complete-many --user Barbie --habit Sleep --habit Water
+    python cli.py complete-many --user Barbie --file wearable.csv
+The same commands are available through main.py (e.g. python main.py stats --user Barbie).
+
+The user is authenticated without a prompt. The username can also be given with the environment variable
+HEALTHUP_USER, the password is read from the environment variable HEALTHUP_PASSWORD or, with --password-stdin,
+from the first line of the standard input (it is never passed as an argument, so it does not show up in the
+process list).
+complete-many writes all its completions in one transaction (see UserClass.complete_habits()). The file has the
+layout of data/healthup_progress.csv: a header with the columns habit_name and datetime_completion, other columns
+are ignored. With --file - it is read from the standard input.
+
+Exit codes: 0 success, 1 the habit does not exist, 2 wrong usage, 3 authentication failed.
+
+It imports the libraries argparse, csv, json, os, sys and datetime.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import database
+import initial
+import leaderboard
+import profiler
+import scheduler
+
+USER_VARIABLE = "HEALTHUP_USER"
+PASSWORD_VARIABLE = "HEALTHUP_PASSWORD"
+COMMANDS = ("complete", "complete-many", "stats", "list", "leaderboard", "at-risk")
+
+EXIT_OK = 0
+EXIT_NOT_FOUND = 1
+EXIT_USAGE = 2
+EXIT_AUTHENTICATION = 3
+
+
+# COMMANDS
+# every command gets the authenticated user and the parsed arguments and returns the exit code
+
+def complete(user, args):
+    """
+    Marks a habit as completed (now or at the time given with --at).
+    """
+    completion = datetime.fromisoformat(args.at) if args.at else None
+    if not user.complete_habit(args.habit, completion):
+        print(f"The habit '{args.habit}' does not exist.", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    if not args.quiet:
+        print(f"Completed '{args.habit}'.")
+    return EXIT_OK
+
+
+def read_completions(file):
+    """
+    The (habit_name, datetime) pairs of a CSV file with the columns habit_name and datetime_completion.
+    """
+    reader = csv.DictReader(file)
+    if not {"habit_name", "datetime_completion"} <= set(reader.fieldnames or ()):
+        raise ValueError("the file needs the columns habit_name and datetime_completion")
+    return [(row["habit_name"], datetime.fromisoformat(row["datetime_completion"])) for row in reader]
+
+
+def complete_many(user, args):
+    """
+    Marks all habits given with --habit (now or at --at) and all completions of the file given with --file as
+    completed, in one transaction.
+    """
+    completion = datetime.fromisoformat(args.at) if args.at else None
+    completions = [(habit_name, completion) for habit_name in args.habit]
+    if args.file:
+        try:
+            if args.file == "-":
+                completions += read_completions(sys.stdin)
+            else:
+                with open(args.file, newline="") as file:
+                    completions += read_completions(file)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read '{args.file}': {e}", file=sys.stderr)
+            return EXIT_USAGE
+    known = {hab.habit_name for hab in user.get_habits()}
+    missing = sorted({habit_name for habit_name, _ in completions} - known)
+    if missing:
+        print(f"The habits {', '.join(map(repr, missing))} do not exist, nothing was completed.", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    counts = user.complete_habits(completions)
+    if not args.quiet:
+        print(f"Completed {sum(counts.values())} times: "
+              + ", ".join(f"'{habit_name}' ({count})" for habit_name, count in counts.items()) + ".")
+    return EXIT_OK
+
+
+def stats(user, args):
+    """
+    Prints the current and longest streak of every habit (read from the materialized streaks, see habit_stats.py).
+    """
+    all_streaks = user.compute_all_streaks()
+    if args.periodicity:
+        all_streaks = {name: streaks for name, streaks in all_streaks.items()
+                       if streaks["periodicity"] == args.periodicity}
+    if args.json:
+        print(json.dumps({"user": user.username, "habits": all_streaks}))
+    else:
+        for habit_name, streaks in all_streaks.items():
+            print(f"{habit_name}\t{streaks['periodicity']}\tcurrent {streaks['current']} {streaks['unit']}\t"
+                  f"longest {streaks['longest']} {streaks['unit']}")
+    return EXIT_OK
+
+
+def list_habits(user, args):
+    """
+    Prints the habits of the user, optionally only those of one periodicity.
+    """
+    habits = user.get_habits(args.periodicity)
+    if args.json:
+        print(json.dumps([{"habit_name": hab.habit_name, "periodicity": hab.periodicity,
+                           "datetime_creation": hab.datetime_creation.isoformat(sep=" ")} for hab in habits]))
+    else:
+        for hab in habits:
+            print(f"{hab.habit_name}\t{hab.periodicity}")
+    return EXIT_OK
+
+
+def show_leaderboard(user, args):
+    """
+    Prints the users with the longest (or current) streaks per habit, one page of --limit users per habit.
+    """
+    entries = leaderboard.compute(database.get_read_connection(), args.habit, args.periodicity, args.by,
+                                  args.limit, args.limit * (args.page - 1))
+    if args.json:
+        print(json.dumps(entries))
+    else:
+        for entry in entries:
+            print(f"{entry['habit_name']}\t{entry['periodicity']}\t{entry['rank']}.\t{entry['owner']}\t"
+                  f"longest {entry['longest']}\tcurrent {entry['current']}")
+    return EXIT_OK
+
+
+def at_risk(user, args):
+    """
+    Lists the habits whose streak breaks within the next --within hours (see scheduler.py) and hands each of them
+    to the local command given with --notify.
+    """
+    due = scheduler.AtRiskScheduler().seed(user.conn, user.username).pop_due(window=timedelta(hours=args.within))
+    if args.json:
+        print(json.dumps([scheduler.as_dict(entry) for entry in due]))
+    else:
+        scheduler.notify(due)
+    if args.notify:
+        scheduler.notify(due, scheduler.command_sink(args.notify))
+    return EXIT_OK
+
+
+HANDLERS = {"complete": complete, "complete-many": complete_many, "stats": stats, "list": list_habits,
+            "leaderboard": show_leaderboard, "at-risk": at_risk}
+
+
+# ARGUMENTS
+def build_parser():
+    """
+    The argument parser with one sub-parser per command.
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--user", default=os.environ.get(USER_VARIABLE),
+                        help=f"the username (default: environment variable {USER_VARIABLE})")
+    common.add_argument("--password-stdin", action="store_true",
+                        help=f"read the password from the standard input instead of {PASSWORD_VARIABLE}")
+    database.add_argument(common)
+    profiler.add_argument(common)
+
+    parser = argparse.ArgumentParser(prog="healthup", description="Health Up without prompts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    complete_parser = commands.add_parser("complete", parents=[common], help="mark a habit as completed")
+    complete_parser.add_argument("--habit", required=True)
+    complete_parser.add_argument("--at", help="date and time of the completion (YYYY-MM-DD HH:MM:SS), default now")
+    complete_parser.add_argument("--quiet", action="store_true", help="print nothing on success")
+
+    complete_many_parser = commands.add_parser("complete-many", parents=[common],
+                                               help="mark many habits as completed or backfill past completions")
+    complete_many_parser.add_argument("--habit", action="append", default=[], help="a habit name (repeatable)")
+    complete_many_parser.add_argument("--at", help="date and time of the --habit completions, default now")
+    complete_many_parser.add_argument("--file", help="CSV file of completions (habit_name, datetime_completion), "
+                                                     "- for the standard input")
+    complete_many_parser.add_argument("--quiet", action="store_true", help="print nothing on success")
+
+    for name, help_text in (("stats", "show the current and longest streaks"), ("list", "list the habits")):
+        command_parser = commands.add_parser(name, parents=[common], help=help_text)
+        command_parser.add_argument("--periodicity", choices=["daily", "weekly", "monthly"])
+        command_parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+
+    leaderboard_parser = commands.add_parser("leaderboard", parents=[common],
+                                             help="rank all users by their streaks per habit")
+    leaderboard_parser.add_argument("--habit", help="only this habit name")
+    leaderboard_parser.add_argument("--periodicity", choices=["daily", "weekly", "monthly"])
+    leaderboard_parser.add_argument("--by", choices=leaderboard.ORDERS, default="longest")
+    leaderboard_parser.add_argument("--limit", type=int, default=leaderboard.LIMIT, help="users per habit and page")
+    leaderboard_parser.add_argument("--page", type=int, default=1)
+    leaderboard_parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+
+    at_risk_parser = commands.add_parser("at-risk", parents=[common],
+                                         help="list the habits whose streak breaks soon")
+    at_risk_parser.add_argument("--within", type=float, default=scheduler.WINDOW.total_seconds() / 3600,
+                                help="hours from now (default: %(default)s)")
+    at_risk_parser.add_argument("--notify", metavar="COMMAND",
+                                help="local command run for every habit, which gets the habit as JSON on stdin")
+    at_risk_parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    return parser
+
+
+def read_password(args, stdin=None):
+    """
+    The password from the standard input (--password-stdin) or the environment variable, None if there is none.
+    """
+    if args.password_stdin:
+        return (stdin or sys.stdin).readline().rstrip("\n")
+    return os.environ.get(PASSWORD_VARIABLE)
+
+
+# command line entry point
+def main(argv=None):
+    """
+    Runs one command, see the usage at the top of this document.
+
+    Returns
+    -------
+    :return: int
+        the exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "complete-many" and not (args.habit or args.file):
+        parser.error("complete-many needs --habit or --file")
+    if args.command in ("complete", "complete-many") and args.at:
+        try:
+            datetime.fromisoformat(args.at)
+        except ValueError:
+            parser.error(f"--at: invalid date and time '{args.at}'")
+    if args.command == "leaderboard" and (args.limit < 1 or args.page < 1):
+        parser.error("--limit and --page must be at least 1")
+
+    password = read_password(args)
+    if not args.user or password is None:
+        print(f"No user or password given (--user / {USER_VARIABLE}, {PASSWORD_VARIABLE} / --password-stdin).",
+              file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.db:
+        database.configure(args.db)
+    profiler.configure(args.profile)
+    initial.start_database()
+    user = initial.authenticate(args.user, password)
+    if user is None:
+        print("Unknown user or wrong password.", file=sys.stderr)
+        return EXIT_AUTHENTICATION
+    return HANDLERS[args.command](user, args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+"""
+This document contains the completion calendar of a habit: one bit per period (day, week or month, see the period
+keys of streak_engine.py) that is set if the habit was completed at least once in that period.
+
+Bit 0 is the period of calendar_origin, the period the habit was created in (or the period of its oldest
+completion, if imported history goes back further). The bits are stored as a little-endian BLOB in the column
+habits.calendar next to the habit, so ten years of daily history take about 460 bytes.
+With the calendar
+* 'done this period?' is a single bit test
+* the current streak is the run of set bits that ends in the current period and the longest streak the longest
+  run of set bits, both found by scanning the bits and not the progress rows
+* the number of completed periods in a range is a population count
+
+The calendars are kept up to date by habit_stats.py together with the streak state (record_completion(), rebuild()).
+The calendar of a stale habit (progress inserted through the view legacy_progress) is built from its progress by
+load() until habit_stats.py recomputes it.
+
+It imports the library datetime and streak_engine.py for the period keys.
+"""
+from datetime import datetime
+import streak_engine
+
+
+# THE COMPLETION CALENDAR.
+class CompletionCalendar:
+    """
+    Attributes
+    ----------
+    periodicity: str
+        'daily', 'weekly' or 'monthly'
+    origin: int
+        period key of bit 0
+    bits: int
+        bit i is set if the habit was completed in the period origin + i
+
+    Methods
+    -------
+    mark(moment)
+        sets the bit of the period of a completion
+    is_done(moment)
+        checks if the habit was completed in the period of moment (default now)
+    current_streak(now)
+        the number of consecutive completed periods up to the current one
+    longest_streak()
+        the highest number of consecutive completed periods
+    count(first, last)
+        the number of completed periods from the period of first to the period of last
+    to_blob()
+        the bits as bytes, the value of habits.calendar
+    """
+
+    def __init__(self, periodicity, origin, bits=0):
+        """
+        :param periodicity: str
+            'daily', 'weekly' or 'monthly'
+        :param origin: int
+            period key of bit 0
+        :param bits: int
+            the completed periods relative to origin
+        """
+        self.periodicity = periodicity
+        self.origin = origin
+        self.bits = bits
+
+    @classmethod
+    def from_blob(cls, periodicity, origin, blob):
+        """
+        The calendar stored in habits.calendar / habits.calendar_origin.
+        """
+        return cls(periodicity, origin, int.from_bytes(blob or b"", "little"))
+
+    @classmethod
+    def from_keys(cls, periodicity, keys, origin):
+        """
+        The calendar of a collection of period keys (any order, duplicates allowed). origin is lowered to the oldest
+        key if needed.
+        """
+        keys = [int(key) for key in keys]
+        if keys:
+            origin = min(origin, min(keys))
+        # set in a bytearray, every update of a large int would copy all its bytes
+        blob = bytearray((max(keys) - origin) // 8 + 1 if keys else 0)
+        for key in keys:
+            blob[(key - origin) >> 3] |= 1 << ((key - origin) & 7)
+        return cls.from_blob(periodicity, origin, bytes(blob))
+
+    def to_blob(self):
+        """
+        The bits as little-endian bytes (bit i is bit i % 8 of byte i // 8).
+        """
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+
+    def _key(self, moment):
+        return streak_engine.period_key(moment or datetime.now(), self.periodicity)
+
+    # UPDATES
+    def mark_key(self, key):
+        """
+        Sets the bit of a period key. A period before the origin moves the origin back.
+        """
+        if key < self.origin:
+            self.bits <<= self.origin - key
+            self.origin = key
+        self.bits |= 1 << (key - self.origin)
+
+    def mark(self, moment):
+        """
+        Sets the bit of the period a completion (datetime) falls into.
+        """
+        self.mark_key(self._key(moment))
+
+    # QUERIES
+    def is_done(self, moment=None):
+        """
+        True if the habit was completed in the period of moment (default: the current period).
+        """
+        index = self._key(moment) - self.origin
+        return index >= 0 and bool(self.bits >> index & 1)
+
+    def current_streak(self, now=None):
+        """
+        The run of set bits that ends in the current period, 0 if the current period is not completed yet
+        (same definition as UserClass.compute_streak()).
+        """
+        index = self._key(now) - self.origin
+        if index < 0 or not self.bits >> index & 1:
+            return 0
+        # the highest unset bit below the current period ends the run
+        gaps = ~self.bits & ((1 << (index + 1)) - 1)
+        return index + 1 if gaps == 0 else index - gaps.bit_length() + 1
+
+    def longest_streak(self):
+        """
+        The longest run of set bits.
+        """
+        return max(len(run) for run in bin(self.bits)[2:].split("0"))
+
+    def count(self, first=None, last=None):
+        """
+        The number of completed periods from the period of first (default: the origin) up to and including the
+        period of last (default: the current period).
+        """
+        low = max(self._key(first) - self.origin, 0) if first is not None else 0
+        high = self._key(last) - self.origin
+        if high < low:
+            return 0
+        return bin(self.bits >> low & ((1 << (high - low + 1)) - 1)).count("1")
+
+
+# STORAGE IN THE TABLE HABITS
+
+def load(cur, habit_id, periodicity):
+    """
+    Reads the calendar of a habit. A habit without a calendar yet starts at the period of its creation.
+    The calendar of a habit whose progress was changed through the view legacy_progress (a stale habit, see
+    habit_stats.py) is built from the period keys of its progress instead.
+    """
+    cur.execute("""SELECT calendar, calendar_origin, datetime_creation,
+                          EXISTS(SELECT 1 FROM stale_habits WHERE habit_id = habits.habit_id)
+                   FROM habits WHERE habit_id = ?;""", (habit_id,))
+    blob, origin, datetime_creation, stale = cur.fetchone()
+    if stale:
+        cur.execute("SELECT period_key FROM progress WHERE habit_id = ?;", (habit_id,))
+        keys = [row[0] for row in cur.fetchall()]
+        return CompletionCalendar.from_keys(periodicity, keys, streak_engine.period_key(datetime_creation, periodicity))
+    if origin is None:
+        origin = streak_engine.period_key(datetime_creation, periodicity)
+    return CompletionCalendar.from_blob(periodicity, origin, blob)
+
+
+def store(cur, habit_id, calendar):
+    """
+    Writes the calendar of a habit into habits.calendar / habits.calendar_origin.
+    """
+    cur.execute("UPDATE habits SET calendar = ?, calendar_origin = ? WHERE habit_id = ?;",
+                (calendar.to_blob(), calendar.origin, habit_id))
@@ -0,0 +1,310 @@
+"""
+This document contains the connection manager of the database.
+All parts of the programme (UserClass, HabitClass and initial.py) get their connection from here instead of opening
+their own one. Every thread reuses a single connection, which is closed explicitly (or at the latest when the
+programme exits), so no file descriptors are leaked during long sessions.
+The pragmas every connection is configured with are also defined in this document.
+
+A database file runs in WAL mode (set by initial.start_database()). Besides its connection for the writes every
+thread can get a read-only connection (mode=ro) for the analytics queries, get_read_connection(): its reads see the
+last committed state without waiting for the writers, and the writers commit while a long read is still running.
+read_snapshot() runs several queries on the same snapshot.
+
+The location of the database is configured in one place as well. In order of priority:
+* the API: database.configure(path), database.use_temporary_file()
+* the command line flag --db (see add_argument())
+* the environment variable HEALTHUP_DB
+* healthup.db next to the code
+Besides a file path, ':memory:' selects a shared-cache in-memory database that all threads of the process see.
+
+It imports the libraries sqlite3, threading, atexit, os, shutil, tempfile and urllib, the profiler (profiler.py) and the
+streak cache (streak_cache.py), which is emptied when the connections are closed.
+"""
+import sqlite3
+import threading
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from os.path import join, dirname, abspath
+from urllib.request import pathname2url
+
+import profiler
+import streak_cache
+
+# location of the database file if nothing else is configured
+DEFAULT_DB_PATH = join(dirname(abspath(__file__)), 'healthup.db')
+ENV_VARIABLE = "HEALTHUP_DB"
+MEMORY = ":memory:"
+
+# journal mode of a database file, set once by initial.start_database() and stored in the file
+JOURNAL_MODE = "WAL"
+
+# location (file path or URI) all new connections are opened with, changed with configure()
+DB_PATH = os.environ.get(ENV_VARIABLE) or DEFAULT_DB_PATH
+
+# pragmas that are executed on every new connection
+PRAGMAS = {
+    "synchronous": "FULL",
+    "cache_size": -16000,   # negative value --> size in KiB, i.e. 16 MB page cache per connection
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,   # milliseconds to wait for a lock before 'database is locked' is raised
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_open_connections = set()
+
+# an in-memory database only lives as long as a connection to it is open
+_memory_keeper = None
+_memory_names = itertools.count(1)
+_temporary_file = None
+
+
+# CONFIGURATION OF THE LOCATION
+
+def configure(path=None):
+    """
+    Sets the database all following connections use. Connections to the previous database are closed.
+
+    Parameters
+    ----------
+    :param path: str
+        a file path, ':memory:' for a new shared-cache in-memory database, or None to go back to the
+        environment variable HEALTHUP_DB / the default healthup.db
+
+    Returns
+    -------
+    :return: str
+        the location the connections are opened with
+    """
+    global DB_PATH, _memory_keeper
+    _release()
+
+    path = path or os.environ.get(ENV_VARIABLE) or DEFAULT_DB_PATH
+    if path == MEMORY:
+        # a unique name per configure() call, so every call starts with an empty database
+        path = f"file:healthup-{os.getpid()}-{next(_memory_names)}?mode=memory&cache=shared"
+        _memory_keeper = sqlite3.connect(path, uri=True, check_same_thread=False)
+    DB_PATH = path
+    return DB_PATH
+
+
+def _release():
+    """
+    Closes all connections and frees the in-memory database or temporary file of the current configuration.
+    """
+    global _memory_keeper, _temporary_file
+    close_all()
+    if _memory_keeper is not None:
+        _memory_keeper.close()
+        _memory_keeper = None
+    if _temporary_file is not None:
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            if os.path.exists(_temporary_file + suffix):
+                os.remove(_temporary_file + suffix)
+        _temporary_file = None
+
+
+def use_temporary_file(copy_of=None):
+    """
+    Configures a new temporary database file, which is deleted on the next configure() or at exit.
+    Used by the tests and benchmarks, so they do not share (or change) healthup.db.
+
+    Parameters
+    ----------
+    :param copy_of: str
+        path of a database file the temporary file starts as a copy of, an empty database if None
+    """
+    global _temporary_file
+    handle, path = tempfile.mkstemp(prefix="healthup-", suffix=".db")
+    os.close(handle)
+    if copy_of is not None:
+        shutil.copyfile(copy_of, path)
+    configure(path)
+    _temporary_file = path
+    return path
+
+
+def add_argument(parser):
+    """
+    Adds the flag --db to an argparse parser. Pass the parsed value to configure().
+    """
+    parser.add_argument("--db", default=None,
+                        help=f"database file or '{MEMORY}' (default: ${ENV_VARIABLE} or healthup.db next to the code)")
+
+
+# a new connection with the pragmas applied
+def connect(path=None, read_only=False):
+    """
+    Opens a new connection and applies the PRAGMAS to it.
+    The caller owns the connection and has to close it. Most code should use get_connection() instead.
+
+    Parameters
+    ----------
+    :param path: str
+        path or 'file:' URI of the database, defaults to the configured DB_PATH
+    :param read_only: bool
+        open a database file with mode=ro, every write fails with sqlite3.OperationalError
+        (an in-memory database cannot be opened read-only)
+    """
+    path = path or DB_PATH
+    if read_only:
+        if path.startswith("file:"):
+            raise ValueError(f"Only a database file can be opened read-only, not '{path}'.")
+        path = f"file:{pathname2url(abspath(path))}?mode=ro"
+    # while the profiler is enabled every statement is timed (see profiler.py)
+    factory = profiler.ProfiledConnection if profiler.ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(path, uri=path.startswith("file:"), check_same_thread=False, factory=factory)
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+# the connection of the current thread
+def get_connection():
+    """
+    Returns the connection of the current thread. It is opened on first use and reused afterwards.
+
+    Returns
+    -------
+    :return: sqlite3.Connection
+    """
+    conn = getattr(_local, "conn", None)
+    # a connection closed by close_all() from another thread is replaced as well
+    if conn is None or conn not in _open_connections:
+        conn = connect()
+        _local.conn = conn
+        with _lock:
+            _open_connections.add(conn)
+    return conn
+
+
+# the read-only connection of the current thread, for the analytics queries
+def get_read_connection():
+    """
+    Returns the read-only connection (mode=ro) of the current thread. It is opened on first use and reused afterwards.
+    In WAL mode its reads neither wait for the writers nor block them, see enable_wal().
+    An in-memory database cannot be opened read-only, the connection of get_connection() is returned instead.
+
+    Returns
+    -------
+    :return: sqlite3.Connection
+    """
+    if DB_PATH.startswith("file:"):
+        return get_connection()
+    conn = getattr(_local, "read_conn", None)
+    if conn is None or conn not in _open_connections:
+        conn = connect(read_only=True)
+        _local.read_conn = conn
+        with _lock:
+            _open_connections.add(conn)
+    return conn
+
+
+@contextmanager
+def read_snapshot():
+    """
+    Context manager around the read-only connection of the current thread. All queries inside the with-block read
+    the same snapshot of the database, commits of other connections in the meantime are not seen.
+
+    Example
+    -------
+    with database.read_snapshot() as conn:
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+        habits = conn.execute("SELECT COUNT(*) FROM habits").fetchone()
+    """
+    conn = get_read_connection()
+    if conn.in_transaction:
+        # nested, or the write connection of an in-memory database in the middle of a transaction
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+
+
+def enable_wal(conn):
+    """
+    Switches a database file to the JOURNAL_MODE (WAL), in which readers and the writer do not block each other.
+    The mode is stored in the file, so it only has to be set once. An in-memory database keeps its journal.
+
+    Returns
+    -------
+    :return: str
+        the journal mode of the database ('wal', 'memory' for an in-memory database)
+    """
+    return conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}").fetchone()[0]
+
+
+def thread_connections():
+    """
+    Returns the open connections (read-write and read-only) of the current thread.
+    """
+    connections = [getattr(_local, "conn", None), getattr(_local, "read_conn", None)]
+    with _lock:
+        return [conn for conn in connections if conn is not None and conn in _open_connections]
+
+
+def close_connections(connections):
+    """
+    Closes the given connections, e.g. the ones of worker threads that have ended (see thread_connections()).
+    """
+    for conn in connections:
+        with _lock:
+            _open_connections.discard(conn)
+        streak_cache.forget(conn)
+        conn.close()
+
+
+def close_connection():
+    """
+    Closes the connections (read-write and read-only) of the current thread. The next get_connection() call opens a
+    new one.
+    """
+    connections = thread_connections()
+    _local.conn = None
+    _local.read_conn = None
+    close_connections(connections)
+
+
+def close_all():
+    """
+    Closes the connections of all threads. Called automatically when the programme exits.
+    """
+    with _lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        conn.close()
+    _local.conn = None
+    _local.read_conn = None
+    streak_cache.clear()
+
+
+@contextmanager
+def connection():
+    """
+    Context manager around the connection of the current thread.
+    Everything executed inside the with-block is committed at the end or rolled back if an exception occurs.
+
+    Example
+    -------
+    with database.connection() as conn:
+        conn.execute("INSERT INTO users(username, password, firstname, lastname) VALUES(?, ?, ?, ?)", user_data)
+    """
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# at exit, the temporary file and in-memory database are released as well
+atexit.register(_release)
@@ -1,9 +1,10 @@
 """
 This document contains the Habit Class.
-It imports sqlite3.
+A habit is a plain record of its data, it holds no database connection. Storing and loading habits is done by the
+UserClass (see User.py).
+It imports the library datetime.
 """
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # THE HABIT CLASS.
 class HabitClass:
@@ -20,6 +21,8 @@ class HabitClass:
     datetime_creation: datetime
         the date and time of when the habit is first created
     """
+    # fixed attributes, so every instance is a compact record without a __dict__
+    __slots__ = ("habit_name", "owner", "periodicity", "datetime_creation")
 
     # INIT METHOD.
     def __init__(self, habit_name, owner, periodicity, datetime_creation):
@@ -29,18 +32,26 @@ class HabitClass:
         :param owner: str
             the owner aka the user who the habit belongs to
         :param periodicity: str
-            the periodicity of the habit which can be 'weekly'  or 'daily'
+            the periodicity of the habit which can be 'monthly', 'weekly'  or 'daily'
         :param datetime_creation: datetime
-            the date and time of when the habit was first created
+            the date and time of when the habit was first created (a text as stored in the database is converted)
         """
         self.habit_name = habit_name
         self.owner = owner
         self.periodicity = periodicity
-        self.datetime_creation = datetime.now()
+        if isinstance(datetime_creation, str):
+            datetime_creation = datetime.fromisoformat(datetime_creation)
+        self.datetime_creation = datetime_creation
 
-        from os.path import join, dirname, abspath
-        db_path = join(dirname(abspath(__file__)), 'healthup.db')
+    def __repr__(self):
+        return (f"HabitClass({self.habit_name!r}, {self.owner!r}, {self.periodicity!r}, "
+                f"{self.datetime_creation!r})")
 
-        self.conn = sqlite3.connect(db_path)
-        self.cur = self.conn.cursor()
+    def __eq__(self, other):
+        if not isinstance(other, HabitClass):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
 
+    # equal habits have the same hash, so habits can still be used in sets and as dict keys
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
@@ -0,0 +1,345 @@
+"""
+This document contains the materialized streak state of all habits (table 'habit_stats').
+
+For every habit (habit_id) the table holds the current streak, the longest streak and the key of the last period in
+which the habit was completed. Every completion (User.insert_completion(), used by UserClass.complete_habit() and
+is_completed()) advances the row in one step together with the progress insert, so the overview screens can read the
+streaks without going through the whole progress history. The completion calendar of the habit is read and written
+back as a whole with it, a cost that grows with the number of periods since the creation of the habit (one bit
+each, about 460 bytes for ten years of daily history).
+
+The periods are identified by the integer period keys of streak_engine.py.
+The completion calendar of every habit (habits.calendar, see completion_calendar.py) is derived from the same
+period keys and is kept up to date here as well.
+
+Completions inserted through the view legacy_progress (CSV files, older tools) bypass this document. Their trigger
+marks the habit as stale (table stale_habits, see migrations.add_stale_habits()); a stale habit is recomputed by its
+next completion, by refresh() (called at the start of the programme) or by a rebuild, and until then read() and the
+UserClass compute its streaks from the progress.
+
+The state can be recomputed from the raw progress table at any time:
+    python habit_stats.py rebuild [--verify]
+With --verify the recomputed values are compared with UserClass.compute_streak() and compute_longest_streak_habit().
+
+It imports the libraries datetime, itertools and argparse, streak_engine.py for the period keys and
+completion_calendar.py.
+"""
+import argparse
+from datetime import datetime
+from itertools import groupby
+import completion_calendar
+import streak_engine
+
+
+# one step of the streak computation
+def advance(state, key):
+    """
+    Returns the new (current_streak, longest_streak, last_period_key) after a completion in the period 'key'.
+    A second completion in the same period does not change the state.
+
+    Parameters
+    ----------
+    :param state: tuple
+        (current_streak, longest_streak, last_period_key), last_period_key is None for a habit without progress
+    :param key: int
+        period key of the completion, must not be older than last_period_key
+    """
+    current, longest, last_key = state
+    if last_key is None or key > last_key + 1:
+        current = 1
+    elif key == last_key + 1:
+        current += 1
+    return current, max(longest, current), key if last_key is None else max(key, last_key)
+
+
+def state_from_keys(keys):
+    """
+    Computes the (current_streak, longest_streak, last_period_key) of a collection of period keys.
+    The runs are found by the streak engine (vectorized if NumPy is available).
+    """
+    if len(keys) == 0:
+        return 0, 0, None
+    last_key = int(max(keys))
+    current, longest = streak_engine.streaks_from_keys(keys, current_key=last_key)
+    return current, longest, last_key
+
+
+def current_streak(current, last_period_key, periodicity, now=None):
+    """
+    Returns the streak as it is shown to the user: a streak only counts if the habit was completed in the current
+    period (same definition as UserClass.compute_streak()).
+    """
+    if last_period_key is None or last_period_key != streak_engine.period_key(now or datetime.now(), periodicity):
+        return 0
+    return current
+
+
+# update after one completion, called by User.insert_completion() (UserClass.complete_habit() and is_completed())
+def record_completion(cur, habit_id, periodicity, moment):
+    """
+    Updates the streak state and the completion calendar of a habit after a new completion.
+    Runs on the cursor of the caller, so the update is part of the same transaction as the progress insert.
+    A completion older than the last recorded period (e.g. imported history) triggers a rebuild of the habit.
+    """
+    return record_completions(cur, habit_id, periodicity, [streak_engine.period_key(moment, periodicity)])
+
+
+# one update per batch, called by UserClass.complete_habits()
+def record_completions(cur, habit_id, periodicity, keys):
+    """
+    Updates the streak state and the completion calendar of a habit after a batch of completions (their period
+    keys), with one read and one write of each, however many completions the batch holds.
+    If the batch reaches back before the last recorded period (a backfill), the habit is rebuilt once.
+
+    Returns
+    -------
+    :return: tuple
+        the new (current_streak, longest_streak, last_period_key)
+    """
+    if is_stale(cur, habit_id):
+        # changed through legacy_progress, the progress already holds the new completions as well
+        return rebuild_habit(cur, habit_id, periodicity)
+    keys = sorted(set(keys))
+    calendar = completion_calendar.load(cur, habit_id, periodicity)
+    for key in keys:
+        calendar.mark_key(key)
+    completion_calendar.store(cur, habit_id, calendar)
+
+    cur.execute("SELECT current_streak, longest_streak, last_period_key FROM habit_stats WHERE habit_id = ?;",
+                (habit_id,))
+    row = cur.fetchone()
+    if row is not None and row[2] is not None and keys and keys[0] < row[2]:
+        return rebuild_habit(cur, habit_id, periodicity)
+
+    state = row if row is not None else (0, 0, None)
+    for key in keys:
+        state = advance(state, key)
+    store(cur, habit_id, state)
+    return state
+
+
+def store(cur, habit_id, state):
+    """
+    Writes the streak state of a habit into habit_stats (insert or update).
+    """
+    cur.execute("""INSERT INTO habit_stats(habit_id, current_streak, longest_streak, last_period_key)
+                   VALUES(?, ?, ?, ?)
+                   ON CONFLICT(habit_id) DO UPDATE SET
+                       current_streak = excluded.current_streak,
+                       longest_streak = excluded.longest_streak,
+                       last_period_key = excluded.last_period_key;""",
+                (habit_id,) + tuple(state))
+
+
+# REBUILD FROM THE RAW PROGRESS
+
+def rebuild_habit(cur, habit_id, periodicity):
+    """
+    Recomputes the streak state and the completion calendar of a single habit from its progress rows
+    (also needed after its periodicity changed).
+    """
+    cur.execute(f"SELECT {streak_engine.day_ordinal_sql()} FROM progress WHERE habit_id = ?;", (habit_id,))
+    days = [row[0] for row in cur.fetchall()]
+    keys = streak_engine.period_keys_from_days(days, periodicity)
+    state = state_from_keys(keys)
+    store(cur, habit_id, state)
+    cur.execute("SELECT datetime_creation FROM habits WHERE habit_id = ?;", (habit_id,))
+    origin = streak_engine.period_key(cur.fetchone()[0], periodicity)
+    calendar = completion_calendar.CompletionCalendar.from_keys(periodicity, keys, origin)
+    completion_calendar.store(cur, habit_id, calendar)
+    cur.execute("DELETE FROM stale_habits WHERE habit_id = ?;", (habit_id,))
+    return state
+
+
+def rebuild(conn, owner=None, commit=True):
+    """
+    Recomputes habit_stats and the completion calendars from the progress table (for all users, or only for 'owner').
+    The progress is read in one ordered pass over the index idx_progress_habit.
+    With commit=False the caller is responsible for the transaction (used by the migrations).
+
+    Returns
+    -------
+    :return: dict
+        (owner, habit_name, periodicity) --> (current_streak, longest_streak, last_period_key)
+    """
+    query = ("SELECT u.username, h.habit_name, h.periodicity, h.habit_id, h.datetime_creation, "
+             f"{streak_engine.day_ordinal_sql('p.completed_at')} "
+             "FROM habits h JOIN users u ON u.user_id = h.owner_id JOIN progress p ON p.habit_id = h.habit_id "
+             "{} ORDER BY h.habit_id, p.completed_at;")
+    params = ()
+    if owner is not None:
+        query, params = query.format("WHERE u.username = ?"), (owner,)
+    else:
+        query = query.format("")
+
+    read_cur = conn.cursor()
+    write_cur = conn.cursor()
+    stats = {}
+    try:
+        # habits without progress keep an empty calendar, which starts at their creation
+        if owner is None:
+            write_cur.execute("DELETE FROM habit_stats;")
+            write_cur.execute("DELETE FROM stale_habits;")
+            write_cur.execute("UPDATE habits SET calendar = NULL, calendar_origin = NULL;")
+        else:
+            for table in ("habit_stats", "stale_habits"):
+                write_cur.execute(f"DELETE FROM {table} WHERE habit_id IN (SELECT h.habit_id FROM habits h "
+                                  "JOIN users u ON u.user_id = h.owner_id WHERE u.username = ?);", (owner,))
+            write_cur.execute("UPDATE habits SET calendar = NULL, calendar_origin = NULL WHERE owner_id = "
+                              "(SELECT user_id FROM users WHERE username = ?);", (owner,))
+        for habit_key, rows in groupby(read_cur.execute(query, params), key=lambda row: row[:5]):
+            owner_name, habit_name, periodicity, habit_id, datetime_creation = habit_key
+            days = [row[5] for row in rows]
+            keys = streak_engine.period_keys_from_days(days, periodicity)
+            state = state_from_keys(keys)
+            store(write_cur, habit_id, state)
+            calendar = completion_calendar.CompletionCalendar.from_keys(
+                periodicity, keys, streak_engine.period_key(datetime_creation, periodicity))
+            completion_calendar.store(write_cur, habit_id, calendar)
+            stats[owner_name, habit_name, periodicity] = state
+        if commit:
+            conn.commit()
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+    return stats
+
+
+# HABITS CHANGED THROUGH THE VIEW legacy_progress
+
+def is_stale(cur, habit_id):
+    """
+    True if the progress of the habit was changed through the view legacy_progress since its state was computed.
+    """
+    cur.execute("SELECT 1 FROM stale_habits WHERE habit_id = ?;", (habit_id,))
+    return cur.fetchone() is not None
+
+
+def state_from_progress(cur, habit_id):
+    """
+    Computes the (current_streak, longest_streak, last_period_key) of a habit from its progress rows without storing
+    it, e.g. for a stale habit on a read-only connection.
+    """
+    cur.execute("SELECT period_key FROM progress WHERE habit_id = ?;", (habit_id,))
+    return state_from_keys([row[0] for row in cur.fetchall()])
+
+
+def refresh(conn, commit=True):
+    """
+    Recomputes the streak state and the calendar of every stale habit (called by initial.start_database()).
+
+    Returns
+    -------
+    :return: int
+        the number of recomputed habits
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT s.habit_id, h.periodicity FROM stale_habits s JOIN habits h ON h.habit_id = s.habit_id;")
+    habits = cur.fetchall()
+    if not habits:
+        return 0
+    try:
+        for habit_id, periodicity in habits:
+            rebuild_habit(cur, habit_id, periodicity)
+        if commit:
+            conn.commit()
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+    return len(habits)
+
+
+def read(conn, owner=None):
+    """
+    Reads the streak state of all habits with progress (of all users or only of 'owner') as the overviews see it,
+    the state of a stale habit is computed from its progress.
+
+    Returns
+    -------
+    :return: dict
+        (owner, habit_name, periodicity) --> (current_streak, longest_streak, last_period_key), like rebuild()
+    """
+    cur = conn.cursor()
+    cur.execute("""SELECT u.username, h.habit_name, h.periodicity, h.habit_id, st.habit_id IS NOT NULL,
+                          s.current_streak, s.longest_streak, s.last_period_key
+                   FROM habits h JOIN users u ON u.user_id = h.owner_id
+                   LEFT JOIN habit_stats s ON s.habit_id = h.habit_id
+                   LEFT JOIN stale_habits st ON st.habit_id = h.habit_id
+                   WHERE (s.habit_id IS NOT NULL OR st.habit_id IS NOT NULL) AND (? IS NULL OR u.username = ?)
+                   ORDER BY h.habit_id;""", (owner, owner))
+    stats = {}
+    for username, habit_name, periodicity, habit_id, stale, *state in cur.fetchall():
+        stats[username, habit_name, periodicity] = state_from_progress(cur, habit_id) if stale else tuple(state)
+    return stats
+
+
+def verify(stats, now=None):
+    """
+    Compares the recomputed state and the completion calendars with the streak algorithms of the UserClass.
+
+    Returns
+    -------
+    :return: list
+        one tuple (owner, habit_name, periodicity, field, habit_stats value, UserClass value) for every difference,
+        field is 'current', 'longest', 'calendar current' or 'calendar longest'
+    """
+    import User
+
+    differences = []
+    users = {}
+    for (owner, habit_name, periodicity), (current, longest, last_key) in stats.items():
+        user = users.setdefault(owner, User.UserClass(owner, None, None, None))
+        expected_current = user.compute_streak(habit_name, periodicity)
+        expected_longest = user.compute_longest_streak_habit(habit_name, periodicity)
+        shown_current = current_streak(current, last_key, periodicity, now)
+        if shown_current != expected_current:
+            differences.append((owner, habit_name, periodicity, "current", shown_current, expected_current))
+        if longest != expected_longest:
+            differences.append((owner, habit_name, periodicity, "longest", longest, expected_longest))
+        calendar = user.get_calendar(habit_name)
+        if calendar.current_streak(now) != expected_current:
+            differences.append((owner, habit_name, periodicity, "calendar current", calendar.current_streak(now),
+                                expected_current))
+        if calendar.longest_streak() != expected_longest:
+            differences.append((owner, habit_name, periodicity, "calendar longest", calendar.longest_streak(),
+                                expected_longest))
+    return differences
+
+
+# command line entry point
+def main(argv=None):
+    """
+    'rebuild' recomputes habit_stats from the progress table, '--verify' additionally compares the result.
+    """
+    import database
+    import migrations
+
+    parser = argparse.ArgumentParser(description="Maintenance of the materialized streak state.")
+    parser.add_argument("command", choices=["rebuild"])
+    database.add_argument(parser)
+    parser.add_argument("--user", help="only rebuild the habits of this user")
+    parser.add_argument("--verify", action="store_true",
+                        help="compare the result with UserClass.compute_streak()/compute_longest_streak_habit()")
+    args = parser.parse_args(argv)
+    database.configure(args.db)
+
+    conn = database.get_connection()
+    migrations.migrate(conn)
+    stats = rebuild(conn, args.user)
+    print(f"Rebuilt the streaks of {len(stats)} habit(s).")
+
+    if args.verify:
+        differences = verify(stats)
+        for difference in differences:
+            print("Difference for {} / {} ({}): {} streak is {} in habit_stats but {} in UserClass".format(
+                *difference))
+        if not differences:
+            print("All streaks match the UserClass.")
+        return 1 if differences else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,226 @@
+"""
+This document contains the bulk CSV importer.
+
+CSV files like the ones in the data folder (healthup_users.csv, healthup_habits.csv and healthup_progress.csv) or
+production dumps are streamed in chunks into the database. Every chunk is written with executemany() and many chunks
+share one transaction, so a multi-GB file is not committed row by row.
+The header of a file decides the table: it has to contain exactly the columns of one table created by
+initial.start_database(). Files in the layout with usernames (like the ones in the data folder) are loaded through the
+views legacy_habits and legacy_progress, which resolve the integer keys (see migrations.introduce_surrogate_keys()).
+A completion loaded through legacy_progress in a period that already has one is counted in the existing row
+(progress.count), also with --ignore-duplicates: importing the same progress file twice counts every completion
+twice.
+After the load the streak state (habit_stats) is rebuilt once.
+
+Usage:
+    python importer.py data/healthup_users.csv data/healthup_habits.csv data/healthup_progress.csv
+    python importer.py dump.csv --chunk-size 50000 --defer-indexes
+
+It imports the libraries csv, sqlite3, time, itertools and argparse.
+"""
+import argparse
+import csv
+import sqlite3
+import time
+from itertools import islice
+
+import database
+import habit_stats
+import initial
+import streak_cache
+
+CHUNK_SIZE = 10000              # rows per executemany()
+TRANSACTION_SIZE = 500000       # rows per transaction
+
+TABLES = ("users", "habits", "progress", "legacy_habits", "legacy_progress")
+
+# the table the rows inserted into a view end up in (its indexes are the ones deferred)
+BASE_TABLES = {"legacy_habits": "habits", "legacy_progress": "progress"}
+
+# columns a CSV file may leave out because the database derives them (the integer keys, the completion calendar,
+# the number of completions per period)
+DERIVED_COLUMNS = {"users": {"user_id"}, "habits": {"habit_id", "calendar", "calendar_origin"},
+                   "progress": {"count"}}
+
+
+def table_columns(conn, table):
+    """
+    Returns the column names of a table in the order of the schema.
+    """
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# matching a CSV header with the schema
+def find_table(conn, header):
+    """
+    Returns the table whose columns are exactly the columns in the header of a CSV file.
+    Columns the database derives itself (DERIVED_COLUMNS) may be missing from the header.
+    Raises a ValueError naming the missing and unknown columns if no table matches.
+    """
+    columns = set(header)
+    if len(columns) != len(header):
+        raise ValueError(f"The header {header} contains a column twice.")
+
+    best_table, best_difference = None, None
+    for table in TABLES:
+        schema = set(table_columns(conn, table))
+        derived = DERIVED_COLUMNS.get(table, set())
+        if columns <= schema and schema - columns <= derived:
+            return table
+        difference = (sorted(schema - columns - derived), sorted(columns - schema))
+        if best_difference is None or len(difference[0]) + len(difference[1]) < \
+                len(best_difference[0]) + len(best_difference[1]):
+            best_table, best_difference = table, difference
+    raise ValueError(f"The header {header} does not match any table. Closest table is '{best_table}' "
+                     f"(missing columns: {best_difference[0]}, unknown columns: {best_difference[1]}).")
+
+
+# dropping and recreating indexes around a load
+def drop_indexes(conn, table):
+    """
+    Drops the secondary indexes of a table and returns their CREATE statements so they can be restored afterwards.
+    Indexes SQLite creates itself (primary keys and UNIQUE constraints) and unique indexes are kept, the rows are
+    checked against them (e.g. the upsert of the progress per period).
+    """
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                        "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%';", (table,)).fetchall()
+    for name, _ in rows:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    return [sql for _, sql in rows]
+
+
+def create_indexes(conn, statements):
+    """
+    Executes the CREATE INDEX statements returned by drop_indexes().
+    """
+    for statement in statements:
+        conn.execute(statement)
+    conn.commit()
+
+
+# import of a single file
+def import_file(conn, path, chunk_size=CHUNK_SIZE, transaction_size=TRANSACTION_SIZE, defer_indexes=False,
+                ignore_duplicates=False):
+    """
+    Streams a CSV file into the matching table.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param path: str
+        path of the CSV file, the first line has to be the header
+    :param chunk_size: int
+        number of rows that are inserted with one executemany()
+    :param transaction_size: int
+        number of rows after which the transaction is committed
+    :param defer_indexes: bool
+        drop the indexes of the table before the load and create them again afterwards
+    :param ignore_duplicates: bool
+        skip rows that violate a primary key or unique constraint instead of aborting the import. Rows loaded
+        through the view legacy_progress never conflict, a completion in a period that already has one is counted
+        in progress.count instead of being skipped
+
+    Returns
+    -------
+    :return: tuple
+        (table, number of rows, seconds)
+    """
+    start = time.perf_counter()
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        header = [column.strip() for column in next(reader)]
+        table = find_table(conn, header)
+
+        placeholders = ", ".join("?" for _ in header)
+        verb = "INSERT OR IGNORE" if ignore_duplicates else "INSERT"
+        statement = f"{verb} INTO {table}({', '.join(header)}) VALUES({placeholders})"
+
+        index_statements = drop_indexes(conn, BASE_TABLES.get(table, table)) if defer_indexes else []
+        rows = 0
+        uncommitted = 0
+        try:
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    break
+                for number, row in enumerate(chunk, start=rows + 2):
+                    if len(row) != len(header):
+                        raise ValueError(f"{path}, line {number}: expected {len(header)} values, got {len(row)}.")
+                conn.executemany(statement, chunk)
+                rows += len(chunk)
+                uncommitted += len(chunk)
+                if uncommitted >= transaction_size:
+                    conn.commit()
+                    uncommitted = 0
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            create_indexes(conn, index_statements)
+    return table, rows, time.perf_counter() - start
+
+
+def import_files(paths, chunk_size=CHUNK_SIZE, transaction_size=TRANSACTION_SIZE, defer_indexes=False,
+                 ignore_duplicates=False):
+    """
+    Imports several CSV files (in the given order) and rebuilds habit_stats once at the end.
+    Prints the throughput of every file.
+
+    Returns
+    -------
+    :return: int
+        the total number of imported rows
+    """
+    initial.start_database()
+    conn = database.get_connection()
+    total_rows = 0
+    total_seconds = 0.0
+    for path in paths:
+        table, rows, seconds = import_file(conn, path, chunk_size, transaction_size, defer_indexes,
+                                           ignore_duplicates)
+        total_rows += rows
+        total_seconds += seconds
+        print(f"{path}: {rows} rows into '{table}' in {seconds:.2f}s ({rows / max(seconds, 1e-9):.0f} rows/sec)")
+
+    # the progress was written by the connection of this thread, which PRAGMA data_version does not report
+    streak_cache.clear()
+    start = time.perf_counter()
+    habit_stats.rebuild(conn)
+    print(f"Rebuilt the streak state in {time.perf_counter() - start:.2f}s.")
+    print(f"Total: {total_rows} rows in {total_seconds:.2f}s ({total_rows / max(total_seconds, 1e-9):.0f} rows/sec)")
+    return total_rows
+
+
+# command line entry point
+def main(argv=None):
+    """
+    Imports the CSV files given on the command line, see the usage at the top of this document.
+    """
+    parser = argparse.ArgumentParser(description="Bulk import of CSV files into the HealthUp database.")
+    parser.add_argument("files", nargs="+", help="CSV files, imported in the given order")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per executemany()")
+    parser.add_argument("--transaction-size", type=int, default=TRANSACTION_SIZE, help="rows per transaction")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop the indexes during the load and create them afterwards")
+    parser.add_argument("--ignore-duplicates", action="store_true",
+                        help="skip rows that already exist instead of aborting (completions in the layout with "
+                             "usernames are counted again, see progress.count)")
+    database.add_argument(parser)
+    args = parser.parse_args(argv)
+    database.configure(args.db)
+
+    try:
+        import_files(args.files, args.chunk_size, args.transaction_size, args.defer_indexes, args.ignore_duplicates)
+    except (ValueError, OSError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
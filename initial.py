@@ -5,11 +5,16 @@ It imports the library 'questionary' as the Command Line Interface (CLI) that gu
 as well as checks the user input. For user authentication (register and login) it additionally performs password check.
 It imports User.py to get accesses to the UserClass.
 Following libraries are used: questionary, sqlite3 and hashlib.
+questionary is only imported by the functions that show a prompt, authenticate() checks a password without one
+(used by cli.py).
+The schema itself is maintained in migrations.py.
 """
-import questionary
 import sqlite3
 import hashlib
 import User
+import database
+import habit_stats
+import migrations
 
 # Database launch
 # generates 3 tables: User (user data information); Habit( all habit-related data)
@@ -23,42 +28,22 @@ def start_database():
     * users --> for all user data
     * habits --> for all habits across all users
     * progress --> for all progress data across users
-    """
-    from os.path import join, dirname, abspath
-    db_path = join(dirname(abspath(__file__)), 'healthup.db')
 
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
+    The schema is versioned (see migrations.py), older database files are upgraded in place.
+    A database file is switched to WAL mode.
+    """
     try:
-        c.execute("""CREATE TABLE IF NOT EXISTS users (
-                    username text PRIMARY KEY,
-                    password text,
-                    firstname text,
-                    lastname text
-                    )""")
-
-        c.execute("""CREATE TABLE IF NOT EXISTS habits (
-                      habit_name TEXT PRIMARY KEY,
-                      owner TEXT NOT NULL, 
-                      periodicity TEXT NOT NULL,
-                      datetime_creation DATETIME NOT NULL,
-                      FOREIGN KEY(owner) REFERENCES users(username)
-                      )""" )
-
-        c.execute("""CREATE TABLE IF NOT EXISTS progress (
-                  habit_name text,
-                  periodicity text, 
-                  owner text, 
-                  datetime_completion datetime
-                  )""")
-        conn.commit()
+        # tables and indexes are created by the migrations, nothing is executed if the schema is up-to-date
+        migrations.migrate(database.get_connection())
+        # habits changed through the view legacy_progress by other tools (see habit_stats.refresh())
+        habit_stats.refresh(database.get_connection())
+        # readers and writers do not block each other (see database.get_read_connection())
+        database.enable_wal(database.get_connection())
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     except Exception as e:
         print(f"An error occurred: {e}")
-    finally:
-        conn.close()
 
 # Following part is for user set up
 # User have to register by entering Username, password, first and lastname (data is stored in db)
@@ -72,36 +57,43 @@ def register_user():
     The input is limited to letters except for Username and password (allowed to contain numbers).
     The user is created and the data is saved in the database.
     The username is the primary key and can only exist once. If the username already exists, the user is asked to choose another one.
+
+    Returns
+    -------
+    :return: UserClass instance of the new user
     """
-    username = questionary.text("Choose a username.",
-                                  validate=lambda text: True if len(text)>0 and text.isalnum()
-                                  else "Please enter a correct value. "
-                                       "A Username can contain numbers and letters").ask()
-    password = questionary.password( "Enter a password.",
-                                      validate=lambda text: True if len(text)>= 8 and text.isalnum()
-                                      else "Your password must be at least 8 characters long and can "
-                                           "contain upper and lower case letters and numbers.").ask()
-    firstname = questionary.text("What's your first name? ",
-                                   validate=lambda text: True if len(text)>0 and text.isalpha()
-                                   else "Please enter a correct value. "
-                                        "Your name should only contain upper and lowercase letters.").ask()
-    lastname = questionary.text("Please enter your last name. ",
-                                  validate=lambda text: True if len(text)>0 and text.isalpha()
-                                  else "Please enter a correct value. "
-                                       "Your name should only contain upper and lowercase letters.").ask()
-    # using hashlib to hash password
-    password = hashlib.sha256(password.encode('utf-8')).hexdigest()
-
-    # variable to initially collect user information but further check redundancy
-    new_user = User.UserClass(username, password, firstname, lastname)
-    user = get_user(username)
-    if user:
+    import questionary
+
+    # asked again until the username is not taken yet (a loop, so retries do not grow the call stack)
+    while True:
+        username = questionary.text("Choose a username.",
+                                      validate=lambda text: True if len(text)>0 and text.isalnum()
+                                      else "Please enter a correct value. "
+                                           "A Username can contain numbers and letters").ask()
+        password = questionary.password( "Enter a password.",
+                                          validate=lambda text: True if len(text)>= 8 and text.isalnum()
+                                          else "Your password must be at least 8 characters long and can "
+                                               "contain upper and lower case letters and numbers.").ask()
+        firstname = questionary.text("What's your first name? ",
+                                       validate=lambda text: True if len(text)>0 and text.isalpha()
+                                       else "Please enter a correct value. "
+                                            "Your name should only contain upper and lowercase letters.").ask()
+        lastname = questionary.text("Please enter your last name. ",
+                                      validate=lambda text: True if len(text)>0 and text.isalpha()
+                                      else "Please enter a correct value. "
+                                           "Your name should only contain upper and lowercase letters.").ask()
+        # using hashlib to hash password
+        password = hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+        # variable to initially collect user information but further check redundancy
+        new_user = User.UserClass(username, password, firstname, lastname)
+        if get_user(username) is None:
+            break
         print("\nThis username already exists. Try again!\n")
-        register_user()
 
-    else:
-        new_user.store_in_db()
-        print("\nRegistration successful!\n")
+    new_user.store_in_db()
+    print("\nRegistration successful!\n")
+    return new_user
 
 # function to get the user ( if its exits)
 def get_user(username):
@@ -114,17 +106,13 @@ def get_user(username):
     :param username: str
         Assigned to the function by register_user() or login().
     """
-    from os.path import join, dirname, abspath
-    db_path = join(dirname(abspath(__file__)), 'healthup.db')
-
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute(f"SELECT * FROM users WHERE username = '{username}'")
+    cur = database.get_connection().cursor()
+    cur.execute("SELECT username, password, firstname, lastname, user_id FROM users WHERE username = ?", (username,))
     list_of_users = cur.fetchall()
 
     if len(list_of_users) > 0:
-        username, password, firstname, lastname = list_of_users[0]
-        user = User.UserClass( username, password, firstname, lastname)
+        username, password, firstname, lastname, user_id = list_of_users[0]
+        user = User.UserClass( username, password, firstname, lastname, user_id)
         return user
     else:
         return None
@@ -141,6 +129,8 @@ def login():
     -------
     :return: UserClass instance for the logged-in user or None
     """
+    import questionary
+
     while True:
         user_name = questionary.text("Enter your username: ").ask()
         user = get_user(user_name)
@@ -156,6 +146,27 @@ def login():
             if choice == "Go to Register":
                 return register_user()
 
+# login without prompts (scripts, cron jobs)
+def authenticate(username, password):
+    """
+    Checks the username and the password without asking the user.
+
+    Parameters
+    ----------
+    :param username: str
+        the username
+    :param password: str
+        the password in plain text, it is hashed like at the registration
+
+    Returns
+    -------
+    :return: UserClass instance of the user or None if the user does not exist or the password is wrong
+    """
+    user = get_user(username)
+    if user and hashlib.sha256(password.encode('utf-8')).hexdigest() == user.password:
+        return user
+    return None
+
 # Password check, checks if the entered password matches those of the corresponding User Password.
 def check_password(password):
     """
@@ -165,6 +176,8 @@ def check_password(password):
     :param password: str
         The correct password hash, to be compared with the user input.
     """
+    import questionary
+
     attempt_limit = 5
     attempts = 0
     password_input = questionary.password("Enter your password: ").ask()
@@ -0,0 +1,96 @@
+"""
+This document contains the leaderboard: the users with the longest (or current) streaks per habit.
+
+The streaks of all users are computed inside SQLite, no progress row is loaded into Python:
+1. every progress row carries the key of its period (progress.period_key, the keys of streak_engine.py), there is
+   only one row per habit and period
+2. gaps and islands: within a habit, period_key - ROW_NUMBER() is the same for all keys of a run of consecutive
+   periods, so grouping by it gives one row per streak with its length and its last period
+3. per habit the longest run is the longest streak, the run ending in the current period is the current streak
+4. RANK() orders the users per habit name and periodicity
+
+Usage (see also the command 'leaderboard' of cli.py):
+    leaderboard.compute(conn, habit_name="Sleep", periodicity="daily", by="longest", limit=10, offset=0)
+
+It imports the library datetime and streak_engine.py for the keys of the current periods.
+"""
+from datetime import datetime
+
+import streak_engine
+
+ORDERS = ("longest", "current")
+LIMIT = 10      # entries per habit and page
+
+LEADERBOARD_QUERY = """
+WITH islands AS (
+    SELECT h.habit_id, h.habit_name, h.periodicity, p.period_key,
+           p.period_key - ROW_NUMBER() OVER (PARTITION BY h.habit_id ORDER BY p.period_key) AS island
+    FROM habits h JOIN progress p ON p.habit_id = h.habit_id
+    WHERE (:habit_name IS NULL OR h.habit_name = :habit_name)
+      AND (:periodicity IS NULL OR h.periodicity = :periodicity)
+),
+runs AS (
+    SELECT habit_id, habit_name, periodicity, COUNT(*) AS length, MAX(period_key) AS last_key
+    FROM islands
+    GROUP BY habit_id, island
+),
+streaks AS (
+    SELECT habit_id, habit_name, periodicity, MAX(length) AS longest,
+           MAX(CASE WHEN last_key = CASE periodicity WHEN 'daily' THEN :daily_key
+                                                     WHEN 'weekly' THEN :weekly_key
+                                                     ELSE :monthly_key END
+                    THEN length ELSE 0 END) AS current
+    FROM runs
+    GROUP BY habit_id
+),
+ranked AS (
+    SELECT s.habit_name, s.periodicity, u.username AS owner, s.longest, s.current,
+           RANK() OVER (PARTITION BY s.habit_name, s.periodicity ORDER BY s.{order} DESC) AS rank,
+           ROW_NUMBER() OVER (PARTITION BY s.habit_name, s.periodicity
+                              ORDER BY s.{order} DESC, u.username) AS position
+    FROM streaks s JOIN habits h ON h.habit_id = s.habit_id JOIN users u ON u.user_id = h.owner_id
+)
+SELECT habit_name, periodicity, rank, owner, longest, current
+FROM ranked
+WHERE position > :offset AND position <= :offset + :limit
+ORDER BY habit_name, periodicity, position;
+"""
+
+
+def compute(conn, habit_name=None, periodicity=None, by="longest", limit=LIMIT, offset=0, now=None):
+    """
+    Computes the leaderboard of every habit name and periodicity (or of one habit).
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+        the database
+    :param habit_name: str
+        only rank this habit name, None for all
+    :param periodicity: str
+        only rank this periodicity ('daily', 'weekly' or 'monthly'), None for all
+    :param by: str
+        'longest' or 'current', the streak the users are ranked by (ties share a rank, ordered by username)
+    :param limit: int
+        the number of users per habit (page size)
+    :param offset: int
+        the number of users per habit that are skipped (offset = page size * (page - 1))
+    :param now: datetime
+        the moment that defines the current periods, defaults to now
+
+    Returns
+    -------
+    :return: list
+        one dict {"habit_name", "periodicity", "rank", "owner", "longest", "current"} per user and habit,
+        ordered by habit name, periodicity and rank
+    """
+    if by not in ORDERS:
+        raise ValueError(f"by must be one of {ORDERS}, not {by!r}")
+    now = now or datetime.now()
+    parameters = {"habit_name": habit_name, "periodicity": periodicity, "limit": limit, "offset": offset}
+    for key_periodicity in ("daily", "weekly", "monthly"):
+        parameters[f"{key_periodicity}_key"] = streak_engine.period_key(now, key_periodicity)
+
+    rows = conn.execute(LEADERBOARD_QUERY.format(order=by), parameters).fetchall()
+    columns = ("habit_name", "periodicity", "rank", "owner", "longest", "current")
+    return [dict(zip(columns, row)) for row in rows]
@@ -3,42 +3,117 @@ This document handles the main menu and acts as user guidance.
 
 It imports the library 'questionary' as the Command Line Interface (CLI) that guides the user through the program.
 It also imports the initial.py doc which launches the core functionalities of the program.
+questionary is only imported once the interactive session starts. Called with a command
+(e.g. python main.py stats --user Barbie) the non-interactive interface in cli.py is run instead, without any prompt.
 """
-import questionary
+import argparse
+import sys
 import initial
+import database
+import cli
+import profiler
 
-# creating and launching the Database.
-initial.start_database()
+# program start: intro message, login or registration and the predefined habits.
+def start():
+    """
+    Greets the user and lets them log in or register.
 
-# program start with intro message.
-intro_message = "\n-----------------------------\n" \
-                "Welcome to Health UP!\n" \
-                "The Habit Tracker for a healthy new Lifestyle.\n" \
-                "-------------------------------\n"
-print(intro_message)
+    Returns
+    -------
+    :return: UserClass instance of the logged-in user
+    """
+    import questionary
+
+    intro_message = "\n-----------------------------\n" \
+                    "Welcome to Health UP!\n" \
+                    "The Habit Tracker for a healthy new Lifestyle.\n" \
+                    "-------------------------------\n"
+    print(intro_message)
+
+    # nest step of the menu, User must create an account or login.
+    first_question = questionary.select(
+        "New here? ", choices=[
+            "Register",
+            "Login"
+        ]).ask()
+
+    if first_question == "Login":
+        user = initial.login()
+        print("Welcome back!\n")
+
+    elif first_question == "Register":
+        print("\n Great that you want to join us! Let's set up your profile.\n")
+        initial.register_user()
+        print("\n now you can login:\n")
+        user = initial.login()
+
+    # new user can choose from a set of predefined habits
+    user.choose_predefined_habit()
+    return user
+
+# THE MENU
+# Every menu is one state of the session: state --> (question, entries).
+# An entry is (choice, target, message before, method of the UserClass, message after). The target is the next state;
+# with a method the action is performed first. None as target ends the session.
+MAIN = "main"
+MENUS = {
+    MAIN: ("What do you want to do? ", [
+        ("Edit User Profile", MAIN, "Aye. Let's edit your profile.\n", "update_profile",
+         "\nWhat do you want to do now?\n"),
+        ("Create, or Edit a Habit", "habits", None, None, None),
+        ("Activity Overview", "activity", None, None, None),
+        ("See Stats", "stats", None, None, None),
+        ("Logout", None, None, None, None),
+    ]),
+    "habits": ("Do you want to: ", [
+        ("Create a new habit", MAIN, "Let us create your Habit.\n", "create_habit", "\nWhats next?\n"),
+        ("Delete a habit", MAIN, None, "delete_habit", "\nWhat do you want to do next?\n"),
+        ("Edit a habit", MAIN, "So then lets Edit a habit", "update_habit", "\nDone! What now?\n"),
+        ("Mark as done", MAIN, "Do you want to finish a Habit?", "is_completed", "\nWhat do you want to do now?\n"),
+    ]),
+    "activity": ("Do you want to see...: ", [
+        ("all habits", MAIN, "You currently have these habits saved: \n", "show_all",
+         "\nWhat do you want to do now?\n"),
+        ("all monthly habits", MAIN, "Your monthly habits are: \n", "show_monthly_habits",
+         "\nWhat do you want to do now?\n"),
+        ("all weekly habits", MAIN, "Your weekly habits are: \n", "show_weekly_habits",
+         "\nWhat do you want to do now?\n"),
+        ("all daily habits", MAIN, "Your daily habits are: \n", "show_daily_habits",
+         "\nWhat do you want to do now?\n"),
+        ("Back", MAIN, None, None, "\nWhat do you want to do now?\n"),
+    ]),
+    "stats": ("here you can choose what you want to see: ", [
+        ("Show streak per habit", MAIN, None, "streak_habit", "\nWhat else do you want so see?\n"),
+        ("Show longest streak per habit", MAIN, None, "longest_streak_habit", "\nWhat's next?\n"),
+        ("Show streak overview", MAIN, None, "streak_overview", "\nWhat shall we do now?\n"),
+        ("Show longest streak overview", MAIN, None, "longest_streak_overview", "\nWant to see more?\n"),
+        ("Back", MAIN, None, None, "\nWhat do you want to do now?\n"),
+    ]),
+}
+
+
+# the default way to answer a menu question: a questionary prompt
+def ask(question, choices):
+    """
+    Shows a menu question and returns the chosen entry (None if the prompt was cancelled, e.g. with Ctrl-C).
+    """
+    import questionary
 
-# nest step of the menu, User must create an account or login.
-first_question = questionary.select(
-    "New here? ", choices=[
-        "Register",
-        "Login"
-    ]).ask()
+    return questionary.select(question, choices=choices).ask()
 
-if first_question == "Login":
-    user = initial.login()
-    print("Welcome back!\n")
 
-elif first_question == "Register":
-    print("\n Great that you want to join us! Let's set up your profile.\n")
-    initial.register_user()
-    print("\n now you can login:\n")
-    user = initial.login()
+# scripted answers instead of prompts (tests, benchmarks)
+def scripted(answers):
+    """
+    Returns a replacement for ask() that answers the menu questions with the given sequence of choices.
+    When the answers run out, the session ends as if the prompt had been cancelled.
+    """
+    answers = iter(answers)
+    return lambda question, choices: next(answers, None)
 
-# new user can choose from a set of predefined habits
-user.choose_predefined_habit()
 
 # definition of the main menu, that navigates user through options.
-def menu():
+def menu(user, select=ask):
     """
     Main menu function of the Health Up application. It serves as the user interface for
     interacting with the application's features.
@@ -52,123 +127,77 @@ def menu():
     It also provides options to view different types of habits based on their periodicity and
     to access different statistical views regarding the user's habit streaks.
 
-    Returns:
-        None. The function facilitates user navigation and interaction within the application.
+    The session is a state machine over the table MENUS: one loop iteration per question, so the call stack and
+    the memory stay the same size however many actions a session has.
+
+    Parameters
+    ----------
+    :param user: UserClass
+        the logged-in user
+    :param select: function
+        select(question, choices) --> chosen entry, defaults to a questionary prompt (see scripted() for input
+        without a terminal)
+
+    Returns
+    -------
+    :return: int
+        the number of actions performed
     """
-    what_question = questionary.select("What do you want to do? ",
-                                         choices=[
-                                                "Edit User Profile",
-                                                "Create, or Edit a Habit",
-                                                "Activity Overview",
-                                                "See Stats",
-                                                "Logout"
-                                         ]).ask()
-    if what_question == "Edit User Profile":
-        print("Aye. Let's edit your profile.\n")
-        initial.get_user(user)
-        user.update_profile()
-        print("\nWhat do you want to do now?\n")
-        menu()
-
-    elif what_question == "Create, or Edit a Habit":
-        habit_question = questionary.select("Do you want to: ",
-                                            choices=[
-                                                "Create a new habit",
-                                                "Delete a habit",
-                                                "Edit a habit",
-                                                "Mark as done"
-                                            ]).ask()
-
-        if habit_question == "Create a new habit":
-            print("Let us create your Habit.\n")
-            new_habit = user.create_habit()
-            user.store_habit_in_db(new_habit)
-            print("\nWhats next?\n")
-            menu()
-
-        elif habit_question == "Delete a habit":
-            user.delete_habit()
-            print("\nWhat do you want to do next?\n")
-            menu()
-
-        elif habit_question == "Edit a habit":
-            print("So then lets Edit a habit")
-            user.update_habit()
-            print("\nDone! What now?\n")
-            menu()
-
-        else:
-            print("Do you want to finish a Habit?")
-            user.is_completed()
-            print("\nWhat do you want to do now?\n")
-            menu()
-
-    elif what_question == "Activity Overview":
-        activity_question = questionary.select("Do you want to see...: ",
-                                                    choices=[
-                                                        "all habits",
-                                                        "all monthly habits",
-                                                        "all weekly habits",
-                                                        "all daily habits",
-                                                        "Back"
-                                                    ] ).ask ()
-
-        if activity_question == "all habits":
-            print("You currently have these habits saved: \n")
-            user.show_all()
-            print("\nWhat do you want to do now?\n")
-            menu()
-
-        elif activity_question == "all monthly habits":
-            print ("Your monthly habits are: \n")
-            user.show_monthly_habits()
-            print("\nWhat do you want to do now?\n")
-            menu()
-
-        elif activity_question == "all weekly habits":
-            print("Your weekly habits are: \n")
-            user.show_weekly_habits()
-            print("\nWhat do you want to do now?\n")
-            menu()
-
-        else:
-            print("Your daily habits are: \n")
-            user.show_daily_habits()
-            print("\nWhat do you want to do now?\n")
-            menu()
-
-    if what_question == "See Stats":
-        stats_question = questionary.select("here you can choose what you want to see: ",
-                                            choices=[
-                                                "Show streak per habit",
-                                                "Show longest streak per habit",
-                                                "Show streak overview",
-                                                "Show longest streak overview",
-                                                "Back"
-                                            ]).ask()
-
-        if stats_question == "Show streak overview":
-            user.streak_overview()
-            print ( "\nWhat shall we do now?\n" )
-            menu ()
-        elif stats_question == "Show streak per habit":
-            user.streak_habit()
-            print ( "\nWhat else do you want so see?\n" )
-            menu ()
-        elif stats_question == "Show longest streak per habit":
-            user.longest_streak_habit()
-            print ( "\nWhat's next?\n" )
-            menu ()
-        elif stats_question == "Show longest streak overview":
-            user.longest_streak_overview()
-            print ( "\nWant to see more?\n" )
-            menu ()
-        else:
-            print("\nWhat do you want to do now?\n")
-            menu()
-
-    if what_question == "Logout":
+    state = MAIN
+    actions = 0
+    while state is not None:
+        question, entries = MENUS[state]
+        answer = select(question, [entry[0] for entry in entries])
+        entry = next((entry for entry in entries if entry[0] == answer), None)
+        if entry is None:
+            # cancelled prompt
+            break
+        _, state, before, method, after = entry
+        if before:
+            print(before)
+        if method:
+            action = getattr(user, method)
+            if profiler.ENABLED:
+                action = profiler.timed(action, f"menu: {answer}")
+            action()
+            actions += 1
+        if after:
+            print(after)
+
+    if state is None:
         print(f"\nSee you soon, {user.firstname}!\n")
+    return actions
+
+# command line entry point
+def main(argv=None):
+    """
+    Runs a command of cli.py if one is given, otherwise the interactive session.
+
+    Parameters
+    ----------
+    :param argv: list
+        the command line arguments, defaults to sys.argv[1:]
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in cli.COMMANDS:
+        return cli.main(argv)
+
+    # command line options (e.g. python main.py --db other.db)
+    parser = argparse.ArgumentParser(description="Health Up - a Habit Tracker for a healthy Life.")
+    database.add_argument(parser)
+    profiler.add_argument(parser)
+    args = parser.parse_args(argv)
+    database.configure(args.db)
+    profiler.configure(args.profile)
+
+    # creating and launching the Database.
+    initial.start_database()
+
+    # execution of the main function, starts user guidance.
+    menu(start())
+    database.close_all()
+    return 0
+
 
-# execution of the main function, starts user guidance.
-menu()
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,341 @@
+"""
+This document contains the schema migrations of the database.
+Every migration is a function that receives an open cursor and brings the schema one version further.
+A migration that changes the data habit_stats is derived from returns True, the streak state is then rebuilt once
+with the code of the current version, after the last migration and in the same transaction.
+The version the database is currently on is stored in 'PRAGMA user_version', so an existing healthup.db is
+upgraded in place and a database which is already up-to-date is left untouched (no DDL is executed at all).
+
+It imports the library sqlite3, habit_stats.py to fill the streak table and streak_engine.py for the period keys.
+"""
+import sqlite3
+import habit_stats
+import streak_engine
+
+
+# VERSION 1: the original three tables (users, habits and progress).
+def create_tables(cur):
+    """
+    Creates the tables users, habits and progress if they do not exist yet.
+    Databases created before the migrations were introduced already contain them and are only marked as version 1.
+    """
+    cur.execute("""CREATE TABLE IF NOT EXISTS users (
+                username text PRIMARY KEY,
+                password text,
+                firstname text,
+                lastname text
+                )""")
+
+    cur.execute("""CREATE TABLE IF NOT EXISTS habits (
+                  habit_name TEXT PRIMARY KEY,
+                  owner TEXT NOT NULL,
+                  periodicity TEXT NOT NULL,
+                  datetime_creation DATETIME NOT NULL,
+                  FOREIGN KEY(owner) REFERENCES users(username)
+                  )""")
+
+    cur.execute("""CREATE TABLE IF NOT EXISTS progress (
+              habit_name text,
+              periodicity text,
+              owner text,
+              datetime_completion datetime
+              )""")
+
+
+# VERSION 2: covering indexes for the streak and overview queries.
+def create_indexes(cur):
+    """
+    Creates the indexes used by get_habit_progress() and the show_*_habits() queries.
+    Both indexes contain every column the queries read, so SQLite never has to visit the tables themselves.
+    """
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_progress_owner_habit
+                ON progress(owner, habit_name, periodicity, datetime_completion)""")
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_habits_owner_periodicity
+                ON habits(owner, periodicity, habit_name)""")
+
+
+# VERSION 3: materialized streak state.
+def create_habit_stats(cur):
+    """
+    Creates the table habit_stats (see habit_stats.py), it is filled from the existing progress by migrate().
+    """
+    cur.execute("""CREATE TABLE IF NOT EXISTS habit_stats (
+                owner TEXT NOT NULL,
+                habit_name TEXT NOT NULL,
+                periodicity TEXT NOT NULL,
+                current_streak INTEGER NOT NULL,
+                longest_streak INTEGER NOT NULL,
+                last_period_key INTEGER,
+                PRIMARY KEY(owner, habit_name, periodicity)
+                )""")
+    return True
+
+
+# VERSION 4: completions as integers.
+def encode_completions(cur):
+    """
+    Adds the columns completed_at (epoch seconds) and day_ordinal (date.toordinal()) to progress and converts the
+    existing text timestamps. The timestamps are naive local times like the text, they are encoded as if they were UTC
+    (see streak_engine.encode_timestamp()), so converting them back never shifts a completion to another day.
+    A trigger converts rows that are still inserted with the text column only (e.g. from older CSV exports).
+    The index of the streak queries is replaced by one on the integer columns.
+    """
+    cur.execute("ALTER TABLE progress ADD COLUMN completed_at INTEGER")
+    cur.execute("ALTER TABLE progress ADD COLUMN day_ordinal INTEGER")
+    # julianday() of a date is always x.5, julianday('0001-01-01') - 1 = 1721424.5 --> the ordinal of python
+    cur.execute("""UPDATE progress SET
+                completed_at = CAST(strftime('%s', datetime_completion) AS INTEGER),
+                day_ordinal = CAST(julianday(date(datetime_completion)) - 1721424.5 AS INTEGER)
+                WHERE datetime_completion IS NOT NULL""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS progress_encode_completion AFTER INSERT ON progress
+                WHEN NEW.completed_at IS NULL AND NEW.datetime_completion IS NOT NULL
+                BEGIN
+                    UPDATE progress SET
+                        completed_at = CAST(strftime('%s', NEW.datetime_completion) AS INTEGER),
+                        day_ordinal = CAST(julianday(date(NEW.datetime_completion)) - 1721424.5 AS INTEGER)
+                    WHERE rowid = NEW.rowid;
+                END""")
+    cur.execute("DROP INDEX IF EXISTS idx_progress_owner_habit")
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_progress_owner_habit_day
+                ON progress(owner, habit_name, periodicity, day_ordinal, completed_at)""")
+    return True
+
+
+# VERSION 5: integer surrogate keys.
+def introduce_surrogate_keys(cur):
+    """
+    Replaces the text keys by integer ids:
+    * users(user_id, username UNIQUE, ...)
+    * habits(habit_id, owner_id, habit_name, ...) with UNIQUE(owner_id, habit_name), so two users can own habits
+      with the same name
+    * progress(habit_id, completed_at), a completion is two integers (the day is completed_at / 86400, see
+      streak_engine.day_ordinal_sql())
+    * habit_stats(habit_id, ...)
+    Owners that only appear in habits become users without a password. Progress of habits that no longer exist
+    (deleted habits) is dropped, it could not be read anymore.
+    The views legacy_habits and legacy_progress show the tables in the old layout with usernames and accept inserts
+    in that layout (CSV files, older tools).
+    """
+    cur.execute("DROP TRIGGER IF EXISTS progress_encode_completion")
+    cur.execute("DROP INDEX IF EXISTS idx_progress_owner_habit_day")
+    cur.execute("DROP INDEX IF EXISTS idx_habits_owner_periodicity")
+
+    cur.execute("""CREATE TABLE users_v5 (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL UNIQUE,
+                password TEXT,
+                firstname TEXT,
+                lastname TEXT
+                )""")
+    cur.execute("""INSERT INTO users_v5(username, password, firstname, lastname)
+                SELECT username, password, firstname, lastname FROM users ORDER BY rowid""")
+    cur.execute("""INSERT INTO users_v5(username)
+                SELECT DISTINCT owner FROM habits
+                WHERE owner IS NOT NULL AND owner NOT IN (SELECT username FROM users_v5)""")
+
+    cur.execute("""CREATE TABLE habits_v5 (
+                habit_id INTEGER PRIMARY KEY,
+                owner_id INTEGER NOT NULL REFERENCES users(user_id),
+                habit_name TEXT NOT NULL,
+                periodicity TEXT NOT NULL,
+                datetime_creation DATETIME NOT NULL,
+                UNIQUE(owner_id, habit_name)
+                )""")
+    cur.execute("""INSERT INTO habits_v5(owner_id, habit_name, periodicity, datetime_creation)
+                SELECT u.user_id, h.habit_name, h.periodicity, h.datetime_creation
+                FROM habits h JOIN users_v5 u ON u.username = h.owner ORDER BY h.rowid""")
+
+    cur.execute("""CREATE TABLE progress_v5 (
+                habit_id INTEGER NOT NULL REFERENCES habits(habit_id),
+                completed_at INTEGER NOT NULL
+                )""")
+    cur.execute("""INSERT INTO progress_v5(habit_id, completed_at)
+                SELECT h.habit_id, p.completed_at
+                FROM progress p
+                JOIN users_v5 u ON u.username = p.owner
+                JOIN habits_v5 h ON h.owner_id = u.user_id AND h.habit_name = p.habit_name
+                WHERE p.completed_at IS NOT NULL ORDER BY p.rowid""")
+
+    for table in ("progress", "habits", "users", "habit_stats"):
+        cur.execute(f"DROP TABLE {table}")
+    for table in ("users", "habits", "progress"):
+        cur.execute(f"ALTER TABLE {table}_v5 RENAME TO {table}")
+
+    cur.execute("""CREATE TABLE habit_stats (
+                habit_id INTEGER PRIMARY KEY REFERENCES habits(habit_id),
+                current_streak INTEGER NOT NULL,
+                longest_streak INTEGER NOT NULL,
+                last_period_key INTEGER
+                )""")
+    cur.execute("CREATE INDEX idx_progress_habit ON progress(habit_id, completed_at)")
+    cur.execute("CREATE INDEX idx_habits_owner_periodicity ON habits(owner_id, periodicity, habit_name)")
+
+    cur.execute("""CREATE VIEW legacy_habits(habit_name, owner, periodicity, datetime_creation) AS
+                SELECT h.habit_name, u.username, h.periodicity, h.datetime_creation
+                FROM habits h JOIN users u ON u.user_id = h.owner_id""")
+    cur.execute("""CREATE TRIGGER legacy_habits_insert INSTEAD OF INSERT ON legacy_habits
+                BEGIN
+                    INSERT INTO habits(owner_id, habit_name, periodicity, datetime_creation)
+                    VALUES((SELECT user_id FROM users WHERE username = NEW.owner),
+                           NEW.habit_name, NEW.periodicity, NEW.datetime_creation);
+                END""")
+    cur.execute("""CREATE VIEW legacy_progress(habit_name, periodicity, owner, datetime_completion) AS
+                SELECT h.habit_name, h.periodicity, u.username, datetime(p.completed_at, 'unixepoch')
+                FROM progress p JOIN habits h ON h.habit_id = p.habit_id JOIN users u ON u.user_id = h.owner_id""")
+    # an unknown habit leaves habit_id NULL, the insert then fails on NOT NULL (or is skipped by INSERT OR IGNORE)
+    cur.execute("""CREATE TRIGGER legacy_progress_insert INSTEAD OF INSERT ON legacy_progress
+                BEGIN
+                    INSERT INTO progress(habit_id, completed_at)
+                    VALUES((SELECT h.habit_id FROM habits h JOIN users u ON u.user_id = h.owner_id
+                            WHERE u.username = NEW.owner AND h.habit_name = NEW.habit_name),
+                           CAST(strftime('%s', NEW.datetime_completion) AS INTEGER));
+                END""")
+    return True
+
+
+# VERSION 6: completion calendar (see completion_calendar.py).
+def add_completion_calendar(cur):
+    """
+    Adds the bitset of the completed periods (calendar) and the period key of its first bit (calendar_origin) to
+    every habit. They are filled from the progress by the rebuild of habit_stats.
+    """
+    cur.execute("ALTER TABLE habits ADD COLUMN calendar BLOB")
+    cur.execute("ALTER TABLE habits ADD COLUMN calendar_origin INTEGER")
+    return True
+
+
+# VERSION 7: one progress row per habit and period.
+def deduplicate_completions(cur):
+    """
+    Stores the period key of every completion (progress.period_key) with a unique index on (habit_id, period_key)
+    and counts repeated completions in the same period (progress.count) instead of adding rows.
+    Existing rows of the same habit and period are collapsed into one: the first completion of the period with the
+    number of rows as count. The streaks do not change, every period keeps its completion.
+    The view legacy_progress is recreated, its insert trigger counts repeated completions as well.
+    """
+    cur.execute("DROP VIEW legacy_progress")
+    cur.execute("DROP INDEX idx_progress_habit")
+
+    cur.execute("""CREATE TABLE progress_v7 (
+                habit_id INTEGER NOT NULL REFERENCES habits(habit_id),
+                completed_at INTEGER NOT NULL,
+                period_key INTEGER NOT NULL,
+                count INTEGER NOT NULL DEFAULT 1
+                )""")
+    period_key = streak_engine.period_key_sql(streak_engine.day_ordinal_sql("p.completed_at"), "h.periodicity")
+    cur.execute(f"""INSERT INTO progress_v7(habit_id, completed_at, period_key, count)
+                SELECT p.habit_id, MIN(p.completed_at), {period_key} AS period_key, COUNT(*)
+                FROM progress p JOIN habits h ON h.habit_id = p.habit_id
+                GROUP BY p.habit_id, period_key ORDER BY p.habit_id, period_key""")
+    cur.execute("DROP TABLE progress")
+    cur.execute("ALTER TABLE progress_v7 RENAME TO progress")
+    cur.execute("CREATE UNIQUE INDEX idx_progress_habit_period ON progress(habit_id, period_key)")
+    cur.execute("CREATE INDEX idx_progress_habit ON progress(habit_id, completed_at)")
+
+    cur.execute("""CREATE VIEW legacy_progress(habit_name, periodicity, owner, datetime_completion) AS
+                SELECT h.habit_name, h.periodicity, u.username, datetime(p.completed_at, 'unixepoch')
+                FROM progress p JOIN habits h ON h.habit_id = p.habit_id JOIN users u ON u.user_id = h.owner_id""")
+    completed_at = "CAST(strftime('%s', NEW.datetime_completion) AS INTEGER)"
+    new_key = streak_engine.period_key_sql(streak_engine.day_ordinal_sql(completed_at), "h.periodicity")
+    # an unknown habit leaves habit_id NULL, the insert then fails on NOT NULL (or is skipped by INSERT OR IGNORE)
+    cur.execute(f"""CREATE TRIGGER legacy_progress_insert INSTEAD OF INSERT ON legacy_progress
+                BEGIN
+                    INSERT INTO progress(habit_id, completed_at, period_key)
+                    SELECT (SELECT h.habit_id FROM habits h JOIN users u ON u.user_id = h.owner_id
+                            WHERE u.username = NEW.owner AND h.habit_name = NEW.habit_name),
+                           {completed_at},
+                           (SELECT {new_key} FROM habits h JOIN users u ON u.user_id = h.owner_id
+                            WHERE u.username = NEW.owner AND h.habit_name = NEW.habit_name)
+                    WHERE true
+                    ON CONFLICT(habit_id, period_key) DO UPDATE SET
+                        count = count + 1,
+                        completed_at = MIN(completed_at, excluded.completed_at);
+                END""")
+
+
+# VERSION 8: habits changed through the view legacy_progress.
+def add_stale_habits(cur):
+    """
+    The insert trigger of legacy_progress (CSV files, older tools) only writes the table progress, the streak state
+    (habit_stats) and the completion calendar of a habit are computed in Python. A second trigger therefore records
+    the habit in stale_habits: until habit_stats.py recomputes it (the next completion, habit_stats.refresh() at the
+    start or a rebuild) its streaks and its calendar are computed from the progress when they are read.
+    """
+    cur.execute("""CREATE TABLE stale_habits (
+                habit_id INTEGER PRIMARY KEY REFERENCES habits(habit_id)
+                )""")
+    # an unknown habit selects no row, nothing is marked
+    cur.execute("""CREATE TRIGGER legacy_progress_mark_stale INSTEAD OF INSERT ON legacy_progress
+                BEGIN
+                    INSERT OR IGNORE INTO stale_habits(habit_id)
+                    SELECT h.habit_id FROM habits h JOIN users u ON u.user_id = h.owner_id
+                    WHERE u.username = NEW.owner AND h.habit_name = NEW.habit_name;
+                END""")
+
+
+# the position in this list is the schema version the migration leads to (index 0 --> version 1).
+MIGRATIONS = [
+    create_tables,
+    create_indexes,
+    create_habit_stats,
+    encode_completions,
+    introduce_surrogate_keys,
+    add_completion_calendar,
+    deduplicate_completions,
+    add_stale_habits,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    """
+    Returns the schema version stored in the database file.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Brings the database up to SCHEMA_VERSION.
+
+    Each migration runs in its own transaction together with the update of 'user_version',
+    so an interrupted upgrade never leaves a half migrated schema behind.
+    The transaction takes the write lock first (BEGIN IMMEDIATE) and reads 'user_version' again, so when several
+    processes upgrade the same file at the same time every migration is applied exactly once.
+    If one of the migrations asks for it, habit_stats is rebuilt as part of the last one.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+        an open connection to the database that should be upgraded
+
+    Returns
+    -------
+    :return: int
+        the schema version of the database after the upgrade
+    """
+    version = get_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    cur = conn.cursor()
+    rebuild_stats = False
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            if get_version(conn) >= number:
+                # applied by another process in the meantime, which may have asked for a rebuild as well
+                conn.rollback()
+                rebuild_stats = True
+                continue
+            rebuild_stats = migration(cur) or rebuild_stats
+            if number == SCHEMA_VERSION and rebuild_stats:
+                habit_stats.rebuild(conn, commit=False)
+            # PRAGMA does not accept parameters, number is always an int from enumerate()
+            cur.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return SCHEMA_VERSION
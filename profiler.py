@@ -0,0 +1,299 @@
+"""
+This document contains the profiler, which shows where the time of a session goes.
+
+When it is enabled it records
+* for every SQL statement: the number of calls, the rows returned and the time spent in execute() and in fetching
+  the rows (SQLite does most of the work of a query while the rows are fetched)
+* the time of the streak computations (compute_streak, compute_longest_streak_habit, compute_all_streaks), of
+  get_user/authenticate/start_database in initial.py and of every menu action of main.py
+At exit a report sorted by total time (with the hits and misses of the streak cache) is printed to stderr or
+written as JSON.
+
+It is enabled with the flag --profile of main.py / cli.py (--profile prints the report, --profile trace.json writes
+the JSON file) or the environment variable HEALTHUP_PROFILE (1 for the report, otherwise the path of the JSON file).
+When it is disabled nothing is wrapped: the connections are plain sqlite3 connections and the functions are the
+original ones, so it costs nothing.
+
+It imports the libraries sqlite3, time, threading, atexit, functools, json, os and sys and streak_cache.py.
+"""
+import atexit
+import functools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import streak_cache
+
+ENV_VARIABLE = "HEALTHUP_PROFILE"
+REPORT = "-"        # output value for the printed report, anything else is the path of a JSON file
+
+ENABLED = False
+OUTPUT = None
+
+# name --> [calls, seconds, rows] for the statements, name --> [calls, seconds] for the functions
+_statements = {}
+_functions = {}
+_lock = threading.Lock()
+# (owner, name, original function) of everything wrapped by enable()
+_wrapped = []
+
+
+# RECORDING
+
+def record_statement(sql, seconds, rows=0, call=True):
+    """
+    Adds one execution (call=True) or one fetch (call=False) of a statement.
+    """
+    sql = " ".join(sql.split())
+    with _lock:
+        entry = _statements.setdefault(sql, [0, 0.0, 0])
+        entry[0] += call
+        entry[1] += seconds
+        entry[2] += rows
+
+
+def record_function(name, seconds):
+    """
+    Adds one call of a function or menu action.
+    """
+    with _lock:
+        entry = _functions.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def timed(function, name):
+    """
+    Wraps a function so that every call is recorded under the given name.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record_function(name, time.perf_counter() - start)
+    return wrapper
+
+
+# PROFILED CONNECTIONS
+# only used while the profiler is enabled (see database.connect())
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that records the statements it executes and the rows it returns.
+    """
+    _sql = ""
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_statement(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_statement(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        self._sql = sql_script
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_statement(sql_script, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        record_statement(self._sql, time.perf_counter() - start, row is not None, call=False)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        record_statement(self._sql, time.perf_counter() - start, len(rows), call=False)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        record_statement(self._sql, time.perf_counter() - start, len(rows), call=False)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            record_statement(self._sql, time.perf_counter() - start, call=False)
+            raise
+        record_statement(self._sql, time.perf_counter() - start, 1, call=False)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (also those of the shortcuts execute() and executemany()) are ProfiledCursors.
+    """
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        # the sync to disk happens here, it is listed as the statement COMMIT
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_statement("COMMIT", time.perf_counter() - start)
+
+
+# CONFIGURATION
+
+def enable(output=REPORT):
+    """
+    Enables the profiler. Connections opened from now on are profiled and the timed functions are wrapped.
+
+    Parameters
+    ----------
+    :param output: str
+        '-' to print the report to stderr at exit, otherwise the path of the JSON file written at exit,
+        None to write nothing (see report() and snapshot())
+    """
+    global ENABLED, OUTPUT
+    OUTPUT = output
+    if ENABLED:
+        return
+    ENABLED = True
+
+    # imported here, these modules import the profiler themselves
+    import database
+    import initial
+    import User
+
+    for owner, name in ((User.UserClass, "compute_streak"), (User.UserClass, "compute_longest_streak_habit"),
+                        (User.UserClass, "compute_all_streaks"), (initial, "get_user"),
+                        (initial, "authenticate"), (initial, "start_database")):
+        _wrapped.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, timed(getattr(owner, name), name))
+    # connections that are already open are replaced by profiled ones
+    database.close_all()
+    atexit.register(write)
+
+
+def disable():
+    """
+    Disables the profiler again: the original functions are restored and the profiled connections are closed.
+    Nothing is written at exit.
+    """
+    global ENABLED
+    if not ENABLED:
+        return
+    import database
+
+    ENABLED = False
+    while _wrapped:
+        owner, name, function = _wrapped.pop()
+        setattr(owner, name, function)
+    database.close_all()
+    atexit.unregister(write)
+
+
+def configure(value=None):
+    """
+    Enables the profiler if value (the flag --profile) or the environment variable HEALTHUP_PROFILE is set.
+    '1' and '-' print the report, any other value is the path of the JSON file.
+    """
+    value = value or os.environ.get(ENV_VARIABLE)
+    if value:
+        enable(REPORT if value in ("1", REPORT) else value)
+    return ENABLED
+
+
+def add_argument(parser):
+    """
+    Adds the flag --profile to an argparse parser. Pass the parsed value to configure().
+    """
+    parser.add_argument("--profile", nargs="?", const=REPORT, default=None, metavar="JSON_FILE",
+                        help=f"time the queries and streak computations, print the report at exit or write it to "
+                             f"JSON_FILE (default: ${ENV_VARIABLE})")
+
+
+def reset():
+    """
+    Forgets everything recorded so far.
+    """
+    with _lock:
+        _statements.clear()
+        _functions.clear()
+
+
+# REPORT
+
+def snapshot():
+    """
+    Returns everything recorded so far, sorted by total time (slowest first).
+
+    Returns
+    -------
+    :return: dict
+        {"statements": [{"sql", "calls", "rows", "total_ms", "mean_ms"}, ...],
+         "functions": [{"name", "calls", "total_ms", "mean_ms"}, ...],
+         "streak_cache": {"hits", "misses", "entries", "max_entries"}}
+    """
+    with _lock:
+        statements = [{"sql": sql, "calls": calls, "rows": rows, "total_ms": seconds * 1000,
+                       "mean_ms": seconds * 1000 / max(calls, 1)} for sql, (calls, seconds, rows) in _statements.items()]
+        functions = [{"name": name, "calls": calls, "total_ms": seconds * 1000, "mean_ms": seconds * 1000 / calls}
+                     for name, (calls, seconds) in _functions.items()]
+    return {"statements": sorted(statements, key=lambda entry: entry["total_ms"], reverse=True),
+            "functions": sorted(functions, key=lambda entry: entry["total_ms"], reverse=True),
+            "streak_cache": streak_cache.stats()}
+
+
+def report(limit=20):
+    """
+    The recorded timings as a table, the slowest 'limit' statements and all functions.
+    """
+    data = snapshot()
+    lines = ["", "Functions and menu actions", f"{'calls':>8} {'total ms':>10} {'mean ms':>9}  name"]
+    lines += [f"{entry['calls']:>8} {entry['total_ms']:>10.2f} {entry['mean_ms']:>9.3f}  {entry['name']}"
+              for entry in data["functions"]]
+    cache = data["streak_cache"]
+    lines += ["", f"Streak cache: {cache['hits']} hits, {cache['misses']} misses, "
+                  f"{cache['entries']}/{cache['max_entries']} entries"]
+    lines += ["", "SQL statements", f"{'calls':>8} {'total ms':>10} {'mean ms':>9} {'rows':>8}  statement"]
+    lines += [f"{entry['calls']:>8} {entry['total_ms']:>10.2f} {entry['mean_ms']:>9.3f} {entry['rows']:>8}  "
+              f"{entry['sql'][:100]}" for entry in data["statements"][:limit]]
+    return "\n".join(lines)
+
+
+def write():
+    """
+    Prints the report or writes the JSON file (called at exit).
+    """
+    if OUTPUT is None:
+        return
+    if OUTPUT == REPORT:
+        print(report(), file=sys.stderr)
+    else:
+        with open(OUTPUT, "w") as file:
+            json.dump(snapshot(), file, indent=2)
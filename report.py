@@ -0,0 +1,176 @@
+"""
+This document contains the nightly report: the current and longest streak of every habit of every user.
+
+The users are split into shards of consecutive user_ids, which are computed in parallel by a process pool. Every
+worker opens its own read-only connection and reads its shard in one query with one row per habit, which holds the
+period keys of the habit as a comma separated list (building a Python row per progress row took most of the time),
+so only the keys of one habit are held in memory. The streaks are computed by the streak engine.
+It writes its rows into a part file, the parts are appended to the output in the order of the shards as soon as they
+are done and deleted afterwards. Neither the workers nor the main process ever hold the whole report in memory.
+The time of every shard is printed to stderr.
+
+Usage:
+    python report.py --output report.jsonl
+    python report.py --output report.csv --format csv --workers 8 --shard-size 20000 --db production.db
+
+One line (JSON Lines) or row (CSV) per habit: user, habit, periodicity, current, longest.
+
+It imports the libraries argparse, csv, json, os, shutil, sys, tempfile, time, datetime and concurrent.futures and
+streak_engine.py for the streaks.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import database
+import initial
+import streak_engine
+
+FORMATS = ("jsonl", "csv")
+COLUMNS = ("user", "habit", "periodicity", "current", "longest")
+SHARD_SIZE = 10000      # user_ids per shard
+WORKERS = os.cpu_count() or 1
+
+# the keys are read from the index idx_progress_habit_period, the streak engine does not need them in order
+SHARD_QUERY = """SELECT u.username, h.habit_name, h.periodicity,
+                        (SELECT group_concat(p.period_key) FROM progress p WHERE p.habit_id = h.habit_id)
+                 FROM users u JOIN habits h ON h.owner_id = u.user_id
+                 WHERE u.user_id BETWEEN ? AND ?
+                 ORDER BY u.user_id, h.habit_id;"""
+
+
+def shards(conn, shard_size=SHARD_SIZE):
+    """
+    Splits the user_ids into ranges of shard_size ids.
+
+    Returns
+    -------
+    :return: list
+        (first user_id, last user_id) per shard
+    """
+    first, last = conn.execute("SELECT MIN(user_id), MAX(user_id) FROM users;").fetchone()
+    if first is None:
+        return []
+    return [(start, min(start + shard_size - 1, last)) for start in range(first, last + 1, shard_size)]
+
+
+# runs in a worker process
+def compute_shard(path, first_id, last_id, output_format, part_path, now):
+    """
+    Computes the streaks of the users first_id to last_id and writes them into the file part_path.
+
+    Parameters
+    ----------
+    :param path: str
+        the database file, opened read-only
+    :param now: str
+        the moment the current streaks are computed for (ISO format), the same for all shards
+
+    Returns
+    -------
+    :return: tuple
+        (number of users, number of habits, seconds)
+    """
+    start = time.perf_counter()
+    now = datetime.fromisoformat(now)
+    current_keys = {periodicity: streak_engine.period_key(now, periodicity)
+                    for periodicity in ("daily", "weekly", "monthly")}
+    conn = database.connect(path, read_only=True)
+    users = set()
+    habits = 0
+    try:
+        with open(part_path, "w", newline="") as file:
+            writer = csv.writer(file) if output_format == "csv" else None
+            for username, habit_name, periodicity, keys in conn.execute(SHARD_QUERY, (first_id, last_id)):
+                keys = [int(key) for key in keys.split(",")] if keys else []
+                current, longest = streak_engine.streaks_from_keys(keys, current_keys[periodicity])
+                row = (username, habit_name, periodicity, current, longest)
+                if writer is None:
+                    file.write(json.dumps(dict(zip(COLUMNS, row))) + "\n")
+                else:
+                    writer.writerow(row)
+                users.add(username)
+                habits += 1
+    finally:
+        conn.close()
+    return len(users), habits, time.perf_counter() - start
+
+
+def write_report(output, output_format="jsonl", workers=WORKERS, shard_size=SHARD_SIZE, now=None, log=sys.stderr):
+    """
+    Computes the report of all users of the configured database (see database.configure()) and writes it to output.
+
+    Returns
+    -------
+    :return: dict
+        {"shards", "users", "habits", "seconds"}
+    """
+    if database.DB_PATH.startswith("file:"):
+        raise ValueError("The report needs a database file, the worker processes cannot open an in-memory database.")
+    if output_format not in FORMATS:
+        raise ValueError(f"output_format must be one of {FORMATS}, not {output_format!r}")
+    start = time.perf_counter()
+    now = (now or datetime.now()).isoformat()
+    ranges = shards(database.get_connection(), shard_size)
+    totals = {"shards": len(ranges), "users": 0, "habits": 0}
+
+    parts_dir = tempfile.mkdtemp(prefix="healthup-report-")
+    try:
+        parts = [os.path.join(parts_dir, f"part{number}") for number in range(len(ranges))]
+        with open(output, "w", newline="") as file, ProcessPoolExecutor(max_workers=workers) as executor:
+            if output_format == "csv":
+                csv.writer(file).writerow(COLUMNS)
+            futures = [executor.submit(compute_shard, database.DB_PATH, first, last, output_format, part, now)
+                       for (first, last), part in zip(ranges, parts)]
+            # appended in the order of the shards, each part as soon as it is done
+            for number, (future, (first, last), part) in enumerate(zip(futures, ranges, parts)):
+                users, habits, seconds = future.result()
+                with open(part, newline="") as part_file:
+                    shutil.copyfileobj(part_file, file)
+                os.remove(part)
+                totals["users"] += users
+                totals["habits"] += habits
+                print(f"shard {number + 1}/{len(ranges)} (user_id {first}-{last}): {users} users, {habits} habits "
+                      f"in {seconds:.2f}s", file=log)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    totals["seconds"] = time.perf_counter() - start
+    print(f"Report of {totals['users']} users and {totals['habits']} habits in {totals['seconds']:.2f}s "
+          f"({workers} workers).", file=log)
+    return totals
+
+
+# command line entry point
+def main(argv=None):
+    """
+    Writes the report, see the usage at the top of this document.
+    """
+    parser = argparse.ArgumentParser(description="Nightly streak report of all users.")
+    parser.add_argument("--output", required=True, help="the report file")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes (default: number of cores)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="user_ids per shard")
+    database.add_argument(parser)
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.shard_size < 1:
+        parser.error("--workers and --shard-size must be at least 1")
+    database.configure(args.db)
+    # the workers only read, the schema has to be up-to-date before
+    initial.start_database()
+    try:
+        write_report(args.output, args.format, args.workers, args.shard_size)
+    except ValueError as e:
+        print(f"Report failed: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
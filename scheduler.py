@@ -0,0 +1,181 @@
+"""
+This document contains the scheduler of the streaks at risk.
+
+A streak is at risk when the habit was completed in the previous period but not yet in the current one: a daily habit
+not done today, a weekly habit not done this ISO week, a monthly habit not done this month. The streak breaks at the
+end of the current period, its deadline.
+The scheduler keeps a heap of (deadline, user, habit), so it never has to compute the streaks of all habits:
+* it is seeded from the last completed period of every habit (habit_stats.last_period_key), a habit last completed
+  in period L is at risk in period L + 1 and its deadline is the end of period L + 1
+* a completion moves the deadline of its habit: once it is committed, UserClass.complete_habit() and
+  complete_habits() hand the new streak state of the habit (habit_stats.py) to all schedulers of the process
+  (record_state()), so a habit that was already popped continues its streak
+* pop_due() pops the k habits whose deadline lies within a time window in O(k log n). Entries that were moved later
+  are skipped when they come up, habits whose deadline already passed have lost their streak and are dropped.
+
+The habits that are due are handed to a notification sink, a function that gets one AtRisk entry, e.g. print_sink()
+or command_sink(command), which runs a local command (a desktop notification, a mail script, ...) per entry.
+See also the command 'at-risk' of cli.py.
+
+It imports the libraries heapq, json, subprocess, threading, weakref, collections and datetime, habit_stats.py for the
+streak state and streak_engine.py for the periods.
+"""
+import heapq
+import json
+import subprocess
+import threading
+import weakref
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import habit_stats
+import streak_engine
+
+WINDOW = timedelta(hours=24)
+
+# one habit whose streak breaks at 'deadline' unless it is completed before
+AtRisk = namedtuple("AtRisk", ["deadline", "username", "habit_name", "periodicity", "streak"])
+
+# all schedulers of the process, they are told about every completion
+_schedulers = weakref.WeakSet()
+
+
+def record_state(username, habit_name, periodicity, state):
+    """
+    Sets the committed streak state of a habit in all schedulers of the process (called by
+    UserClass.complete_habit() and, once per habit of a batch, by UserClass.complete_habits()).
+    """
+    for scheduler in list(_schedulers):
+        scheduler.schedule(username, habit_name, periodicity, state)
+
+
+def forget(username, habit_name):
+    """
+    Removes a habit from all schedulers of the process (called when a habit is deleted or changed).
+    """
+    for scheduler in list(_schedulers):
+        scheduler.forget(username, habit_name)
+
+
+# THE SCHEDULER.
+class AtRiskScheduler:
+    """
+    Attributes
+    ----------
+    heap: list
+        (deadline, username, habit_name) entries, the earliest deadline first
+
+    Methods
+    -------
+    seed(conn, owner)
+        schedules all habits with a streak (of all users or of one user)
+    schedule(username, habit_name, periodicity, state)
+        schedules one habit from its streak state (also after a completion)
+    forget(username, habit_name)
+        removes a habit
+    pop_due(now, window)
+        removes and returns the habits whose deadline lies within the window
+    """
+
+    def __init__(self):
+        self.heap = []
+        # (username, habit_name) --> (periodicity, streak state), the current entry of every habit
+        self._habits = {}
+        # the completions of a write queue are reported from its writer thread
+        self._lock = threading.Lock()
+        _schedulers.add(self)
+
+    def __len__(self):
+        return len(self._habits)
+
+    def seed(self, conn, owner=None):
+        """
+        Schedules every habit that has a streak, read from the materialized streak state (one row per habit, see
+        habit_stats.read()).
+        """
+        for (username, habit_name, periodicity), state in habit_stats.read(conn, owner).items():
+            if state[2] is not None:
+                self.schedule(username, habit_name, periodicity, state)
+        return self
+
+    def schedule(self, username, habit_name, periodicity, state):
+        """
+        Schedules a habit. state is its (current_streak, longest_streak, last_period_key) up to the last completed
+        period, see habit_stats.py.
+        """
+        with self._lock:
+            self._habits[username, habit_name] = (periodicity, state)
+            heapq.heappush(self.heap, (self._deadline(periodicity, state), username, habit_name))
+
+    @staticmethod
+    def _deadline(periodicity, state):
+        # the end of the period after the last completed one
+        return streak_engine.period_start(state[2] + 2, periodicity)
+
+    def forget(self, username, habit_name):
+        """
+        Removes a habit, its heap entries are skipped later.
+        """
+        with self._lock:
+            self._habits.pop((username, habit_name), None)
+
+    def pop_due(self, now=None, window=WINDOW):
+        """
+        Removes the habits whose streak breaks within the window from now on and returns them, the earliest
+        deadline first. Habits whose deadline has already passed are removed without being returned.
+
+        Returns
+        -------
+        :return: list
+            one AtRisk entry per habit
+        """
+        now = now or datetime.now()
+        due = []
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now + window:
+                deadline, username, habit_name = heapq.heappop(self.heap)
+                entry = self._habits.get((username, habit_name))
+                if entry is None or self._deadline(*entry) != deadline:
+                    continue    # moved by a later completion or forgotten
+                del self._habits[username, habit_name]
+                periodicity, state = entry
+                if deadline > now:
+                    due.append(AtRisk(deadline, username, habit_name, periodicity, state[0]))
+        return due
+
+
+# NOTIFICATION SINKS
+# a sink is any function that gets one AtRisk entry
+
+def as_dict(entry):
+    """
+    An AtRisk entry as a JSON serializable dict.
+    """
+    return dict(entry._asdict(), deadline=entry.deadline.isoformat(sep=" "))
+
+
+def print_sink(entry):
+    """
+    Prints a warning for the entry.
+    """
+    print(f"{entry.habit_name} ({entry.periodicity}): your streak of {entry.streak} breaks at "
+          f"{entry.deadline:%Y-%m-%d %H:%M} unless you complete it before.")
+
+
+def command_sink(command):
+    """
+    Returns a sink that runs a local command (a shell command line) for every entry, the entry is passed as JSON on
+    the standard input. A failing command raises subprocess.CalledProcessError.
+    """
+    def sink(entry):
+        subprocess.run(command, shell=True, input=json.dumps(as_dict(entry)), text=True, check=True)
+    return sink
+
+
+def notify(entries, sink=print_sink):
+    """
+    Hands every entry to the sink, returns the number of entries.
+    """
+    for entry in entries:
+        sink(entry)
+    return len(entries)
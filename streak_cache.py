@@ -0,0 +1,132 @@
+"""
+This document contains the in-process cache of the streak results.
+
+In one session the stats menu asks for the same streaks again and again (streak_habit(), longest_streak_habit()),
+although nothing changed in between. UserClass.compute_streak() and compute_longest_streak_habit() therefore keep
+their results in a bounded LRU cache, keyed by (username, habit name, periodicity, kind, calendar date). The date is
+part of the key because the current streak depends on the current period, so the entries of yesterday are simply
+never asked for again and fall out of the cache.
+
+The cache is invalidated
+* explicitly by the UserClass whenever its own connection changes a habit (complete_habit(), update_habit(),
+  delete_habit()), because SQLite does not report changes of a connection to itself
+* through PRAGMA data_version for everything written by other connections or processes (the write queue, a cron job
+  running cli.py, ...): the value changes whenever another connection commits, every lookup compares it with the
+  value seen at the previous lookup and empties the cache if it differs
+* completely when the connections are closed (database.close_all(), e.g. when another database is configured)
+
+The hits and misses are counted, see stats().
+
+It imports the libraries collections, threading and datetime.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+MAX_ENTRIES = 1024
+
+_entries = OrderedDict()
+# connection --> PRAGMA data_version seen at its last lookup
+_versions = {}
+_counters = {"hits": 0, "misses": 0}
+# incremented by every invalidation, a result computed meanwhile is not stored
+_generation = 0
+_lock = threading.Lock()
+
+
+def key(username, habit_name, periodicity, kind, day=None):
+    """
+    The cache key of a streak, kind is 'current' or 'longest', day defaults to today.
+    """
+    return username, habit_name, periodicity, kind, (day or date.today()).toordinal()
+
+
+def lookup(conn, cache_key, compute):
+    """
+    Returns the cached value of cache_key or calls compute(), stores its result and returns it.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+        the connection compute() reads from, checked for changes of other connections (PRAGMA data_version)
+    :param cache_key: tuple
+        see key()
+    :param compute: function
+        called without arguments on a miss
+    """
+    global _generation
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    with _lock:
+        if _versions.get(conn) != version:
+            # another connection committed (or the connection is new and may have missed commits)
+            if _entries:
+                _entries.clear()
+                _generation += 1
+            _versions[conn] = version
+        if cache_key in _entries:
+            _entries.move_to_end(cache_key)
+            _counters["hits"] += 1
+            return _entries[cache_key]
+        _counters["misses"] += 1
+        generation = _generation
+
+    value = compute()
+    with _lock:
+        if generation == _generation:
+            _entries[cache_key] = value
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return value
+
+
+def invalidate(username, habit_name=None):
+    """
+    Removes the entries of a user, or only those of one of their habits (all periodicities and dates).
+    """
+    global _generation
+    with _lock:
+        for cache_key in [k for k in _entries if k[0] == username and habit_name in (None, k[1])]:
+            del _entries[cache_key]
+        _generation += 1
+
+
+def forget(conn):
+    """
+    Forgets the data_version of a connection that is closed.
+    """
+    with _lock:
+        _versions.pop(conn, None)
+
+
+def clear():
+    """
+    Removes all entries and forgets the data_version of all connections (the counters are kept).
+    """
+    global _generation
+    with _lock:
+        _entries.clear()
+        _versions.clear()
+        _generation += 1
+
+
+def reset():
+    """
+    Like clear(), also sets the hit and miss counters back to 0.
+    """
+    clear()
+    with _lock:
+        _counters["hits"] = _counters["misses"] = 0
+
+
+def stats():
+    """
+    The hit and miss counters and the size of the cache.
+
+    Returns
+    -------
+    :return: dict
+        {"hits", "misses", "entries", "max_entries"}
+    """
+    with _lock:
+        return {"hits": _counters["hits"], "misses": _counters["misses"], "entries": len(_entries),
+                "max_entries": MAX_ENTRIES}
@@ -0,0 +1,226 @@
+"""
+This document contains the streak engine, which computes current and longest streaks of a habit.
+
+The completions of a habit are turned into integer period keys that grow by exactly one from one period to the next:
+* daily --> the ordinal of the day (date.toordinal())
+* weekly --> the number of the ISO week, counted from the first monday of the calendar (0001-01-01)
+* monthly --> year * 12 + month - 1
+The table progress stores every completion as an integer (completed_at), see encode_timestamp(). Its day ordinal is
+derived with integer arithmetic (day_ordinal_sql()), so the keys are computed without parsing any text.
+Two completions in the same period get the same key and consecutive periods always differ by one, also across the
+turn of the year. A streak is therefore simply a run of keys with a difference of 1.
+
+If NumPy is installed the keys are held in arrays and the runs are found with np.unique/np.diff, so even habits with
+years of daily history are computed without a Python loop. Without NumPy the same algorithm runs in plain Python.
+
+NumPy is only imported on the first computation that uses it, so short-lived processes that never compute a streak
+(e.g. a single 'cli.py complete') do not pay for loading it.
+
+It imports the libraries datetime, calendar and importlib and optionally numpy.
+"""
+import calendar
+import importlib.util
+from datetime import datetime, date
+
+# NumPy is optional, without it the pure Python version is used instead
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# date.toordinal() of 1970-01-01, the origin of numpy's datetime64
+_EPOCH_ORDINAL = 719163
+# date.toordinal() --> julian day number, for the SQLite date functions
+_JULIAN_OFFSET = 1721424.5
+
+
+def _numpy():
+    """
+    Imports NumPy on first use (later calls get the already imported module).
+    """
+    import numpy
+    return numpy
+
+
+# PERIOD KEYS
+
+def period_key(moment, periodicity):
+    """
+    Returns the period key of a datetime (or a text in the format '%Y-%m-%d %H:%M:%S') for a periodicity.
+    """
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    if periodicity == 'daily':
+        return moment.toordinal()
+    elif periodicity == 'weekly':
+        # day 1 of the proleptic calendar is a monday, so every 7 days a new ISO week starts
+        return (moment.toordinal() - 1) // 7
+    else:
+        return moment.year * 12 + moment.month - 1
+
+
+def period_start(key, periodicity):
+    """
+    Returns the first moment (midnight of the first day) of the period with the given key, the inverse of
+    period_key(). period_start(key + 1, periodicity) is the end of the period.
+    """
+    if periodicity == 'daily':
+        day = date.fromordinal(key)
+    elif periodicity == 'weekly':
+        day = date.fromordinal(key * 7 + 1)
+    else:
+        day = date(key // 12, key % 12 + 1, 1)
+    return datetime(day.year, day.month, day.day)
+
+
+def day_ordinals(completions):
+    """
+    Turns a sequence of completions (datetimes or texts) into the ordinals of their days.
+    """
+    completions = [completion for completion in completions if completion is not None]
+    if not HAS_NUMPY:
+        return [(datetime.fromisoformat(completion) if isinstance(completion, str) else completion).toordinal()
+                for completion in completions]
+    np = _numpy()
+    moments = np.array(completions, dtype='datetime64[s]')
+    return moments.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+
+def period_keys_from_days(days, periodicity):
+    """
+    Turns day ordinals (e.g. read with day_ordinal_sql()) into period keys without parsing any date text.
+
+    Returns
+    -------
+    :return: numpy.ndarray or list
+        an int64 array if NumPy is available, otherwise a list of ints (same order as the days)
+    """
+    if not HAS_NUMPY:
+        if periodicity == 'daily':
+            return list(days)
+        elif periodicity == 'weekly':
+            return [(day - 1) // 7 for day in days]
+        return [period_key(date.fromordinal(day), periodicity) for day in days]
+
+    np = _numpy()
+    days = np.asarray(days, dtype=np.int64)
+    if periodicity == 'daily':
+        return days
+    elif periodicity == 'weekly':
+        return (days - 1) // 7
+    # months since 1970-01
+    return (days - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) + 1970 * 12
+
+
+def period_keys(completions, periodicity):
+    """
+    Turns a sequence of completions (datetimes or texts) into their period keys.
+    """
+    return period_keys_from_days(day_ordinals(completions), periodicity)
+
+
+# TIMESTAMPS
+
+def encode_timestamp(moment):
+    """
+    Returns the integer representation of a completion: (completed_at, day_ordinal). completed_at, the value stored in
+    the table progress, are the seconds since 1970-01-01 of the naive local time, counted as if it were UTC, so
+    day_ordinal (= day_ordinal_sql() of completed_at) and the text '%Y-%m-%d %H:%M:%S' always describe the same
+    calendar day.
+    """
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    return calendar.timegm(moment.timetuple()), moment.toordinal()
+
+
+def day_ordinal_sql(column="completed_at"):
+    """
+    The SQL expression that turns an encoded completion (seconds, see encode_timestamp()) into its day ordinal.
+    """
+    return f"({column} / 86400 + {_EPOCH_ORDINAL})"
+
+
+def period_key_sql(day, periodicity):
+    """
+    The SQL expression of period_key(): day is an SQL expression of a day ordinal (e.g. day_ordinal_sql()),
+    periodicity an SQL expression of 'daily', 'weekly' or 'monthly' (e.g. a column).
+    """
+    return (f"(CASE {periodicity} WHEN 'daily' THEN {day} WHEN 'weekly' THEN ({day} - 1) / 7 "
+            f"ELSE CAST(strftime('%Y', {day} + {_JULIAN_OFFSET}) AS INTEGER) * 12 "
+            f"+ CAST(strftime('%m', {day} + {_JULIAN_OFFSET}) AS INTEGER) - 1 END)")
+
+
+# STREAKS
+
+def streaks_from_keys(keys, current_key=None):
+    """
+    Computes the current and the longest streak of a collection of period keys (in any order, duplicates allowed).
+
+    Parameters
+    ----------
+    :param keys: numpy.ndarray or list
+        period keys of all completions
+    :param current_key: int
+        key of the current period. The current streak only counts if the last completion is in this period.
+
+    Returns
+    -------
+    :return: tuple
+        (current streak, longest streak)
+    """
+    if len(keys) == 0:
+        return 0, 0
+
+    if HAS_NUMPY:
+        np = _numpy()
+        keys = np.unique(keys)      # sorted and without duplicates
+        # indexes at which a run ends --> every gap plus the last key
+        run_ends = np.append(np.flatnonzero(np.diff(keys) != 1), len(keys) - 1)
+        run_lengths = np.diff(run_ends, prepend=-1)
+        last_key, last_run, longest = int(keys[-1]), int(run_lengths[-1]), int(run_lengths.max())
+    else:
+        keys = sorted(set(keys))
+        last_run = longest = 1
+        for previous, key in zip(keys, keys[1:]):
+            last_run = last_run + 1 if key - previous == 1 else 1
+            longest = max(longest, last_run)
+        last_key = keys[-1]
+
+    current = last_run if current_key is not None and last_key == current_key else 0
+    return current, longest
+
+
+def compute_streaks(completions, periodicity, now=None):
+    """
+    Returns (current streak, longest streak) of a habit, see streaks_from_keys().
+
+    Parameters
+    ----------
+    :param completions: list
+        the dates and times of completion (datetimes or texts)
+    :param periodicity: str
+        'daily', 'weekly' or 'monthly'
+    :param now: datetime
+        the point in time the current streak is computed for, defaults to datetime.now()
+    """
+    keys = period_keys(completions, periodicity)
+    return streaks_from_keys(keys, period_key(now or datetime.now(), periodicity))
+
+
+def compute_streaks_from_days(days, periodicity, now=None):
+    """
+    Same as compute_streaks(), but for the day ordinals of the completions (see day_ordinal_sql()).
+    """
+    keys = period_keys_from_days(days, periodicity)
+    return streaks_from_keys(keys, period_key(now or datetime.now(), periodicity))
+
+
+def current_streak(completions, periodicity, now=None):
+    """
+    Number of consecutive periods up to (and including) the current one in which the habit was completed.
+    """
+    return compute_streaks(completions, periodicity, now)[0]
+
+
+def longest_streak(completions, periodicity):
+    """
+    Highest number of consecutive periods in which the habit was completed.
+    """
+    return streaks_from_keys(period_keys(completions, periodicity))[1]
@@ -1,5 +1,6 @@
 from unittest import TestCase
 from freezegun import freeze_time
+from datetime import datetime
 import sys
 import os
 
@@ -8,6 +9,17 @@ sys.path.insert(1, os.path.join(sys.path[0], '..'))
 import habit
 import User
 import initial
+import database
+
+
+# the tests run on a migrated copy of healthup.db, the checked-in file stays untouched
+def setUpModule():
+    database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+    initial.start_database()
+
+
+def tearDownModule():
+    database.configure()
 
 class Test(TestCase):
     def test_get_user(self):
@@ -26,6 +38,13 @@ class TestUserClass(TestCase):
         assert type(existing_habit) == habit.HabitClass
         assert non_existing_habit is None
 
+    def test_get_habit_keeps_creation_time(self):
+        user = initial.get_user("Barbie")
+        sleep = User.UserClass.get_habit(user, "Sleep")
+        assert sleep.datetime_creation == datetime(2024, 1, 1)
+        assert sleep == habit.HabitClass("Sleep", "Barbie", "daily", "2024-01-01 00:00:00")
+        assert not hasattr(sleep, "conn")
+
     def test_show_all(self):
         user = initial.get_user("Barbie")
         print('all consisting habits')
@@ -76,4 +95,75 @@ class TestUserClass(TestCase):
         assert streak_swimming == 3
         assert streak_water == 86
 
+    @freeze_time ( "2024-03-27" )
+    def test_compute_all_streaks(self):
+        user = initial.get_user("Barbie")
+        all_streaks = User.UserClass.compute_all_streaks(user, materialized=False)
+        print("all streaks:", all_streaks)
+
+        assert list(all_streaks) == ["Sleep", "Water", "Swimming", "Running", "Gym"]
+        for habit_name, streaks in all_streaks.items():
+            assert streaks["current"] == User.UserClass.compute_streak(user, habit_name, streaks["periodicity"])
+            assert streaks["longest"] == User.UserClass.compute_longest_streak_habit(user, habit_name,
+                                                                                     streaks["periodicity"])
+        assert all_streaks["Running"]["unit"] == "week(s)"
+
+    def test_habits_are_hashable(self):
+        user = initial.get_user("Barbie")
+        habits = {user.get_habit("Sleep"), user.get_habit("Sleep"), user.get_habit("Water")}
+        assert {hab.habit_name for hab in habits} == {"Sleep", "Water"}
+        assert len(habits) == 2
+
+    def test_habit_names_per_user(self):
+        other = User.UserClass("Ken", "x", "Ken", "Doll")
+        other.store_in_db()
+        other.store_habit_in_db(habit.HabitClass("Sleep", "Ken", "weekly", datetime(2024, 1, 1)))
+        other.complete_habit("Sleep", datetime(2024, 1, 2))
+
+        assert other.get_habit("Sleep").periodicity == "weekly"
+        assert other.get_habit_progress("Sleep", "weekly") == [("2024-01-02 00:00:00",)]
+        barbie = initial.get_user("Barbie")
+        assert barbie.get_habit("Sleep").periodicity == "daily"
+        assert len(barbie.get_habit_progress("Sleep", "daily")) > 1
+
+    @freeze_time("2024-03-06")
+    def test_repeated_completions_are_counted(self):
+        user = User.UserClass("Skipper", "x", "Skipper", "Roberts")
+        user.store_in_db()
+        user.store_habit_in_db(habit.HabitClass("Water", "Skipper", "daily", datetime(2024, 3, 1)))
+        for hour in (8, 12, 18, 9, 21):
+            user.complete_habit("Water", datetime(2024, 3, 5, hour))
+        user.complete_habit("Water", datetime(2024, 3, 6, 7))
+        assert user.get_habit_progress("Water", "daily") == [("2024-03-05 08:00:00",), ("2024-03-06 07:00:00",)]
+        assert user.compute_streak("Water", "daily") == user.compute_longest_streak_habit("Water", "daily") == 2
+
+        # monday 4th to wednesday 6th are one week, the counts are added up
+        habit_id = user._find_habit("Water")[0]
+        user.cur.execute("UPDATE habits SET periodicity = 'weekly' WHERE habit_id = ?", (habit_id,))
+        User.rekey_progress(user.cur, habit_id, "weekly")
+        user.conn.commit()
+        assert user.cur.execute("SELECT datetime(completed_at, 'unixepoch'), count FROM progress WHERE habit_id = ?",
+                                (habit_id,)).fetchall() == [("2024-03-05 08:00:00", 6)]
+
+    @freeze_time("2023-12-31 20:00:00")
+    def test_complete_habits(self):
+        user = User.UserClass("Stacie", "x", "Stacie", "Roberts")
+        user.store_in_db()
+        user.store_habit_in_db(habit.HabitClass("Yoga", "Stacie", "daily", datetime(2023, 1, 1)))
+        user.store_habit_in_db(habit.HabitClass("Tea", "Stacie", "weekly", datetime(2023, 1, 1)))
+        # a year of history, the days 100 to 109 are missing
+        history = [("Yoga", datetime.fromordinal(datetime(2023, 1, 1).toordinal() + day).replace(hour=7))
+                   for day in range(365) if not 100 <= day < 110]
+        assert user.complete_habits(history[200:] + [("Tea", None)]) == {"Yoga": 155, "Tea": 1}
+        assert user.compute_streak("Yoga", "daily") == 155
+        assert user.complete_habits([("Yoga", None), ("Unknown", None)]) is None
+        assert len(user.get_habit_progress("Yoga", "daily")) == 155
+
+        # the older history goes before the last recorded day
+        assert user.complete_habits(history[:200]) == {"Yoga": 200}
+        streaks = user.compute_all_streaks()
+        assert (streaks["Yoga"]["current"], streaks["Yoga"]["longest"]) == (255, 255)
+        assert streaks == user.compute_all_streaks(materialized=False)
+        assert user.get_calendar("Yoga").count() == 355
+
 # shortcut command to test in terminal: python -m unittest test_User.py
\ No newline at end of file
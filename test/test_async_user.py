@@ -0,0 +1,56 @@
+from unittest import IsolatedAsyncioTestCase
+from datetime import datetime, timedelta
+from freezegun import freeze_time
+import asyncio
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import async_user
+import database
+import initial
+
+
+class TestAsyncUserClass(IsolatedAsyncioTestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+
+    def tearDown(self):
+        database.configure()
+
+    async def test_reads(self):
+        async with async_user.DatabaseExecutor() as executor:
+            assert await async_user.AsyncUserClass.load("Unknown", executor) is None
+            user = await async_user.AsyncUserClass.load("Barbie", executor)
+            assert (await user.get_habit("Running")).periodicity == "weekly"
+            assert [hab.habit_name for hab in await user.list_habits("daily")] == ["Sleep", "Water"]
+            with freeze_time("2024-03-27"):
+                streaks = await user.compute_all_streaks()
+                assert streaks["Sleep"]["current"] == await user.compute_streak("Sleep", "daily") == 87
+                assert await user.compute_longest_streak_habit("Water", "daily") == 86
+
+    async def test_concurrent_callers(self):
+        start = datetime(2024, 4, 1, 8)
+        async with async_user.DatabaseExecutor(workers=4, max_latency=0.01) as executor:
+            user = await async_user.AsyncUserClass.load("Barbie", executor)
+            completions = [user.complete_habit("Water", start + timedelta(days=day)) for day in range(50)]
+            reads = [user.compute_all_streaks(materialized=False) for _ in range(50)]
+            results = await asyncio.gather(*completions, *reads)
+            assert results[:50] == [True] * 50
+            assert await user.complete_habit("Unknown") is None
+            # the completions were grouped into a few transactions
+            assert executor.write_queue().batches < 50
+            with freeze_time("2024-05-20"):
+                assert await user.compute_streak("Water", "daily") == 50
+
+    async def test_worker_connections_are_closed(self):
+        open_connections = len(database._open_connections)
+        for _ in range(3):
+            async with async_user.DatabaseExecutor(workers=4) as executor:
+                user = await async_user.AsyncUserClass.load("Barbie", executor)
+                await asyncio.gather(*[user.compute_all_streaks() for _ in range(8)])
+                await user.complete_habit("Water", datetime(2024, 4, 1, 8))
+                assert len(database._open_connections) > open_connections
+            assert len(database._open_connections) == open_connections
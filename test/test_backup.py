@@ -0,0 +1,73 @@
+from unittest import TestCase, mock
+from datetime import datetime, timedelta
+import io
+import shutil
+import sqlite3
+import tempfile
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import backup
+import database
+import initial
+
+NOW = datetime(2024, 3, 27, 21, 30)
+
+
+class TestBackup(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        database.configure()
+        shutil.rmtree(self.folder)
+
+    def count(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_backup_is_verified_copy(self):
+        result = backup.create_backup(self.folder, pages_per_step=5, pause=0, now=NOW, log=io.StringIO())
+        assert result["path"] == os.path.join(self.folder, "healthup-20240327-213000.db")
+        assert result["steps"] > 1
+        assert backup.verify(result["path"]) == []
+        assert self.count(result["path"]) == self.count(database.DB_PATH)
+        assert os.listdir(self.folder) == ["healthup-20240327-213000.db"]
+        with self.assertRaises(FileExistsError):
+            backup.create_backup(self.folder, now=NOW, log=io.StringIO())
+
+    def test_writers_during_backup(self):
+        user = initial.get_user("Barbie")
+        before = self.count(database.DB_PATH)
+        completions = iter(range(100))
+
+        # a completion is committed during every pause between two steps
+        def complete(seconds):
+            user.complete_habit("Water", datetime(2024, 5, 1) + timedelta(days=next(completions)))
+        with mock.patch.object(backup.time, "sleep", side_effect=complete):
+            result = backup.create_backup(self.folder, pages_per_step=2, pause=1, now=NOW, log=io.StringIO())
+        # the backup is the snapshot of its start
+        assert self.count(result["path"]) == before
+        assert self.count(database.DB_PATH) == before + result["steps"] - 1
+
+    def test_rotation(self):
+        for day in range(4):
+            result = backup.create_backup(self.folder, keep=2, now=NOW + timedelta(days=day), log=io.StringIO())
+        assert [os.path.basename(path) for path in backup.backups(self.folder)] == \
+               ["healthup-20240329-213000.db", "healthup-20240330-213000.db"]
+        assert [os.path.basename(path) for path in result["deleted"]] == ["healthup-20240328-213000.db"]
+
+    def test_main(self):
+        source = os.path.join(self.folder, "source.db")
+        shutil.copyfile(database.DEFAULT_DB_PATH, source)
+        folder = os.path.join(self.folder, "backups")
+        assert backup.main(["--dir", folder, "--db", source, "--keep", "1"]) == 0
+        assert len(backup.backups(folder)) == 1
+        assert backup.main(["--dir", folder, "--db", os.path.join(self.folder, "missing.db")]) == 2
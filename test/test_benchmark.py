@@ -0,0 +1,41 @@
+from unittest import TestCase
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+from benchmark import generate, run
+
+
+class TestGenerator(TestCase):
+    def tearDown(self):
+        database.configure()
+
+    def test_generate_without_gaps(self):
+        database.configure(database.MEMORY)
+        size = generate.generate(users=2, habits=3, years=1, gap_rate=0)
+        assert (size["users"], size["habits"]) == (2, 6)
+
+        user = initial.get_user("user1")
+        days = len(generate.period_starts("daily", 1))
+        assert user.compute_longest_streak_habit("user1habit0", "daily") == days
+        assert user.compute_longest_streak_habit("user1habit2", "monthly") == 12
+        assert size["progress"] == 2 * sum(len(generate.period_starts(periodicity, 1))
+                                           for periodicity in generate.PERIODICITIES)
+
+    def test_generate_is_reproducible(self):
+        rows = []
+        for _ in range(2):
+            database.configure(database.MEMORY)
+            generate.generate(users=2, habits=3, years=1, gap_rate=0.3, seed=7)
+            rows.append(database.get_connection().execute("SELECT * FROM progress ORDER BY rowid").fetchall())
+        assert rows[0] == rows[1]
+
+    def test_run_scale(self):
+        result = run.run_scale(users=2, habits=3, years=1, repeat=1)
+        assert set(result["operations"]) >= {"compute_streak", "compute_longest_streak_habit", "streak_overview",
+                                             "get_habit_progress", "show_all", "bulk_insert"}
+        previous = {"scales": {"tiny": result}}
+        assert len(run.compare(previous, previous)) == len(result["operations"])
@@ -0,0 +1,119 @@
+from unittest import TestCase, mock
+from datetime import datetime
+from freezegun import freeze_time
+import contextlib
+import hashlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import cli
+import database
+import initial
+import main
+import User
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def setUpModule():
+    database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+    initial.start_database()
+    password = hashlib.sha256("secret123".encode('utf-8')).hexdigest()
+    User.UserClass("cliuser", password, "Cli", "User").store_in_db()
+
+
+def tearDownModule():
+    database.configure()
+
+
+class TestCommandLine(TestCase):
+    def run_cli(self, *argv, password="secret123", entry=cli.main):
+        output = io.StringIO()
+        with mock.patch.dict(os.environ, {cli.PASSWORD_VARIABLE: password}), \
+                contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            code = entry(list(argv))
+        return code, output.getvalue()
+
+    def test_complete_and_stats(self):
+        user = initial.get_user("cliuser")
+        user.store_habit_in_db(User.habit.HabitClass("Yoga", "cliuser", "daily", "2024-01-01 08:00:00"))
+
+        code, _ = self.run_cli("complete", "--user", "cliuser", "--habit", "Yoga", "--at", "2024-01-02 08:00:00")
+        assert code == cli.EXIT_OK
+        code, _ = self.run_cli("complete", "--user", "cliuser", "--habit", "Yoga", "--at", "2024-01-03 08:00:00")
+        assert user.get_habit_progress("Yoga", "daily") == [("2024-01-02 08:00:00",), ("2024-01-03 08:00:00",)]
+
+        code, output = self.run_cli("stats", "--user", "cliuser", "--json")
+        assert code == cli.EXIT_OK
+        result = json.loads(output)
+        assert result["user"] == "cliuser"
+        assert result["habits"]["Yoga"]["longest"] == 2
+
+    def test_complete_many(self):
+        user = initial.get_user("cliuser")
+        user.store_habit_in_db(User.habit.HabitClass("Tea", "cliuser", "daily", "2024-01-01 08:00:00"))
+        user.store_habit_in_db(User.habit.HabitClass("Walk", "cliuser", "daily", "2024-01-01 08:00:00"))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "wearable.csv")
+            with open(path, "w") as file:
+                file.write("habit_name,datetime_completion\n")
+                file.writelines(f"Walk,2024-01-{day:02d} 18:00:00\n" for day in range(1, 11))
+            code, output = self.run_cli("complete-many", "--user", "cliuser", "--file", path,
+                                        "--habit", "Tea", "--at", "2024-01-10 08:00:00")
+            assert code == cli.EXIT_OK
+            assert output == "Completed 11 times: 'Tea' (1), 'Walk' (10).\n"
+            code, _ = self.run_cli("complete-many", "--user", "cliuser", "--habit", "Tea", "--habit", "Nothing")
+            assert code == cli.EXIT_NOT_FOUND
+        assert len(user.get_habit_progress("Walk", "daily")) == 10
+        assert len(user.get_habit_progress("Tea", "daily")) == 1
+
+    def test_unknown_habit(self):
+        code, _ = self.run_cli("complete", "--user", "cliuser", "--habit", "Nothing")
+        assert code == cli.EXIT_NOT_FOUND
+
+    def test_wrong_password(self):
+        code, output = self.run_cli("list", "--user", "cliuser", password="wrong")
+        assert code == cli.EXIT_AUTHENTICATION
+        assert output == ""
+
+    def test_list_through_main(self):
+        user = initial.get_user("cliuser")
+        user.store_habit_in_db(User.habit.HabitClass("Reading", "cliuser", "weekly", "2024-01-01 08:00:00"))
+        code, output = self.run_cli("list", "--user", "cliuser", "--periodicity", "weekly", "--json", entry=main.main)
+        assert code == cli.EXIT_OK
+        assert [hab["habit_name"] for hab in json.loads(output)] == ["Reading"]
+
+    def test_leaderboard(self):
+        code, output = self.run_cli("leaderboard", "--user", "cliuser", "--habit", "Sleep", "--json")
+        assert code == cli.EXIT_OK
+        entries = json.loads(output)
+        assert [(entry["owner"], entry["rank"]) for entry in entries] == [("Barbie", 1)]
+        code, output = self.run_cli("leaderboard", "--user", "cliuser", "--habit", "Sleep", "--page", "2")
+        assert (code, output) == (cli.EXIT_OK, "")
+
+    def test_at_risk(self):
+        user = initial.get_user("cliuser")
+        user.store_habit_in_db(User.habit.HabitClass("Stretching", "cliuser", "daily", "2024-02-01 08:00:00"))
+        user.complete_habit("Stretching", datetime(2024, 2, 1, 8))
+        with tempfile.TemporaryDirectory() as tmp_dir, freeze_time("2024-02-02 12:00:00"):
+            path = os.path.join(tmp_dir, "notified.json")
+            code, output = self.run_cli("at-risk", "--user", "cliuser", "--within", "12", "--json",
+                                        "--notify", f"cat > {path}")
+            assert code == cli.EXIT_OK
+            assert [(entry["habit_name"], entry["deadline"]) for entry in json.loads(output)] == \
+                   [("Stretching", "2024-02-03 00:00:00")]
+            with open(path) as file:
+                assert json.load(file)["streak"] == 1
+            code, output = self.run_cli("at-risk", "--user", "cliuser", "--within", "1", "--json")
+            assert json.loads(output) == []
+
+    def test_questionary_is_not_imported(self):
+        code = "import sys, cli, main; print('questionary' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True).stdout
+        assert output.strip() == "False"
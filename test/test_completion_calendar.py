@@ -0,0 +1,91 @@
+from unittest import TestCase
+from datetime import datetime, date, timedelta
+from freezegun import freeze_time
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import completion_calendar
+import database
+import habit_stats
+import initial
+
+
+class TestCompletionCalendar(TestCase):
+    def test_streaks_and_counts(self):
+        origin = date(2024, 1, 1).toordinal()
+        # completed on the 1st-3rd, twice on the 5th and on the 6th
+        days = [origin, origin + 1, origin + 2, origin + 4, origin + 4, origin + 5]
+        calendar = completion_calendar.CompletionCalendar.from_keys("daily", days, origin)
+        assert calendar.is_done(datetime(2024, 1, 5, 12)) and not calendar.is_done(datetime(2024, 1, 4))
+        assert calendar.current_streak(datetime(2024, 1, 6)) == 2
+        assert calendar.current_streak(datetime(2024, 1, 7)) == 0
+        assert calendar.longest_streak() == 3
+        assert calendar.count(datetime(2024, 1, 2), datetime(2024, 1, 5)) == 3
+        assert calendar.count(last=datetime(2024, 12, 31)) == 5
+
+    def test_completion_before_origin(self):
+        calendar = completion_calendar.CompletionCalendar("monthly", 2024 * 12 + 2)
+        calendar.mark(datetime(2024, 3, 1))
+        calendar.mark(datetime(2023, 12, 24))
+        assert calendar.origin == 2023 * 12 + 11
+        assert calendar.count(datetime(2023, 12, 1), datetime(2024, 3, 1)) == 2
+        assert calendar.current_streak(datetime(2024, 3, 1)) == 1
+
+    def test_ten_years_fit_in_460_bytes(self):
+        origin = date(2014, 1, 1).toordinal()
+        calendar = completion_calendar.CompletionCalendar.from_keys("daily", range(origin, origin + 3652), origin)
+        assert len(calendar.to_blob()) <= 460
+        restored = completion_calendar.CompletionCalendar.from_blob("daily", origin, calendar.to_blob())
+        assert restored.longest_streak() == 3652
+
+
+class TestStoredCalendar(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        self.user = initial.get_user("Barbie")
+
+    def tearDown(self):
+        database.configure()
+
+    @freeze_time("2024-03-27")
+    def test_migration_fills_calendars(self):
+        for habit_name, periodicity in (("Sleep", "daily"), ("Water", "daily"), ("Running", "weekly"),
+                                        ("Gym", "monthly")):
+            calendar = self.user.get_calendar(habit_name)
+            assert calendar.current_streak() == self.user.compute_streak(habit_name, periodicity)
+            assert calendar.longest_streak() == self.user.compute_longest_streak_habit(habit_name, periodicity)
+        assert self.user.get_calendar("Unknown") is None
+
+    @freeze_time("2024-03-27")
+    def test_completion_updates_calendar(self):
+        assert not self.user.get_calendar("Water").is_done()
+        self.user.complete_habit("Water", datetime.now())
+        calendar = self.user.get_calendar("Water")
+        assert calendar.is_done()
+        assert calendar.current_streak() == self.user.compute_streak("Water", "daily")
+        # a completion long before the creation of the habit moves the origin back
+        self.user.complete_habit("Water", datetime.now() - timedelta(days=400))
+        assert self.user.get_calendar("Water").count(datetime.now() - timedelta(days=400)) == \
+               calendar.count() + 1
+
+    @freeze_time("2024-03-28 20:00:00")
+    def test_insert_through_legacy_view(self):
+        conn = database.get_connection()
+        # Water is missing on 2024-03-27, Sleep is continued, Running is counted again in the same week
+        conn.executemany("INSERT INTO legacy_progress(habit_name, periodicity, owner, datetime_completion) "
+                         "VALUES(?, ?, 'Barbie', ?)",
+                         [("Water", "daily", "2024-03-28 08:00:00"), ("Sleep", "daily", "2024-03-28 09:00:00"),
+                          ("Running", "weekly", "2024-03-28 10:00:00")])
+        conn.commit()
+        assert habit_stats.verify(habit_stats.read(conn)) == []
+        assert self.user.get_calendar("Water").current_streak() == 1
+        assert self.user.get_calendar("Sleep").current_streak() == 88
+        assert self.user.get_calendar("Sleep").is_done()
+
+        # the same after the stale habits were recomputed
+        habit_stats.refresh(conn)
+        assert habit_stats.verify(habit_stats.read(conn)) == []
+        assert self.user.get_calendar("Sleep").longest_streak() == 88
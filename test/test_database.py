@@ -0,0 +1,109 @@
+from unittest import TestCase, mock
+from datetime import datetime
+import threading
+import sqlite3
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+
+
+class TestConnectionManager(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+
+    def tearDown(self):
+        database.configure()
+
+    def test_connection_is_reused_per_thread(self):
+        conn = database.get_connection()
+        user = initial.get_user("Barbie")
+        assert user.conn is conn
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(database.get_connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn
+
+    def test_close_connection(self):
+        conn = database.get_connection()
+        database.close_connection()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        assert database.get_connection() is not conn
+
+    def test_pragmas_are_applied(self):
+        conn = database.get_connection()
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == database.PRAGMAS["cache_size"]
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == database.PRAGMAS["busy_timeout"]
+
+    def test_context_manager_rolls_back(self):
+        with self.assertRaises(ValueError):
+            with database.connection() as conn:
+                conn.execute("INSERT INTO users(username, password, firstname, lastname) "
+                             "VALUES('rollback_user', 'x', 'x', 'x')")
+                raise ValueError()
+        assert initial.get_user("rollback_user") is None
+
+    def test_read_only_connection(self):
+        assert database.get_connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        reader = database.get_read_connection()
+        assert reader is database.get_read_connection()
+        assert reader is not database.get_connection()
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM progress")
+        database.close_connection()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            reader.execute("SELECT 1")
+
+    def test_snapshot_does_not_block_writer(self):
+        user = initial.get_user("Barbie")
+        # without WAL the commit would fail at once with 'database is locked'
+        user.conn.execute("PRAGMA busy_timeout = 0")
+        count = "SELECT COUNT(*) FROM progress"
+        with database.read_snapshot() as reader:
+            before = reader.execute(count).fetchone()[0]
+            assert user.complete_habit("Water", datetime(2024, 4, 10)) is True
+            assert reader.execute(count).fetchone()[0] == before
+        assert database.get_read_connection().execute(count).fetchone()[0] == before + 1
+
+class TestConfiguration(TestCase):
+    def tearDown(self):
+        database.configure()
+
+    def test_shared_memory_database(self):
+        database.configure(database.MEMORY)
+        initial.start_database()
+        database.get_connection().execute("INSERT INTO users(username, password, firstname, lastname) "
+                                          "VALUES('memory_user', 'x', 'Memory', 'User')")
+        database.get_connection().commit()
+
+        # other threads see the same in-memory database
+        found = []
+        thread = threading.Thread(target=lambda: found.append(initial.get_user("memory_user")))
+        thread.start()
+        thread.join()
+        assert found[0].firstname == "Memory"
+
+        # a new configuration starts empty
+        database.configure(database.MEMORY)
+        initial.start_database()
+        assert initial.get_user("memory_user") is None
+
+    def test_temporary_file_is_removed(self):
+        path = database.use_temporary_file()
+        initial.start_database()
+        assert os.path.exists(path)
+        database.configure()
+        assert not os.path.exists(path)
+        assert database.DB_PATH == os.environ.get(database.ENV_VARIABLE, database.DEFAULT_DB_PATH)
+
+    def test_environment_variable(self):
+        with mock.patch.dict(os.environ, {database.ENV_VARIABLE: "/tmp/from_environment.db"}):
+            assert database.configure() == "/tmp/from_environment.db"
+            assert database.configure("/tmp/from_api.db") == "/tmp/from_api.db"
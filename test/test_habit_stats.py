@@ -0,0 +1,86 @@
+from unittest import TestCase
+from datetime import datetime
+from freezegun import freeze_time
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import habit_stats
+import initial
+
+
+class TestStreakState(TestCase):
+    def test_state_from_keys(self):
+        # duplicate in period 3, gap between 4 and 7
+        assert habit_stats.state_from_keys([1, 2, 3, 3, 4, 7, 8]) == (2, 4, 8)
+        assert habit_stats.state_from_keys([]) == (0, 0, None)
+
+
+class TestHabitStats(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+
+    def tearDown(self):
+        database.configure()
+
+    @freeze_time("2024-03-27")
+    def test_migration_fills_stats(self):
+        user = initial.get_user("Barbie")
+        streaks = user.compute_all_streaks()
+        assert [(name, s["current"], s["longest"]) for name, s in streaks.items()] == \
+               [("Sleep", 87, 87), ("Water", 0, 86), ("Swimming", 3, 3), ("Running", 13, 13), ("Gym", 3, 3)]
+        assert streaks == user.compute_all_streaks(materialized=False)
+
+    @freeze_time("2024-03-27")
+    def test_rebuild_matches_user_class(self):
+        stats = habit_stats.rebuild(database.get_connection())
+        assert len(stats) == 5
+        assert habit_stats.verify(stats) == []
+
+    def test_completion_updates_stats(self):
+        cur = database.get_connection().cursor()
+        sleep_id = initial.get_user("Barbie")._find_habit("Sleep")[0]
+        with freeze_time("2024-03-28"):
+            habit_stats.record_completion(cur, sleep_id, "daily", datetime.now())
+            habit_stats.record_completion(cur, sleep_id, "daily", datetime.now())
+            # the streaks are read on the read-only connection, which only sees committed data
+            cur.connection.commit()
+            user = initial.get_user("Barbie")
+            assert user.compute_all_streaks()["Sleep"] == {"periodicity": "daily", "current": 88, "longest": 88,
+                                                           "unit": "day(s)"}
+        with freeze_time("2024-03-30"):
+            habit_stats.record_completion(cur, sleep_id, "daily", datetime.now())
+            cur.connection.commit()
+            assert user.compute_all_streaks()["Sleep"]["current"] == 1
+            assert user.compute_all_streaks()["Sleep"]["longest"] == 88
+
+    @freeze_time("2024-06-01 12:00:00")
+    def test_legacy_insert_marks_habit_stale(self):
+        conn = database.get_connection()
+        conn.execute("INSERT INTO legacy_progress(habit_name, periodicity, owner, datetime_completion) "
+                     "VALUES('Sleep', 'daily', 'Barbie', '2024-06-01 10:00:00')")
+        conn.commit()
+        user = initial.get_user("Barbie")
+        sleep = {"periodicity": "daily", "current": 1, "longest": 87, "unit": "day(s)"}
+        assert user.compute_all_streaks()["Sleep"] == user.compute_all_streaks(materialized=False)["Sleep"] == sleep
+        assert habit_stats.read(conn, "Barbie")["Barbie", "Sleep", "daily"] == \
+               (1, 87, datetime(2024, 6, 1).toordinal())
+
+        # recomputed at the start of the programme
+        assert habit_stats.refresh(conn) == 1
+        assert conn.execute("SELECT COUNT(*) FROM stale_habits").fetchone()[0] == 0
+        assert habit_stats.read(conn) == habit_stats.rebuild(conn)
+
+    def test_completion_of_stale_habit(self):
+        conn = database.get_connection()
+        conn.execute("INSERT INTO legacy_progress(habit_name, periodicity, owner, datetime_completion) "
+                     "VALUES('Water', 'daily', 'Barbie', '2024-03-27 10:00:00')")
+        conn.commit()
+        user = initial.get_user("Barbie")
+        user.complete_habit("Water", datetime(2024, 3, 28, 10))
+        assert conn.execute("SELECT COUNT(*) FROM stale_habits").fetchone()[0] == 0
+        with freeze_time("2024-03-28"):
+            assert user.compute_all_streaks()["Water"]["current"] == 88
@@ -0,0 +1,56 @@
+from unittest import TestCase
+import shutil
+import sqlite3
+import tempfile
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import importer
+import initial
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+FIXTURES = [os.path.join(DATA_DIR, f"healthup_{table}.csv") for table in ("users", "habits", "progress")]
+
+
+class TestImporter(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        database.configure(database.MEMORY)
+
+    def tearDown(self):
+        database.configure()
+        shutil.rmtree(self.tmp_dir)
+
+    def count(self, table):
+        return database.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_import_fixtures(self):
+        rows = importer.import_files(FIXTURES, chunk_size=50, transaction_size=100, defer_indexes=True)
+        assert rows == 1 + 5 + 191
+        assert (self.count("users"), self.count("habits"), self.count("progress")) == (1, 5, 191)
+        assert self.count("habit_stats") == 5
+        # the deferred indexes exist again
+        indexes = database.get_connection().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+        assert ("idx_progress_habit",) in indexes
+        assert initial.get_user("Barbie").show_daily_habits() == ["Sleep", "Water"]
+
+    def test_duplicates(self):
+        importer.import_files(FIXTURES[:2])
+        with self.assertRaises(sqlite3.IntegrityError):
+            importer.import_files(FIXTURES[1:2])
+        assert importer.import_files(FIXTURES[1:2], ignore_duplicates=True) == 5
+        assert self.count("habits") == 5
+
+    def test_header_is_validated(self):
+        initial.start_database()
+        path = os.path.join(self.tmp_dir, "broken.csv")
+        with open(path, "w") as file:
+            file.write("habit_name,owner,periodicity,created\nSleep,Barbie,daily,2024-01-01 00:00:00\n")
+        with self.assertRaises(ValueError) as error:
+            importer.import_file(database.get_connection(), path)
+        assert "'legacy_habits'" in str(error.exception)
+        assert self.count("habits") == 0
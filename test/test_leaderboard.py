@@ -0,0 +1,86 @@
+from unittest import TestCase
+from datetime import datetime, timedelta
+import hashlib
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import habit
+import initial
+import leaderboard
+import User
+from benchmark import generate
+
+
+class TestLeaderboard(TestCase):
+    def tearDown(self):
+        database.configure()
+
+    def assert_matches_user_class(self, entries):
+        for entry in entries:
+            user = initial.get_user(entry["owner"])
+            assert entry["longest"] == user.compute_longest_streak_habit(entry["habit_name"], entry["periodicity"])
+            assert entry["current"] == user.compute_streak(entry["habit_name"], entry["periodicity"])
+
+    def test_matches_fixture(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        entries = leaderboard.compute(database.get_connection())
+        assert {entry["habit_name"] for entry in entries} == {"Sleep", "Water", "Running", "Swimming", "Gym"}
+        self.assert_matches_user_class(entries)
+
+    def test_matches_generated_history(self):
+        database.configure(database.MEMORY)
+        generate.generate(users=3, habits=6, years=2, gap_rate=0.3, seed=3)
+        entries = leaderboard.compute(database.get_connection(), limit=100)
+        assert len(entries) == 18
+        self.assert_matches_user_class(entries)
+
+    def test_pages(self):
+        database.configure(database.MEMORY)
+        initial.start_database()
+        today = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        # (username, habit, days of the streak ending today, days of an older streak)
+        for username, habit_name, current, older in (("anna", "Yoga", 3, 0), ("ben", "Tea", 5, 2)):
+            user = User.UserClass(username, hashlib.sha256(b"password1").hexdigest(), "Test", "User")
+            user.store_in_db()
+            user.store_habit_in_db(habit.HabitClass(habit_name, username, "daily", today - timedelta(days=30)))
+            for day in list(range(current)) + list(range(20, 20 + older)):
+                user.complete_habit(habit_name, today - timedelta(days=day))
+
+        conn = database.get_connection()
+        entries = leaderboard.compute(conn, by="current")
+        assert [(entry["habit_name"], entry["owner"], entry["rank"], entry["current"]) for entry in entries] == [
+            ("Tea", "ben", 1, 5), ("Yoga", "anna", 1, 3)]
+        self.assert_matches_user_class(entries)
+        # the pages are counted per habit
+        assert leaderboard.compute(conn, "Yoga", "daily", limit=1, offset=1) == []
+        assert leaderboard.compute(conn, "Yoga", "weekly") == []
+
+        with self.assertRaises(ValueError):
+            leaderboard.compute(conn, by="oldest")
+
+    def test_ranking(self):
+        database.configure(database.MEMORY)
+        initial.start_database()
+        today = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        # (username, days of the streak ending today, days of an older streak), all users own a habit 'Yoga'
+        for username, current, older in (("anna", 3, 0), ("ben", 5, 2), ("carl", 3, 7), ("dora", 0, 4)):
+            user = User.UserClass(username, hashlib.sha256(b"password1").hexdigest(), "Test", "User")
+            user.store_in_db()
+            user.store_habit_in_db(habit.HabitClass("Yoga", username, "daily", today - timedelta(days=30)))
+            for day in list(range(current)) + list(range(20, 20 + older)):
+                user.complete_habit("Yoga", today - timedelta(days=day))
+
+        conn = database.get_connection()
+        longest = leaderboard.compute(conn, "Yoga", "daily")
+        assert [(entry["owner"], entry["rank"], entry["longest"]) for entry in longest] == [
+            ("carl", 1, 7), ("ben", 2, 5), ("dora", 3, 4), ("anna", 4, 3)]
+        self.assert_matches_user_class(longest)
+
+        current = leaderboard.compute(conn, "Yoga", by="current", limit=2)
+        assert [(entry["owner"], entry["rank"]) for entry in current] == [("ben", 1), ("anna", 2)]
+        second_page = leaderboard.compute(conn, "Yoga", by="current", limit=2, offset=2)
+        assert [(entry["owner"], entry["rank"]) for entry in second_page] == [("carl", 2), ("dora", 4)]
@@ -0,0 +1,51 @@
+from unittest import TestCase, mock
+import contextlib
+import io
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+import main
+
+
+def setUpModule():
+    database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+    initial.start_database()
+
+
+def tearDownModule():
+    database.configure()
+
+
+class TestMenu(TestCase):
+    def setUp(self):
+        self.user = initial.get_user("Barbie")
+
+    def run_menu(self, answers):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            actions = main.menu(self.user, main.scripted(answers))
+        return actions, output.getvalue()
+
+    def test_long_session_does_not_recurse(self):
+        rounds = sys.getrecursionlimit() * 2
+        actions, output = self.run_menu(["Activity Overview", "all daily habits"] * rounds + ["Logout"])
+        assert actions == rounds
+        assert output.endswith("See you soon, Barbie!\n\n")
+
+    def test_back_and_cancel(self):
+        actions, output = self.run_menu(["See Stats", "Back", "Activity Overview", "Back"])
+        assert actions == 0
+        assert "See you soon" not in output
+
+    def test_create_habit_asks_again_for_existing_name(self):
+        with mock.patch("questionary.text") as text, mock.patch("questionary.select") as select:
+            text.return_value.ask.side_effect = ["Sleep", "Meditation"]
+            select.return_value.ask.return_value = "weekly"
+            actions, output = self.run_menu(["Create, or Edit a Habit", "Create a new habit", "Logout"])
+        assert actions == 1
+        assert "This habit already exists" in output
+        assert self.user.get_habit("Meditation").periodicity == "weekly"
@@ -0,0 +1,136 @@
+from unittest import TestCase
+import sqlite3
+import shutil
+import tempfile
+import threading
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import migrations
+import streak_engine
+
+DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'healthup.db')
+
+
+class TestMigrations(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'healthup.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def index_names(self, conn):
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+        return {row[0] for row in rows}
+
+    def test_migrate_new_database(self):
+        conn = sqlite3.connect(self.db_path)
+        version = migrations.migrate(conn)
+        assert version == migrations.SCHEMA_VERSION
+        assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+        assert {"idx_progress_habit", "idx_habits_owner_periodicity"} <= self.index_names(conn)
+        conn.close()
+
+    def test_concurrent_upgrades(self):
+        # several processes (here: connections in threads) start on the same outdated file at the same time
+        shutil.copy(DB_FILE, self.db_path)
+        connections = [sqlite3.connect(self.db_path, timeout=30, check_same_thread=False) for _ in range(3)]
+        errors = []
+
+        def upgrade(conn):
+            try:
+                migrations.migrate(conn)
+            except sqlite3.Error as e:
+                errors.append(e)
+        threads = [threading.Thread(target=upgrade, args=(conn,)) for conn in connections]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert [migrations.get_version(conn) for conn in connections] == [migrations.SCHEMA_VERSION] * 3
+        assert connections[0].execute("SELECT COUNT(*) FROM habit_stats").fetchone()[0] == 5
+        for conn in connections:
+            conn.close()
+
+    def test_migrate_existing_database_in_place(self):
+        # the checked-in database was created before the migrations existed (user_version 0)
+        shutil.copy(DB_FILE, self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        migrations.migrate(conn)
+        assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0] == 192
+        conn.close()
+
+    def test_completions_are_encoded(self):
+        shutil.copy(DB_FILE, self.db_path)
+        original = sqlite3.connect(DB_FILE).execute(
+            "SELECT owner, habit_name, periodicity, datetime_completion FROM progress ORDER BY rowid").fetchall()
+        conn = sqlite3.connect(self.db_path)
+        migrations.migrate(conn)
+        rows = conn.execute(f"SELECT completed_at, {streak_engine.day_ordinal_sql()} FROM progress").fetchall()
+        assert sorted(rows) == sorted(streak_engine.encode_timestamp(text) for _, _, _, text in original)
+        # the old layout is still readable through the view
+        assert sorted(conn.execute("SELECT owner, habit_name, periodicity, datetime_completion FROM legacy_progress"
+                                   ).fetchall()) == sorted(original)
+
+        # rows written in the old layout (older clients, CSV files) get their integer keys from the trigger
+        conn.execute("INSERT INTO legacy_progress(habit_name, periodicity, owner, datetime_completion) "
+                     "VALUES('Sleep', 'daily', 'Barbie', '2024-12-31 23:59:59')")
+        assert conn.execute("SELECT h.habit_name, p.completed_at FROM progress p JOIN habits h USING(habit_id) "
+                            "ORDER BY p.rowid DESC LIMIT 1").fetchone() == \
+               ("Sleep", streak_engine.encode_timestamp("2024-12-31 23:59:59")[0])
+        with self.assertRaises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO legacy_progress(habit_name, periodicity, owner, datetime_completion) "
+                         "VALUES('Unknown', 'daily', 'Barbie', '2024-12-31 23:59:59')")
+        conn.close()
+
+    def test_surrogate_keys(self):
+        shutil.copy(DB_FILE, self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        migrations.migrate(conn)
+        assert conn.execute("SELECT user_id, username FROM users").fetchall() == [(1, "Barbie")]
+        assert conn.execute("SELECT habit_id, owner_id, habit_name FROM habits ORDER BY habit_id").fetchall() == [
+            (1, 1, "Sleep"), (2, 1, "Water"), (3, 1, "Swimming"), (4, 1, "Running"), (5, 1, "Gym")]
+        assert [row[1] for row in conn.execute("PRAGMA table_info(progress)")] == \
+               ["habit_id", "completed_at", "period_key", "count"]
+        # another user may own a habit with the same name, but not twice
+        conn.execute("INSERT INTO users(username) VALUES('Ken')")
+        conn.execute("INSERT INTO habits(owner_id, habit_name, periodicity, datetime_creation) "
+                     "VALUES(2, 'Sleep', 'daily', '2024-01-01 00:00:00')")
+        with self.assertRaises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO habits(owner_id, habit_name, periodicity, datetime_creation) "
+                         "VALUES(2, 'Sleep', 'weekly', '2024-01-01 00:00:00')")
+        conn.close()
+
+    def test_duplicate_completions_are_collapsed(self):
+        shutil.copy(DB_FILE, self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        # a second Sleep on the last day and a second Gym in March 2024 (monthly)
+        conn.execute("INSERT INTO progress VALUES('Sleep', 'daily', 'Barbie', '2024-03-27 21:00:00')")
+        conn.execute("INSERT INTO progress VALUES('Gym', 'monthly', 'Barbie', '2024-03-02 09:00:00')")
+        conn.commit()
+        migrations.migrate(conn)
+        assert conn.execute("SELECT COUNT(*), SUM(count) FROM progress").fetchone() == (192, 194)
+        assert conn.execute("SELECT COUNT(*) FROM (SELECT DISTINCT habit_id, period_key FROM progress)"
+                            ).fetchone()[0] == 192
+        with self.assertRaises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO progress(habit_id, completed_at, period_key) "
+                         "SELECT habit_id, completed_at, period_key FROM progress LIMIT 1")
+        # through the view a repeated completion is counted in the row of its period
+        conn.execute("INSERT INTO legacy_progress(habit_name, periodicity, owner, datetime_completion) "
+                     "VALUES('Gym', 'monthly', 'Barbie', '2024-03-30 18:00:00')")
+        assert conn.execute("SELECT COUNT(*), SUM(count) FROM progress").fetchone() == (192, 195)
+        conn.close()
+
+    def test_current_schema_skips_ddl(self):
+        conn = sqlite3.connect(self.db_path)
+        migrations.migrate(conn)
+        statements = []
+        conn.set_trace_callback(statements.append)
+        migrations.migrate(conn)
+        assert statements == ["PRAGMA user_version"]
+        conn.close()
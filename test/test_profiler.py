@@ -0,0 +1,74 @@
+from unittest import TestCase
+import json
+import sqlite3
+import subprocess
+import tempfile
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+import profiler
+import streak_engine
+import User
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        profiler.reset()
+
+    def tearDown(self):
+        profiler.disable()
+        profiler.reset()
+        database.configure()
+
+    def test_disabled_costs_nothing(self):
+        original = User.UserClass.compute_streak
+        assert type(database.get_connection()) is sqlite3.Connection
+        profiler.enable(output=None)
+        assert User.UserClass.compute_streak is not original
+        profiler.disable()
+        assert User.UserClass.compute_streak is original
+        assert type(database.get_connection()) is sqlite3.Connection
+
+    def test_statements_and_functions_are_recorded(self):
+        profiler.enable(output=None)
+        assert isinstance(database.get_connection(), profiler.ProfiledConnection)
+        user = initial.get_user("Barbie")
+        user.compute_streak("Sleep", "daily")
+        user.compute_longest_streak_habit("Sleep", "daily")
+        user.compute_all_streaks(materialized=False)
+
+        data = profiler.snapshot()
+        functions = {entry["name"]: entry for entry in data["functions"]}
+        assert functions["compute_streak"]["calls"] == 1
+        assert functions["get_user"]["calls"] == 1
+
+        days = [entry for entry in data["statements"]
+                if entry["sql"].startswith(f"SELECT {streak_engine.day_ordinal_sql()} FROM progress")]
+        assert days[0]["calls"] == 2
+        assert days[0]["rows"] == 2 * len(user.get_completion_days("Sleep", "daily"))
+        # rows fetched by iterating over the cursor are counted as well
+        joined = [entry for entry in data["statements"] if "LEFT JOIN progress" in entry["sql"]]
+        assert joined[0]["rows"] > 0
+        assert data["statements"] == sorted(data["statements"], key=lambda entry: entry["total_ms"], reverse=True)
+        assert "SQL statements" in profiler.report()
+
+    def test_json_trace_of_command(self):
+        path = database.DB_PATH
+        database.close_all()
+        with tempfile.TemporaryDirectory() as directory:
+            trace = os.path.join(directory, "trace.json")
+            environment = dict(os.environ, HEALTHUP_PASSWORD="wrong")
+            subprocess.run([sys.executable, "cli.py", "list", "--user", "Barbie", "--db", path, "--profile", trace],
+                           cwd=ROOT, env=environment, capture_output=True)
+            with open(trace) as file:
+                data = json.load(file)
+        assert [entry["name"] for entry in data["functions"]].count("authenticate") == 1
+        assert any(entry["sql"].startswith("SELECT username, password") for entry in data["statements"])
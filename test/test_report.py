@@ -0,0 +1,59 @@
+from unittest import TestCase
+from datetime import datetime
+from freezegun import freeze_time
+import csv
+import io
+import json
+import shutil
+import tempfile
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+import report
+from benchmark import generate
+
+NOW = datetime(2024, 12, 31, 12)
+
+
+class TestReport(TestCase):
+    def setUp(self):
+        database.use_temporary_file()
+        generate.generate(users=7, habits=3, years=1)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        database.configure()
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, output_format, **kwargs):
+        path = os.path.join(self.tmp_dir, f"report.{output_format}")
+        totals = report.write_report(path, output_format, now=NOW, log=io.StringIO(), **kwargs)
+        with open(path, newline="") as file:
+            return totals, file.read()
+
+    def test_report_matches_user_class(self):
+        totals, text = self.write("jsonl", workers=2, shard_size=3)
+        assert (totals["shards"], totals["users"], totals["habits"]) == (3, 7, 21)
+        lines = [json.loads(line) for line in text.splitlines()]
+        assert [line["user"] for line in lines[::3]] == [f"user{number}" for number in range(7)]
+        with freeze_time(NOW):
+            for line in lines:
+                streaks = initial.get_user(line["user"]).compute_all_streaks(materialized=False)[line["habit"]]
+                assert (line["current"], line["longest"]) == (streaks["current"], streaks["longest"])
+
+    def test_csv(self):
+        _, jsonl = self.write("jsonl", workers=1)
+        _, text = self.write("csv", workers=2, shard_size=2)
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert [(row["user"], row["habit"], int(row["current"]), int(row["longest"])) for row in rows] == \
+               [(line["user"], line["habit"], line["current"], line["longest"])
+                for line in map(json.loads, jsonl.splitlines())]
+
+    def test_in_memory_database_is_refused(self):
+        database.configure(database.MEMORY)
+        with self.assertRaises(ValueError):
+            report.write_report(os.path.join(self.tmp_dir, "report.jsonl"))
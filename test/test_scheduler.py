@@ -0,0 +1,71 @@
+from unittest import TestCase
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+import scheduler
+import write_queue
+
+
+class TestAtRiskScheduler(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        self.scheduler = scheduler.AtRiskScheduler().seed(database.get_connection())
+
+    def tearDown(self):
+        database.configure()
+
+    def test_deadlines_from_last_completion(self):
+        # last completions: Sleep 2024-03-27, Water 2024-03-26, Running week of 2024-03-25, Swimming/Gym March
+        assert len(self.scheduler) == 5
+        due = self.scheduler.pop_due(datetime(2024, 3, 27, 12), timedelta(hours=24))
+        assert [(entry.habit_name, entry.deadline, entry.streak) for entry in due] == \
+               [("Water", datetime(2024, 3, 28), 86)]
+        # Sleep is done today, so its streak only breaks at the end of tomorrow
+        due = self.scheduler.pop_due(datetime(2024, 3, 28, 12), timedelta(hours=24))
+        assert [(entry.habit_name, entry.deadline) for entry in due] == [("Sleep", datetime(2024, 3, 29))]
+        due = self.scheduler.pop_due(datetime(2024, 4, 1), timedelta(days=29))
+        assert [(entry.habit_name, entry.deadline) for entry in due] == [("Running", datetime(2024, 4, 8))]
+        # Swimming and Gym (done in March) break at the end of April
+        assert len(self.scheduler) == 2
+        due = self.scheduler.pop_due(datetime(2024, 4, 30))
+        assert [(entry.habit_name, entry.deadline) for entry in due] == \
+               [("Gym", datetime(2024, 5, 1)), ("Swimming", datetime(2024, 5, 1))]
+
+    def test_completion_moves_deadline(self):
+        user = initial.get_user("Barbie")
+        user.complete_habit("Water", datetime(2024, 3, 27, 20))
+        assert self.scheduler.pop_due(datetime(2024, 3, 27, 21), timedelta(hours=24)) == []
+        due = self.scheduler.pop_due(datetime(2024, 3, 28, 21), timedelta(hours=24))
+        assert [(entry.habit_name, entry.streak) for entry in due] == [("Sleep", 87), ("Water", 87)]
+
+    def test_streak_continues_after_pop(self):
+        due = self.scheduler.pop_due(datetime(2024, 3, 27, 12), timedelta(hours=24))
+        assert [(entry.habit_name, entry.streak) for entry in due] == [("Water", 86)]
+        user = initial.get_user("Barbie")
+        user.complete_habit("Water", datetime(2024, 3, 27, 20))
+        due = self.scheduler.pop_due(datetime(2024, 3, 28, 12), timedelta(hours=24))
+        assert [(entry.habit_name, entry.streak) for entry in due] == [("Sleep", 87), ("Water", 87)]
+
+    def test_queued_completion_is_recorded_when_committed(self):
+        self.scheduler.pop_due(datetime(2024, 3, 27, 12), timedelta(hours=24))
+        user = initial.get_user("Barbie")
+        with write_queue.WriteQueue(max_latency=0) as queue:
+            user.complete_habit("Water", datetime(2024, 3, 27, 20), queue=queue).result()
+        due = self.scheduler.pop_due(datetime(2024, 3, 28, 12), timedelta(hours=24))
+        assert ("Water", 87) in [(entry.habit_name, entry.streak) for entry in due]
+
+    def test_broken_streaks_are_dropped(self):
+        assert self.scheduler.pop_due(datetime(2024, 6, 1), timedelta(hours=1)) == []
+        assert len(self.scheduler) == 0
+
+    def test_notification_sink(self):
+        received = []
+        due = self.scheduler.pop_due(datetime(2024, 3, 27, 12))
+        assert scheduler.notify(due, received.append) == 1
+        assert scheduler.as_dict(received[0])["deadline"] == "2024-03-28 00:00:00"
@@ -0,0 +1,64 @@
+from unittest import TestCase
+from datetime import datetime
+from freezegun import freeze_time
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+import streak_cache
+import write_queue
+
+
+class TestStreakCache(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        streak_cache.reset()
+        self.user = initial.get_user("Barbie")
+
+    def tearDown(self):
+        database.configure()
+
+    @freeze_time("2024-03-27")
+    def test_repeated_streaks_are_hits(self):
+        for _ in range(3):
+            assert self.user.compute_streak("Sleep", "daily") == 87
+            assert self.user.compute_longest_streak_habit("Water", "daily") == 86
+        stats = streak_cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (4, 2, 2)
+
+    @freeze_time("2024-03-27")
+    def test_completion_invalidates(self):
+        assert self.user.compute_streak("Water", "daily") == 0
+        self.user.complete_habit("Water", datetime(2024, 3, 27, 8))
+        assert self.user.compute_streak("Water", "daily") == 87
+        assert streak_cache.stats()["hits"] == 0
+
+    @freeze_time("2024-03-27")
+    def test_other_connection_invalidates(self):
+        assert self.user.compute_streak("Water", "daily") == 0
+        # committed by the connection of the write queue, not by the one of the user
+        with write_queue.WriteQueue() as queue:
+            self.user.complete_habit("Water", datetime(2024, 3, 27, 8), queue=queue).result()
+        assert self.user.compute_streak("Water", "daily") == 87
+
+    def test_new_day_is_a_new_entry(self):
+        with freeze_time("2024-03-27"):
+            assert self.user.compute_streak("Sleep", "daily") == 87
+        with freeze_time("2024-03-29"):
+            assert self.user.compute_streak("Sleep", "daily") == 0
+        assert streak_cache.stats()["misses"] == 2
+
+    def test_least_recently_used_is_evicted(self):
+        conn = database.get_connection()
+        limit = streak_cache.MAX_ENTRIES
+        for number in range(limit + 1):
+            streak_cache.lookup(conn, ("user", number), lambda: number)
+            # keeps the first entry the most recently used one
+            streak_cache.lookup(conn, ("user", 0), lambda: None)
+        assert streak_cache.stats()["entries"] == limit
+        assert streak_cache.lookup(conn, ("user", 0), lambda: None) == 0
+        assert streak_cache.lookup(conn, ("user", 1), lambda: None) is None
@@ -0,0 +1,51 @@
+from unittest import TestCase, mock, skipUnless
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import streak_engine
+
+
+class TestPeriodKeys(TestCase):
+    def test_consecutive_keys_across_year_boundary(self):
+        # 2024-12-30 is the monday of ISO week 1 of 2025
+        assert streak_engine.period_key(datetime(2024, 12, 30), 'weekly') == \
+               streak_engine.period_key(datetime(2024, 12, 23), 'weekly') + 1
+        assert streak_engine.period_key(datetime(2025, 1, 5), 'weekly') == \
+               streak_engine.period_key(datetime(2024, 12, 30), 'weekly')
+        assert streak_engine.period_key(datetime(2025, 1, 1), 'monthly') == \
+               streak_engine.period_key(datetime(2024, 12, 31), 'monthly') + 1
+        assert streak_engine.period_key("2025-01-01 00:00:00", 'daily') == \
+               streak_engine.period_key(datetime(2024, 12, 31, 23, 59), 'daily') + 1
+
+    def test_period_keys_match_period_key(self):
+        completions = ["2020-02-29 23:59:59", "2024-12-30 00:00:00", "2021-01-03 12:00:00", "1999-12-31 08:15:00"]
+        for periodicity in ('daily', 'weekly', 'monthly'):
+            expected = [streak_engine.period_key(completion, periodicity) for completion in completions]
+            assert list(streak_engine.period_keys(completions, periodicity)) == expected
+
+
+class TestStreaks(TestCase):
+    # weekly habit done twice in week 52 of 2024 and in week 1 of 2025
+    weekly = ["2024-12-16 08:00:00", "2024-12-23 08:00:00", "2024-12-27 18:00:00", "2024-12-30 08:00:00"]
+
+    def check_streaks(self):
+        now = datetime(2025, 1, 2)
+        assert streak_engine.compute_streaks(self.weekly, 'weekly', now) == (3, 3)
+        assert streak_engine.compute_streaks(self.weekly, 'weekly', now + timedelta(weeks=1)) == (0, 3)
+
+        daily = [str(datetime(2021, 1, 1) + timedelta(days=day)) for day in range(400) if day != 100]
+        daily += daily[:5]      # duplicate completions on the same day
+        assert streak_engine.compute_streaks(daily, 'daily', datetime(2022, 2, 4, 20)) == (299, 299)
+        assert streak_engine.longest_streak(daily, 'monthly') == 14
+        assert streak_engine.compute_streaks([], 'daily') == (0, 0)
+
+    @skipUnless(streak_engine.HAS_NUMPY, "NumPy is not installed")
+    def test_numpy_engine(self):
+        self.check_streaks()
+
+    def test_pure_python_fallback(self):
+        with mock.patch.object(streak_engine, "HAS_NUMPY", False):
+            self.check_streaks()
@@ -0,0 +1,90 @@
+from unittest import TestCase
+from datetime import datetime, timedelta
+import sqlite3
+import threading
+import sys
+import os
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+import database
+import initial
+import write_queue
+import User
+
+
+class TestWriteQueue(TestCase):
+    def setUp(self):
+        database.use_temporary_file(copy_of=database.DEFAULT_DB_PATH)
+        initial.start_database()
+        self.user = initial.get_user("Barbie")
+
+    def tearDown(self):
+        database.configure()
+
+    def count_progress(self):
+        return database.connect().execute("SELECT COUNT(*) FROM progress").fetchone()[0]
+
+    def test_completions_are_grouped(self):
+        before = self.count_progress()
+        start = datetime(2024, 3, 28)
+        with write_queue.WriteQueue(max_batch_size=50, max_latency=0.5) as queue:
+            futures = []
+
+            def complete(offset):
+                # a UserClass works with the connection of its thread, so every thread loads its own
+                user = initial.get_user("Barbie")
+                for day in range(offset, 100, 4):
+                    futures.append(user.complete_habit("Sleep", start + timedelta(days=day), queue=queue))
+
+            threads = [threading.Thread(target=complete, args=(offset,)) for offset in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            queue.flush()
+            assert all(future.done() and future.exception() is None for future in futures)
+            assert queue.written == 101      # the 100 completions and the no-op of flush()
+            assert queue.batches < 10
+
+        assert self.count_progress() == before + 100
+        # the streak state was updated inside the same transactions
+        assert self.user.compute_all_streaks(materialized=False)["Sleep"]["longest"] == 187
+        assert self.user.compute_all_streaks()["Sleep"]["longest"] == 187
+
+    def test_failing_write_does_not_fail_the_batch(self):
+        def fail(cur):
+            cur.execute("INSERT INTO users(username, password, firstname, lastname) "
+                        "VALUES('queued_user', 'x', 'x', 'x')")
+            raise ValueError("broken write")
+
+        with write_queue.WriteQueue(max_latency=0.2) as queue:
+            good = self.user.complete_habit("Water", datetime(2024, 3, 28), queue=queue)
+            bad = queue.submit(fail)
+            other = self.user.complete_habit("Water", datetime(2024, 3, 29), queue=queue)
+        assert isinstance(bad.exception(), ValueError)
+        assert good.exception() is None and other.exception() is None
+        assert initial.get_user("queued_user") is None
+
+    def test_busy_database_is_retried(self):
+        database.PRAGMAS["busy_timeout"], busy_timeout = 0, database.PRAGMAS["busy_timeout"]
+        try:
+            queue = write_queue.WriteQueue(max_latency=0, retries=8, retry_delay=0.01)
+        finally:
+            database.PRAGMAS["busy_timeout"] = busy_timeout
+        gym_id = self.user._find_habit("Gym")[0]
+        blocker = sqlite3.connect(database.DB_PATH, isolation_level=None, check_same_thread=False)
+        blocker.execute("BEGIN EXCLUSIVE")
+        # while the database is locked even the lookup of the habit would fail, so the write is queued directly
+        future = queue.submit(User.insert_completion, gym_id, "monthly", datetime(2024, 4, 1))
+        threading.Timer(0.1, blocker.rollback).start()
+        # the new streak state of Gym: done in every month from January to April
+        assert future.result(timeout=5) == (4, 4, 2024 * 12 + 3)
+        queue.shutdown()
+        blocker.close()
+
+    def test_shutdown(self):
+        queue = write_queue.WriteQueue()
+        queue.shutdown()
+        with self.assertRaises(RuntimeError):
+            queue.submit(lambda cur: None)
@@ -0,0 +1,232 @@
+"""
+This document contains the write queue for high rates of completions (group commit).
+
+Instead of committing (and syncing to disk) once per completion, callers hand their writes to a WriteQueue.
+A single writer thread collects them into batches of at most max_batch_size writes, or whatever arrived within
+max_latency seconds, and writes each batch in one transaction. Every write gets a Future that is done as soon as
+its transaction is committed, so a caller can still wait until its progress is durable.
+Each write runs in its own savepoint, a failing write is rolled back alone and does not affect the others of
+its batch. If the database is locked by another process (SQLITE_BUSY) the transaction is retried with a backoff.
+
+Example
+-------
+with write_queue.WriteQueue() as queue:
+    future = user.complete_habit("Water", queue=queue)
+    future.result()     # waits until the completion is committed
+
+It imports the libraries sqlite3, threading, queue, time and concurrent.futures.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import database
+
+MAX_BATCH_SIZE = 500        # writes per transaction
+MAX_LATENCY = 0.05          # seconds a write waits for others before its batch is written
+RETRIES = 5                 # attempts after SQLITE_BUSY before a batch fails
+RETRY_DELAY = 0.05          # seconds before the first retry, doubled for every further retry
+
+_STOP = object()
+
+
+def is_busy(error):
+    """
+    True if a sqlite3 error means that another connection holds the lock (SQLITE_BUSY / 'database is locked').
+    """
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff == getattr(sqlite3, "SQLITE_BUSY", 5)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+# THE WRITE QUEUE.
+class WriteQueue:
+    """
+    Attributes
+    ----------
+    max_batch_size: int
+        the maximum number of writes in one transaction
+    max_latency: float
+        the maximum number of seconds the first write of a batch waits for more writes
+    batches: int
+        the number of committed transactions
+    written: int
+        the number of committed writes
+
+    Methods
+    -------
+    submit(function, *args)
+        queues function(cursor, *args), returns a Future with its result
+    flush(timeout)
+        waits until everything submitted so far is committed
+    shutdown(wait)
+        writes the remaining queue and stops the writer thread
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_latency=MAX_LATENCY, path=None,
+                 retries=RETRIES, retry_delay=RETRY_DELAY):
+        """
+        :param max_batch_size: int
+            the maximum number of writes in one transaction
+        :param max_latency: float
+            seconds the first write of a batch waits for more writes
+        :param path: str
+            the database, defaults to the configured one (see database.configure())
+        :param retries: int
+            attempts after SQLITE_BUSY before a batch fails
+        :param retry_delay: float
+            seconds before the first retry, doubled for every further retry
+        """
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.batches = 0
+        self.written = 0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        # the connection is opened here, so a wrong path fails in the caller and not in the thread
+        self._conn = database.connect(path)
+        self._conn.isolation_level = None   # transactions are started and committed explicitly
+        self._thread = threading.Thread(target=self._run, name="healthup-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    # QUEUEING
+
+    def submit(self, function, *args):
+        """
+        Queues a write. function(cursor, *args) is called in the writer thread inside the batch transaction,
+        it must not commit itself.
+
+        Returns
+        -------
+        :return: concurrent.futures.Future
+            done with the return value of the function once the transaction is committed,
+            or with the exception of the function / of the commit
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The write queue has been shut down.")
+            self._queue.put((function, args, future))
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Waits until all writes submitted before this call are committed.
+        """
+        # the queue is processed in order, so once this no-op is committed everything before it is as well
+        self.submit(lambda cur: None).result(timeout)
+
+    def shutdown(self, wait=True):
+        """
+        Stops accepting writes, writes everything still queued and stops the writer thread.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    # WRITER THREAD
+
+    def _run(self):
+        """
+        Main loop of the writer thread.
+        """
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._write(batch)
+                if stop:
+                    break
+        finally:
+            self._conn.close()
+
+    def _next_batch(self):
+        """
+        Blocks until a write arrives and collects more writes until the batch is full or max_latency has passed.
+
+        Returns
+        -------
+        :return: tuple
+            (list of writes, True if the queue was shut down)
+        """
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _execute_with_retry(self, statement):
+        """
+        Executes BEGIN/COMMIT and retries with a backoff as long as the database is busy.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                self._conn.execute(statement)
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == self.retries:
+                    raise
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _write(self, batch):
+        """
+        Writes one batch in a single transaction and resolves the futures afterwards.
+        """
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        cur = self._conn.cursor()
+        results = []
+        try:
+            self._execute_with_retry("BEGIN IMMEDIATE")
+            for function, args, future in batch:
+                cur.execute("SAVEPOINT write")
+                try:
+                    result = function(cur, *args)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO write")
+                    cur.execute("RELEASE write")
+                    future.set_exception(e)
+                else:
+                    cur.execute("RELEASE write")
+                    results.append((future, result))
+            self._execute_with_retry("COMMIT")
+        except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.written += len(results)
+        for future, result in results:
+            future.set_result(result)